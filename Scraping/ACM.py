@@ -1,4 +1,12 @@
-from playwright.sync_api import sync_playwright
+import Rutas  # Agrega Unificador_duplicador al path: va antes que los demás imports
+from ClienteHTTP import fetch_http_pages, open_client
+from Extraccion import extract_items, extract_items_from_html
+from Limitador import RateLimiter, watch_responses
+from Navegador import (METRICS, ensure_data_dir, open_database, page_url_template, results_marker, run_alone,
+                       save_page, source_parser, use_lean_mode, wait_for_new_results)
+from Progreso import Checkpoint
+from Repeticion import record_snapshot, start_recording
+from contextlib import aclosing
 import os
 import re
 import time
@@ -8,120 +16,236 @@ import time
 # USO DE CHATGPT PARA LA ESTRUCTURA DE LOS SCRAPES
 # -------------------------------------------------------------
 
-
-def scrape_acm():
-    # Crear la carpeta "Data" si no existe
-    if not os.path.exists("Data"):
-        os.makedirs("Data")
-
-    with sync_playwright() as p:
-        start_time = time.time()
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
-
+QUERY = "generative artificial intelligence"
+RESULTS_SELECTOR = ".search__item"
+NEXT_SELECTOR = ".pagination__btn--next"
+MAX_PAGES = 50
+
+# Modo liviano: se bloquea todo lo que no es texto (ver Navegador.use_lean_mode)
+LEAN = {}
+
+# Ritmo inicial y máximo de páginas por segundo (ver Limitador.py)
+RATE_LIMIT = {"rate": 0.25, "max_rate": 1.0}
+
+# Conexiones simultáneas en modo HTTP (ver ClienteHTTP.py)
+HTTP_CONNECTIONS = 2
+
+# Campos de cada resultado (ver Extraccion.py)
+FIELDS = {
+    "title": {"selector": ".hlFld-Title a"},
+    "link": {"selector": ".hlFld-Title a", "attr": "href"},
+    "authors": {"selector": ".rlist--inline"},
+    "date": {"selector": ".bookPubDate"},
+    "journal": {"selector": ".issue-item__detail"},
+    "abstract": {"selector": ".issue-item__abstract"},
+}
+
+
+def to_record(raw):
+    """Convertir los textos leídos de un resultado en los campos del artículo."""
+    match = re.search(r'\b\d{4}\b', raw["date"]) if raw["date"] else None
+    return {
+        "title": raw["title"] if raw["title"] is not None else "Unknown",
+        "author": raw["authors"] if raw["authors"] is not None else "Unknown",
+        "year": match.group(0) if match else "Unknown",
+        "journal": raw["journal"] if raw["journal"] is not None else "Unknown",
+        "abstract": raw["abstract"] if raw["abstract"] is not None else "Unknown",
+        "url": "https://dl.acm.org" + (raw["link"] if raw["link"] is not None else "Unknown"),
+    }
+
+
+def to_records(raws):
+    """Convertir los resultados leídos en artículos (None si uno no se pudo procesar)."""
+    records = []
+    for raw in raws:
         try:
-            # Paso 1: Acceder a la página principal
-            page.goto("https://library.uniquindio.edu.co/databases")
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 2: Hacer clic en "Fac. Ingeniería"
-            fac_ingenieria_selector = "div[data-content-listing-item='fac-ingenier-a']"
-            page.click(fac_ingenieria_selector)
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 3: Hacer clic en "ACM Digital Library"
-            elements = page.locator("//a[contains(@href, 'dl.acm.org')]//span[contains(text(), 'ACM Digital Library')]")
-            count = elements.count()
-
-            for i in range(count):
-             if elements.nth(i).is_visible():
-                elements.nth(i).click()
-                page.wait_for_load_state("domcontentloaded")
-                print(f"Se hizo clic en el elemento {i+1}")
-                break
+            records.append(to_record(raw))
+        except Exception as e:
+            print(f"Error al procesar un resultado: {e}")
+            records.append(None)
+    return records
+
+
+@METRICS.timed("extraction")
+async def extract_results(page, strategy=extract_items):
+    """Extraer los artículos de la página de resultados cargada en `page` (None si uno falla)."""
+    records = to_records(await strategy(page, RESULTS_SELECTOR, FIELDS))
+    await record_snapshot(page, records)
+    return records
+
+
+def parse_response(response):
+    """Artículos de una página de resultados descargada en modo HTTP."""
+    return to_records(extract_items_from_html(response.text, RESULTS_SELECTOR, FIELDS))
+
+
+@METRICS.timed("write")
+def write_records(file, page_num, records):
+    """Escribir en formato BibTeX los artículos de una página."""
+    METRICS.count("pages")
+    METRICS.count("records", sum(record is not None for record in records))
+    for i, record in enumerate(records):
+        if record is None:
+            continue
+        file.write(f"@article{{ref{page_num}_{i},\n")
+        file.write(f"  title = {{{record['title']}}},\n")
+        file.write(f"  author = {{{record['author']}}},\n")
+        file.write(f"  year = {{{record['year']}}},\n")
+        file.write(f"  journal = {{{record['journal']}}},\n")
+        file.write(f"  abstract = {{{record['abstract']}}},\n")
+        file.write(f"  url = {{{record['url']}}}\n")
+        file.write("}\n\n")
+
+
+async def scrape_over_http(context, page, file, limiter, progress, first_page=1, pipeline=None):
+    """Procesar la página `first_page` en `page` y descargar las siguientes sin navegador."""
+    print(f"Procesando página {first_page}...")
+    records = await extract_results(page)
+    if await save_page(write_records, file, first_page, records, progress, page.url, pipeline):
+        progress.finish()
+        return
+
+    # La URL del botón "next" sirve de plantilla para las demás páginas: solo cambia startPage
+    url_for = await page_url_template(page, NEXT_SELECTOR, first_page)
+    if url_for is None:
+        print("No se encontró el enlace a la siguiente página con startPage. Finalizando.")
+        progress.finish()
+        return
+
+    async with await open_client(context, page, HTTP_CONNECTIONS) as client:
+        pages = fetch_http_pages(client, lambda page_num: client.build_request("GET", url_for(page_num)),
+                                 parse_response, first_page + 1, MAX_PAGES, HTTP_CONNECTIONS, limiter)
+        async with aclosing(pages):
+            async for page_num, records in pages:
+                print(f"Procesando página {page_num}...")
+                if await save_page(write_records, file, page_num, records, progress, url_for(page_num), pipeline):
+                    break
+    progress.finish()
+
+
+async def scrape_acm_async(context, lean=False, resume=False, http=False, record=False, pipeline=None):
+    """Buscar en ACM Digital Library y guardar los resultados en Data/resultados_ACM.bib.
+
+    Usa una pestaña del BrowserContext `context`; la paginación es con el botón "next" o,
+    con `http`, descargando las páginas sin navegador (ver scrape_over_http). Con `lean` se
+    activa el modo liviano en el contexto, con `resume` se continúa desde el último punto
+    de control (ver Progreso.py) y con `record` se graban las páginas de resultados para
+    reproducirlas sin red (ver Repeticion.py). Con `pipeline` cada página se entrega además
+    al unificador en línea (ver Unificador_duplicador/Flujo.py).
+    """
+    ensure_data_dir()
+    METRICS.bind(source="ACM")
+    progress = Checkpoint("ACM", QUERY)
+    resuming = resume and progress.load()
+    if resuming and progress.finished:
+        print("La búsqueda en ACM ya había terminado; no hay nada que reanudar.")
+        if pipeline is not None:
+            await pipeline.prime(os.path.join("Data", "resultados_ACM.bib"), progress.offset)
+        return
+    if lean:
+        await use_lean_mode(context, **LEAN)
+    if record:
+        start_recording(context, "ACM")
+    limiter = RateLimiter(**RATE_LIMIT)
+    watch_responses(context, limiter)
+
+    start_time = time.time()
+    page = await context.new_page()
+
+    try:
+        # Pasos 1 a 3: Portal, Fac. Ingeniería y "ACM Digital Library"
+        await open_database(page, "//a[contains(@href, 'dl.acm.org')]//span[contains(text(), 'ACM Digital Library')]")
+
+        with METRICS.phase("search"):
+            if resuming and progress.cursor:
+                # Volver a la última página completa; sus artículos ya guardados se omiten
+                await page.goto(progress.cursor)
+                first_page = progress.last_page
             else:
-                print("No se encontró un elemento visible con el texto deseado.")    
-
-
-            # Buscar artículos
-            search_selector = "input[name='AllField']"
-            page.wait_for_selector(search_selector, timeout=60000)
-            page.fill(search_selector, "generative artificial intelligence")
-            page.press(search_selector, "Enter")
-            page.wait_for_selector(".search__item", timeout=60000)
-
-            # Cambiar a 50 artículos por página
-            try:
-                link_50_selector = "a[href*='pageSize=50']"
-                page.wait_for_selector(link_50_selector, timeout=10000)
-                page.click(link_50_selector)
-                page.wait_for_load_state("domcontentloaded")
-                print("Se seleccionó la opción de 50 artículos por página.")
-            except Exception as e:
-                print("No se encontró la opción de 50 artículos por página. Continuando con la configuración predeterminada.")
-
-            # Guardar resultados en un archivo BibTeX
-            filepath = os.path.join("Data", "resultados_ACM.bib")
-            with open(filepath, mode="w", encoding="utf-8") as file:
-                for page_num in range(1, 51):  # Iterar hasta la página 200
+                # Buscar artículos
+                search_selector = "input[name='AllField']"
+                await page.wait_for_selector(search_selector, timeout=60000)
+                await page.fill(search_selector, QUERY)
+                await page.press(search_selector, "Enter")
+                await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+
+                # Cambiar a 50 artículos por página
+                try:
+                    link_50_selector = "a[href*='pageSize=50']"
+                    await page.wait_for_selector(link_50_selector, timeout=10000)
+                    await page.click(link_50_selector)
+                    await page.wait_for_load_state("domcontentloaded")
+                    print("Se seleccionó la opción de 50 artículos por página.")
+                except Exception as e:
+                    print("No se encontró la opción de 50 artículos por página. Continuando con la configuración predeterminada.")
+                first_page = 1
+
+        # Guardar resultados en un archivo BibTeX
+        filepath = os.path.join("Data", "resultados_ACM.bib")
+        with progress.open_output(filepath, resuming) as file:
+            if pipeline is not None and progress.offset:
+                # Los artículos guardados antes de reanudar también van a la salida unificada
+                await pipeline.prime(filepath, progress.offset)
+            if http:
+                await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+                await scrape_over_http(context, page, file, limiter, progress, first_page, pipeline)
+            else:
+                for page_num in range(first_page, MAX_PAGES + 1):  # Iterar hasta la página 50
                     print(f"Procesando página {page_num}...")
 
                     # Revalidar que los resultados están disponibles
-                    page.wait_for_selector(".search__item", timeout=60000)
-                    results = page.query_selector_all(".search__item")
-
-                    for i, result in enumerate(results):
-                        try:
-                            # Extraer información del artículo
-                            title = result.query_selector(".hlFld-Title a").inner_text() if result.query_selector(".hlFld-Title a") else "Unknown"
-                            link = result.query_selector(".hlFld-Title a").get_attribute("href") if result.query_selector(".hlFld-Title a") else "Unknown"
-                            authors = result.query_selector(".rlist--inline").inner_text() if result.query_selector(".rlist--inline") else "Unknown"
-
-                            year_element = result.query_selector(".bookPubDate")
-                            year = re.search(r'\b\d{4}\b', year_element.inner_text()).group(0) if year_element and re.search(r'\b\d{4}\b', year_element.inner_text()) else "Unknown"
-                            journal = result.query_selector(".issue-item__detail").inner_text() if result.query_selector(".issue-item__detail") else "Unknown"
-                            abstract = result.query_selector(".issue-item__abstract").inner_text() if result.query_selector(".issue-item__abstract") else "Unknown"
-
-                            # Escribir en formato BibTeX
-                            file.write(f"@article{{ref{page_num}_{i},\n")
-                            file.write(f"  title = {{{title}}},\n")
-                            file.write(f"  author = {{{authors}}},\n")
-                            file.write(f"  year = {{{year}}},\n")
-                            file.write(f"  journal = {{{journal}}},\n")
-                            file.write(f"  abstract = {{{abstract}}},\n")
-                            file.write(f"  url = {{{'https://dl.acm.org' + link}}}\n")
-                            file.write("}\n\n")
-                        except Exception as e:
-                            print(f"Error al procesar un resultado en la página {page_num}: {e}")
+                    await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+                    records = await extract_results(page)
+                    if await save_page(write_records, file, page_num, records, progress, page.url, pipeline):
+                        progress.finish()
+                        break
 
                     # Avanzar a la siguiente página con reintentos
+                    marker = await results_marker(page, RESULTS_SELECTOR)
                     retries = 3
                     while retries > 0:
                         try:
-                            next_button = page.query_selector(".pagination__btn--next")
+                            # Si un intento anterior sí cambió la página, no se vuelve a hacer clic
+                            if retries < 3 and await results_marker(page, RESULTS_SELECTOR) != marker:
+                                break
+                            next_button = await page.query_selector(NEXT_SELECTOR)
                             if next_button:
-                                next_button.click()
-                                time.sleep(6)  # Esperar 3 segundos antes de cargar la siguiente página
-                                page.wait_for_load_state("domcontentloaded", timeout=90000)  # Incrementar el tiempo de espera
+                                await limiter.acquire()
+                                with METRICS.phase("page_load"):
+                                    await next_button.click()
+                                    # Esperar a que aparezcan los resultados de la siguiente página
+                                    await wait_for_new_results(page, RESULTS_SELECTOR, marker, timeout=90000)
+                                limiter.success()
                                 break
                             else:
                                 print("No se encontró el botón de siguiente. Finalizando.")
+                                progress.finish()
                                 return
                         except Exception as e:
                             retries -= 1
+                            METRICS.count("retries")
+                            limiter.failure()  # El limitador espera más antes del siguiente intento
                             print(f"Reintentando cargar la página {page_num + 1}. Intentos restantes: {retries}")
-                            time.sleep(5)  # Pausa antes del siguiente intento
                     else:
                         print(f"Error al intentar cargar la página {page_num + 1}. Finalizando.")
                         break
+                else:
+                    progress.finish()
 
-            print(f"Los artículos se guardaron exitosamente en {filepath}")
-        except Exception as e:
-            print(f"Error general: {e}")
-        finally:
-            browser.close()
-            end_time = time.time()
-            print(f"Scraper para ACM finalizado en {end_time - start_time:.2f} segundos.\n")
-
-# Llamar a la función
-scrape_acm()
\ No newline at end of file
+        print(f"Los artículos se guardaron exitosamente en {filepath}")
+    except Exception as e:
+        print(f"Error general: {e}")
+    finally:
+        await page.close()
+        end_time = time.time()
+        print(f"Scraper para ACM finalizado en {end_time - start_time:.2f} segundos.\n")
+
+
+def scrape_acm(lean=False, resume=False, http=False, record=False):
+    run_alone(scrape_acm_async, headless=lean, lean=lean, resume=resume, http=http, record=record)
+
+
+if __name__ == "__main__":
+    # Llamar a la función (con --resume se continúa desde el último punto de control)
+    args = source_parser("ACM").parse_args()
+    scrape_acm(lean=args.lean, resume=args.resume, http=args.http, record=args.record)
@@ -0,0 +1,170 @@
+import Rutas  # Agrega Unificador_duplicador al path: va antes que los demás imports
+from playwright.async_api import async_playwright
+from ClienteHTTP import fetch_http_pages, new_client
+from Extraccion import STRATEGIES, extract_items_from_html
+from Repeticion import FIXTURES_DIR, api_fixture, fixture_paths, load_expected, replay_page, serve_fixtures
+import ACM
+import IEE
+import Sage
+import argparse
+import asyncio
+import json
+import os
+import time
+
+"""
+Benchmark de la extracción de resultados con las páginas grabadas en Data/fixtures.
+
+Por cada fuente y estrategia se extraen todas las páginas grabadas (ver Repeticion.py)
+y se informa cuántas páginas y artículos por segundo se procesan. Las estrategias son:
+- evaluate y handles: las de Extraccion.py, en Chromium; cada página se muestra con
+  page.route sin red y solo se mide la extracción.
+- html: el HTML de cada página leído con lxml (Extraccion.extract_items_from_html).
+- http: descarga desde un servidor local más el parse_response de cada fuente, como en
+  el modo HTTP. Para IEEE se descargan las respuestas grabadas de la API /rest/search
+  (NNNN.api.json), que es lo que lee IEE.py en ese modo.
+
+Además cuenta, por campo, los artículos que quedaron en "Unknown" y los que no se
+pudieron procesar, y cuántas páginas dan un resultado distinto de la salida esperada que
+se grabó con cada página (ver Repeticion.py): si un selector deja de funcionar se nota
+aquí sin entrar al sitio.
+
+Uso: python Scraping/Benchmark_extraccion.py [ACM] [IEEE] [Sage] [--strategies evaluate handles html http]
+                                             [--repeat N] [--json archivo]
+"""
+
+SOURCES = {"ACM": ACM, "IEEE": IEE, "Sage": Sage}
+ALL_STRATEGIES = (*STRATEGIES, "html", "http")
+
+
+async def _browser_pages(browser, module, pages, strategy):
+    page = await browser.new_page()
+    try:
+        results, elapsed = [], 0.0
+        for html in pages:
+            await replay_page(page, html)
+            try:
+                await page.wait_for_selector(module.RESULTS_SELECTOR, timeout=5000)
+            except Exception:
+                pass  # Sin resultados: la página cuenta con cero artículos
+            start = time.perf_counter()
+            results.append(await module.extract_results(page, STRATEGIES[strategy]))
+            elapsed += time.perf_counter() - start
+        return results, elapsed
+    finally:
+        await page.close()
+
+
+def _html_pages(module, pages):
+    start = time.perf_counter()
+    results = [module.to_records(extract_items_from_html(html, module.RESULTS_SELECTOR, module.FIELDS))
+               for html in pages]
+    return results, time.perf_counter() - start
+
+
+async def _http_pages(module, urls):
+    async with new_client() as client:
+        start = time.perf_counter()
+        results = [records async for _, records in
+                   fetch_http_pages(client, lambda page_num: client.build_request("GET", urls[page_num - 1]),
+                                    module.parse_response, 1, len(urls), 4)]
+        return results, time.perf_counter() - start
+
+
+def summarize(source, strategy, results, elapsed, expected=None):
+    """Resumen de una medición: tiempos, artículos, campos que quedaron sin valor y páginas
+    que no coinciden con su salida esperada (`expected`, None en las que no la tienen)."""
+    records = [record for page in results for record in page]
+    unknown = {}
+    for record in records:
+        for field, value in (record or {}).items():
+            if value == "Unknown" or value.endswith("Unknown"):
+                unknown[field] = unknown.get(field, 0) + 1
+    return {
+        "source": source,
+        "strategy": strategy,
+        "pages": len(results),
+        "records": len(records),
+        "failed": records.count(None),
+        "seconds": round(elapsed, 6),
+        "pages_per_second": round(len(results) / elapsed, 2) if elapsed else None,
+        "records_per_second": round(len(records) / elapsed, 2) if elapsed else None,
+        "unknown_fields": unknown,
+        "pages_checked": sum(page is not None for page in expected or ()),
+        "pages_changed": None if expected is None else sum(page != want for page, want in zip(results, expected)
+                                                           if want is not None),
+    }
+
+
+async def run_benchmark(*sources, strategies=ALL_STRATEGIES, repeat=3, directory=FIXTURES_DIR):
+    """Medir cada estrategia sobre las páginas grabadas; se queda con la mejor de `repeat` vueltas."""
+    summaries = []
+    async with async_playwright() as p:
+        browser = None
+        try:
+            with serve_fixtures(directory) as base_url:
+                for source in sources or SOURCES:
+                    module = SOURCES[source]
+                    paths = fixture_paths(source, directory)
+                    if not paths:
+                        print(f"No hay páginas grabadas de {source} en {directory}; se omite.")
+                        continue
+                    pages = []
+                    for path in paths:
+                        with open(path, encoding="utf-8") as file:
+                            pages.append(file.read())
+                    expected = [load_expected(path) for path in paths]
+                    # En modo HTTP, IEEE lee la API JSON: se usan sus respuestas grabadas
+                    http_paths = paths
+                    if hasattr(module, "API_PATH"):
+                        http_paths = [api_fixture(path) for path in paths if os.path.exists(api_fixture(path))]
+                    http_expected = [load_expected(path) for path in http_paths]
+                    urls = [base_url + os.path.relpath(path, directory).replace(os.sep, "/") for path in http_paths]
+
+                    for strategy in strategies:
+                        if strategy == "http" and not urls:
+                            print(f"No hay respuestas grabadas de la API de {source}; se omite la estrategia http.")
+                            continue
+                        if strategy in STRATEGIES and browser is None:
+                            browser = await p.chromium.launch(headless=True)
+                        best = None
+                        for _ in range(repeat):
+                            if strategy in STRATEGIES:
+                                results, elapsed = await _browser_pages(browser, module, pages, strategy)
+                            elif strategy == "html":
+                                results, elapsed = _html_pages(module, pages)
+                            else:
+                                results, elapsed = await _http_pages(module, urls)
+                            if best is None or elapsed < best[1]:
+                                best = (results, elapsed)
+                        summary = summarize(source, strategy, *best,
+                                            http_expected if strategy == "http" else expected)
+                        summaries.append(summary)
+                        print(f"{source:5} {strategy:9} {summary['pages']:5} páginas {summary['records']:7} artículos "
+                              f"{summary['seconds']:9.4f} s {summary['pages_per_second'] or 0:10.1f} pág/s "
+                              f"{summary['records_per_second'] or 0:11.1f} art/s "
+                              f"{summary['pages_changed'] or 0}/{summary['pages_checked']} distintas de lo esperado")
+        finally:
+            if browser is not None:
+                await browser.close()
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Medir la extracción con las páginas grabadas.")
+    parser.add_argument("sources", nargs="*", help=f"Fuentes a medir: {', '.join(SOURCES)} (por defecto todas)")
+    parser.add_argument("--strategies", nargs="+", default=list(ALL_STRATEGIES),
+                        help=f"Estrategias a medir: {', '.join(ALL_STRATEGIES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Vueltas por estrategia (se informa la mejor)")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Carpeta con las páginas grabadas")
+    parser.add_argument("--json", help="Archivo donde guardar los resultados en JSON")
+    args = parser.parse_args()
+    unknown = [name for name in args.sources if name not in SOURCES]
+    unknown += [name for name in args.strategies if name not in ALL_STRATEGIES]
+    if unknown:
+        parser.error(f"Fuentes o estrategias desconocidas: {', '.join(unknown)}")
+    summaries = asyncio.run(run_benchmark(*args.sources, strategies=args.strategies, repeat=max(1, args.repeat),
+                                          directory=args.fixtures))
+    if args.json:
+        with open(args.json, mode="w", encoding="utf-8") as file:
+            json.dump(summaries, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,75 @@
+try:
+    import httpx
+except ImportError:  # httpx es opcional: solo se necesita en el modo HTTP
+    httpx = None
+try:
+    import h2
+except ImportError:  # Sin h2 el cliente usa HTTP/1.1
+    h2 = None
+from Limitador import THROTTLE_STATUSES, Throttled, retry_delay
+from Navegador import fetch_in_order
+
+"""
+Modo HTTP: las páginas de resultados se descargan sin navegador.
+
+El navegador solo hace el recorrido por el portal, el login y la primera búsqueda. Después
+open_client crea un cliente httpx con las cookies de ese BrowserContext (y el mismo
+User-Agent), y fetch_http_pages pide las páginas siguientes como HTML o JSON con ese
+cliente: cada página cuesta una petición en lugar de cargar y dibujar todo en una
+pestaña. El cliente reutiliza las conexiones (keep-alive), usa HTTP/2 si está instalado
+el paquete h2 y no abre más de `max_connections` a la vez.
+
+Cada scraper decide cómo se arma la petición de la página n y cómo se leen los registros
+de la respuesta (ACM y Sage leen el HTML con Extraccion.extract_items_from_html; IEEE usa
+la API JSON de su buscador), así que se puede probar contra un servidor local que
+responda como el sitio.
+"""
+
+MAX_CONNECTIONS = 4
+
+
+async def open_client(context, page, max_connections=MAX_CONNECTIONS):
+    """Cliente HTTP asíncrono con las cookies de `context` y los encabezados de `page`."""
+    if httpx is None:
+        raise RuntimeError("Para el modo HTTP hay que instalar el paquete httpx (y h2 para HTTP/2)")
+    cookies = httpx.Cookies()
+    for cookie in await context.cookies():
+        cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+    headers = {
+        "User-Agent": await page.evaluate("navigator.userAgent"),
+        "Accept-Language": await page.evaluate("navigator.language"),
+        "Referer": page.url,
+    }
+    return new_client(cookies, headers, max_connections)
+
+
+def new_client(cookies=None, headers=None, max_connections=MAX_CONNECTIONS):
+    """Cliente HTTP asíncrono con keep-alive, HTTP/2 si hay h2 y a lo sumo `max_connections`."""
+    if httpx is None:
+        raise RuntimeError("Para el modo HTTP hay que instalar el paquete httpx (y h2 para HTTP/2)")
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.AsyncClient(http2=h2 is not None, cookies=cookies, headers=headers, limits=limits,
+                             follow_redirects=True, timeout=60)
+
+
+async def fetch_http_pages(client, build_request, parse, first, last, concurrency, limiter=None, retries=2):
+    """Descargar con `client` las páginas `first`..`last`, hasta `concurrency` a la vez.
+
+    `build_request(n)` devuelve la petición (httpx.Request) de la página n y
+    `parse(response)` la lista de registros de la respuesta. El orden, la ventana, los
+    reintentos y el final de la búsqueda son los de Navegador.fetch_in_order; un 429 o
+    503 baja el ritmo de `limiter` respetando Retry-After.
+    """
+    async def load(page_num):
+        request = build_request(page_num)
+        response = await client.send(request)
+        if response.status_code in THROTTLE_STATUSES:
+            raise Throttled(response.status_code, retry_delay(response))
+        response.raise_for_status()
+        # Si el sitio manda a otro dominio (el login), las cookies ya no sirven
+        if response.url.host != request.url.host:
+            raise RuntimeError(f"el sitio redirigió a {response.url.host}; la sesión ya no es válida")
+        return parse(response)
+
+    async for item in fetch_in_order(load, first, last, concurrency, limiter, retries):
+        yield item
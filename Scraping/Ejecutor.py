@@ -0,0 +1,127 @@
+import Rutas  # Agrega Unificador_duplicador al path: va antes que los demás imports
+from playwright.async_api import async_playwright
+from ACM import scrape_acm_async
+from IEE import scrape_ieee_async
+from Navegador import METRICS
+from Sage import scrape_sage_async
+from Flujo import Pipeline  # En Unificador_duplicador
+from Indice import update_index
+import argparse
+import asyncio
+import time
+
+"""
+Ejecutor que corre los scrapers de ACM, IEEE y Sage al mismo tiempo.
+
+Se abre un solo Chromium y cada fuente trabaja en su propio BrowserContext (cookies y
+sesión separadas), así que el tiempo total se acerca al de la fuente más lenta en lugar
+de ser la suma de las tres. Las opciones de cada fuente (por ejemplo cuántas pestañas
+puede abrir a la vez) se pasan a su scraper desde OPTIONS.
+
+Con --lean todas las fuentes corren sin ventana y en modo liviano (sin imágenes, estilos,
+fuentes ni rastreadores; ver Navegador.use_lean_mode). También se puede activar solo en
+algunas fuentes con la opción "lean" de OPTIONS.
+
+Con --resume cada fuente continúa desde su último punto de control en lugar de empezar
+de cero (ver Progreso.py).
+
+Al terminar, los tiempos por fase y fuente (portal, login, búsqueda, carga, extracción y
+escritura de cada página) y los contadores de páginas, artículos, reintentos y errores se
+exportan a Data/metricas (ver Unificador_duplicador/Metricas.py).
+
+Con --http el navegador solo inicia sesión y abre la primera página de resultados; las
+demás se descargan sin navegador con las cookies de la sesión (ver ClienteHTTP.py).
+
+Con --record las páginas de resultados que se procesan con el navegador se guardan en
+Data/fixtures para medir y probar la extracción sin red (ver Repeticion.py y
+Benchmark_extraccion.py).
+
+Con --pipeline los artículos se unifican mientras se descargan: cada fuente entrega sus
+páginas a una cola acotada y Data/unificados.bib y Data/duplicados.bib están completos
+al terminar la última página, sin correr después Categorizacion.py (ver
+Unificador_duplicador/Flujo.py); después se actualiza el índice de búsqueda (Indice.py).
+
+Uso: python Scraping/Ejecutor.py [ACM] [IEEE] [Sage] [--headless] [--lean] [--resume] [--http] [--record]
+                                 [--pipeline] [--sage-tabs N]
+"""
+
+SOURCES = {
+    "ACM": scrape_acm_async,
+    "IEEE": scrape_ieee_async,
+    "Sage": scrape_sage_async,
+}
+
+# Opciones por fuente que recibe cada scraper como argumentos con nombre. ACM e IEEE
+# avanzan con clics en una sola pestaña; Sage abre sus páginas por URL en varias.
+OPTIONS = {
+    "Sage": {"max_tabs": 4},
+}
+
+
+async def _run_source(browser, name, options):
+    context = await browser.new_context()
+    try:
+        await SOURCES[name](context, **options)
+    finally:
+        await context.close()
+
+
+async def run_scrapers(*names, headless=False, options=None, pipeline=False):
+    """Correr los scrapers indicados (todos si no se indica ninguno) en un solo navegador.
+
+    `options` permite cambiar, por fuente, las opciones de OPTIONS. Un error en una
+    fuente no detiene a las demás. Con `pipeline` los resultados de todas las fuentes se
+    unifican a medida que llegan.
+    """
+    names = names or tuple(SOURCES)
+    options = {name: {**OPTIONS.get(name, {}), **(options or {}).get(name, {})} for name in names}
+    start_time = time.time()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        unifier = Pipeline() if pipeline else None
+        try:
+            if unifier is not None:
+                unifier.start()
+            results = await asyncio.gather(*(_run_source(browser, name, {**options[name], "pipeline": unifier})
+                                             for name in names), return_exceptions=True)
+        finally:
+            await browser.close()
+            if unifier is not None:
+                # Terminar de unificar lo que quedó en la cola y actualizar el índice de búsqueda
+                await unifier.close()
+                await asyncio.to_thread(update_index, unifier.unified_path)
+
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            print(f"Error en el scraper de {name}: {result}")
+    end_time = time.time()
+    print(f"Scrapers ({', '.join(names)}) finalizados en {end_time - start_time:.2f} segundos.")
+    METRICS.export("scrapers")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correr los scrapers de forma concurrente.")
+    parser.add_argument("sources", nargs="*", help=f"Fuentes a procesar: {', '.join(SOURCES)} (por defecto todas)")
+    parser.add_argument("--headless", action="store_true", help="No mostrar la ventana del navegador")
+    parser.add_argument("--lean", action="store_true",
+                        help="Modo liviano sin ventana: bloquear imágenes, estilos, fuentes y rastreadores")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar cada fuente desde su último punto de control")
+    parser.add_argument("--http", action="store_true",
+                        help="Descargar las páginas de resultados sin navegador después de la primera")
+    parser.add_argument("--record", action="store_true",
+                        help="Guardar las páginas de resultados en Data/fixtures para reproducirlas sin red")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Unificar los artículos mientras se descargan (unificados.bib y duplicados.bib)")
+    parser.add_argument("--sage-tabs", type=int, default=OPTIONS["Sage"]["max_tabs"],
+                        help="Pestañas que usa Sage para descargar páginas en paralelo")
+    args = parser.parse_args()
+    unknown = [name for name in args.sources if name not in SOURCES]
+    if unknown:
+        parser.error(f"Fuentes desconocidas: {', '.join(unknown)}")
+    options = {name: {"lean": args.lean, "resume": args.resume, "http": args.http, "record": args.record}
+               for name in SOURCES}
+    options["Sage"]["max_tabs"] = max(1, args.sage_tabs)
+    asyncio.run(run_scrapers(*args.sources, headless=args.headless or args.lean, options=options,
+                             pipeline=args.pipeline))
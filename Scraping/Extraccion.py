@@ -0,0 +1,158 @@
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:  # lxml y cssselect son opcionales: solo se necesitan en el modo HTTP
+    lxml = None
+import re
+
+"""
+Extracción de los resultados de una página con una sola llamada al navegador.
+
+Cada scraper describe sus campos con un mapa de selectores:
+
+    {"title": {"selector": ".hlFld-Title a"},
+     "link": {"selector": ".hlFld-Title a", "attr": "href"},
+     "types": {"selector": "span[xplhighlight]", "all": True},
+     "publisher": {"selector": "span.title", "sibling": True}}
+
+`selector` se busca dentro de cada resultado; `attr` lee un atributo en lugar del texto
+visible (innerText); `all` devuelve la lista de todos los elementos que coinciden y
+`sibling` lee el elemento hermano siguiente. Los campos sin elemento quedan en None.
+
+extract_items recorre todos los resultados dentro de la página con un solo
+eval_on_selector_all y devuelve la lista de diccionarios, en lugar de pedir cada campo
+de cada resultado por separado. extract_items_with_handles produce lo mismo con
+ElementHandle (una llamada por campo) y sirve para comparar las dos estrategias.
+
+extract_items_from_html aplica el mismo mapa de selectores a un HTML descargado sin
+navegador (modo HTTP, ver ClienteHTTP.py) con lxml. El texto visible se aproxima como lo
+hace innerText: los elementos de bloque y <br> separan líneas y los espacios seguidos
+se juntan en uno.
+"""
+
+_EXTRACT_JS = """
+(items, fields) => items.map(item => {
+    const record = {};
+    for (const [name, spec] of Object.entries(fields)) {
+        const read = element => {
+            if (spec.sibling) element = element.nextElementSibling;
+            if (!element) return null;
+            return spec.attr ? element.getAttribute(spec.attr) : element.innerText;
+        };
+        if (spec.all) {
+            record[name] = Array.from(item.querySelectorAll(spec.selector), read);
+        } else {
+            const element = item.querySelector(spec.selector);
+            record[name] = element ? read(element) : null;
+        }
+    }
+    return record;
+})
+"""
+
+
+async def extract_items(page, items_selector, fields):
+    """Leer los campos `fields` de cada elemento `items_selector` con una sola llamada."""
+    return await page.eval_on_selector_all(items_selector, _EXTRACT_JS, fields)
+
+
+async def _read_handle(element, spec):
+    if spec.get("sibling"):
+        element = await element.query_selector("xpath=following-sibling::*[1]")
+        if not element:
+            return None
+    if spec.get("attr"):
+        return await element.get_attribute(spec["attr"])
+    return await element.inner_text()
+
+
+async def extract_items_with_handles(page, items_selector, fields):
+    """Igual que extract_items, pero campo por campo con ElementHandle."""
+    records = []
+    for item in await page.query_selector_all(items_selector):
+        record = {}
+        for name, spec in fields.items():
+            if spec.get("all"):
+                record[name] = [await _read_handle(element, spec)
+                                for element in await item.query_selector_all(spec["selector"])]
+            else:
+                element = await item.query_selector(spec["selector"])
+                record[name] = await _read_handle(element, spec) if element else None
+        records.append(record)
+    return records
+
+
+# Elementos que innerText separa en líneas propias
+_BLOCK_TAGS = frozenset((
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "figcaption", "figure", "footer",
+    "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre",
+    "section", "table", "tr", "ul",
+))
+_HIDDEN_TAGS = frozenset(("script", "style", "template", "noscript"))
+_SPACES = re.compile(r"[ \t\r\n\f]+")
+_selectors = {}
+
+
+def _select(element, selector):
+    # Como querySelectorAll, solo busca entre los descendientes de `element`
+    if selector not in _selectors:
+        _selectors[selector] = CSSSelector(selector)
+    return [found for found in _selectors[selector](element) if found is not element]
+
+
+def _inner_text(element):
+    """Aproximación de innerText para un elemento de lxml."""
+    parts = []
+
+    def walk(node):
+        if not isinstance(node.tag, str) or node.tag in _HIDDEN_TAGS:
+            return
+        block = node.tag in _BLOCK_TAGS
+        if block or node.tag == "br":
+            parts.append("\n")
+        if node.text:
+            parts.append(_SPACES.sub(" ", node.text))
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(_SPACES.sub(" ", child.tail))
+        if block:
+            parts.append("\n")
+
+    walk(element)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _read_element(element, spec):
+    if spec.get("sibling"):
+        element = element.getnext()
+        if element is None:
+            return None
+    if spec.get("attr"):
+        return element.get(spec["attr"])
+    return _inner_text(element)
+
+
+def extract_items_from_html(html, items_selector, fields):
+    """Igual que extract_items, pero sobre el texto HTML de una página descargada."""
+    if lxml is None:
+        raise RuntimeError("Para leer páginas sin navegador hay que instalar los paquetes lxml y cssselect")
+    document = lxml.html.fromstring(html)
+    records = []
+    for item in _select(document, items_selector):
+        record = {}
+        for name, spec in fields.items():
+            if spec.get("all"):
+                record[name] = [_read_element(element, spec) for element in _select(item, spec["selector"])]
+            else:
+                found = _select(item, spec["selector"])
+                record[name] = _read_element(found[0], spec) if found else None
+        records.append(record)
+    return records
+
+
+STRATEGIES = {
+    "evaluate": extract_items,
+    "handles": extract_items_with_handles,
+}
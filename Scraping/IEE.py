@@ -1,5 +1,14 @@
-from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+import Rutas  # Agrega Unificador_duplicador al path: va antes que los demás imports
+from ClienteHTTP import fetch_http_pages, open_client
+from Extraccion import extract_items
+from Limitador import RateLimiter, watch_responses
+from Navegador import (LEAN_RESOURCES, METRICS, ensure_data_dir, google_login, open_database, results_marker,
+                       resume_session, run_alone, save_page, save_session, source_parser, use_lean_mode,
+                       wait_for_new_results, with_query)
+from Progreso import Checkpoint
+from Repeticion import record_snapshot, start_recording
+from contextlib import aclosing
+from urllib.parse import parse_qs, urlsplit
 import os
 import re
 import time
@@ -8,199 +17,320 @@ import time
 # USO DE CHATGPT PARA LA ESTRUCTURA DE LOS SCRAPES
 # -------------------------------------------------------------
 
-# Carga variables desde .env en la raíz del proyecto
-load_dotenv()
-
-def scrape_ieee():
-
-    # Crear la carpeta "Data" si no existe
-    if not os.path.exists("Data"):
-        os.makedirs("Data")
-
-    with sync_playwright() as p:
-        start_time = time.time()
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
-
+QUERY = "generative artificial intelligence"
+RESULTS_SELECTOR = ".List-results-items"
+MAX_PAGE = 45
+API_PATH = "/rest/search"
+
+# Modo liviano: se conservan las hojas de estilo porque la paginación depende de
+# qué botones están visibles (ver Navegador.use_lean_mode)
+LEAN = {"resources": LEAN_RESOURCES - {"stylesheet"}}
+
+# Ritmo inicial y máximo de páginas por segundo (ver Limitador.py)
+RATE_LIMIT = {"rate": 0.25, "max_rate": 1.0}
+
+# Conexiones simultáneas en modo HTTP (ver ClienteHTTP.py)
+HTTP_CONNECTIONS = 2
+
+# Campos de cada resultado (ver Extraccion.py)
+FIELDS = {
+    "title": {"selector": "a.fw-bold"},
+    "link": {"selector": "a.fw-bold", "attr": "href"},
+    "authors": {"selector": ".text-base-md-lh"},
+    "journal": {"selector": "div.description > a[xplhighlight]"},
+    "info": {"selector": ".publisher-info-container"},
+    "types": {"selector": "span[xplhighlight]", "all": True},
+    # Título "Publisher:" y el span hermano que contiene el nombre (IEEE)
+    "publisher_label": {"selector": "button[xplhighlight] span.title"},
+    "publisher": {"selector": "button[xplhighlight] span.title", "sibling": True},
+    "abstract": {"selector": ".twist-container"},
+}
+
+
+def to_record(raw):
+    """Convertir los textos leídos de un resultado en los campos del artículo (None sin título)."""
+    if raw["title"] is None:
+        return None
+
+    match = re.search(r'\b\d{4}\b', raw["info"]) if raw["info"] is not None else None
+
+    tipo = "Unknown"
+    for text in raw["types"]:
+        text = (text or "").strip()
+        # Excluir si contiene "Year:", "Volume:", "Issue:" O cualquier dígito (0-9)
+        if not ("Year:" in text or "Volume:" in text or "Issue:" in text or re.search(r'\d', text)):
+            tipo = text
+            break
+
+    if raw["publisher_label"] and "Publisher:" in raw["publisher_label"] and raw["publisher"] is not None:
+        publisher = raw["publisher"].strip()
+    else:
+        publisher = "Unknown"
+
+    return {
+        "title": raw["title"],
+        "author": raw["authors"].replace("\n", " ").strip() if raw["authors"] is not None else "Unknown",
+        "year": match.group(0) if match else "Unknown",
+        "journal": raw["journal"] if raw["journal"] is not None else "Unknown",
+        "tipo": tipo,
+        "publisher": publisher,
+        "abstract": raw["abstract"] if raw["abstract"] is not None else "Unknown",
+        "url": f"https://ieeexplore.ieee.org{raw['link']}",
+    }
+
+
+def to_records(raws):
+    """Convertir los resultados leídos en artículos (None si uno no se pudo procesar)."""
+    records = []
+    for raw in raws:
         try:
-
-            # Paso 1: Acceder a la página principal
-            page.goto("https://library.uniquindio.edu.co/databases")
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 2: Hacer clic en "Fac. Ingeniería"
-            fac_ingenieria_selector = "div[data-content-listing-item='fac-ingenier-a']"
-            page.click(fac_ingenieria_selector)
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 3: Hacer clic en "IEEXPLORER) "
-            elements = page.locator("//a[contains(@href, \"https://ieeexplore-ieee-org.crai.referencistas.com/Xplore/home.jsp\")]//span[contains(text(), \"IEEE (Institute of Electrical and Electronics Engineers) - (DESCUBRIDOR)\")]")
-            count = elements.count()
-
-            for i in range(count):
-                if elements.nth(i).is_visible():
-                    elements.nth(i).click()
-                    page.wait_for_load_state("domcontentloaded")
-                    print(f"Se hizo clic en el elemento {i+1}")
+            records.append(to_record(raw))
+        except Exception as e:
+            print(f"Error al procesar un resultado: {e}")
+            records.append(None)
+    return records
+
+
+@METRICS.timed("extraction")
+async def extract_results(page, strategy=extract_items):
+    """Extraer los artículos de la página de resultados cargada en `page` (None si uno falla)."""
+    records = to_records(await strategy(page, RESULTS_SELECTOR, FIELDS))
+    await record_snapshot(page, records)
+    return records
+
+
+def _plain(text):
+    # La API marca con [::texto::] las palabras resaltadas
+    return text.replace("[::", "").replace("::]", "").strip() if text else None
+
+
+def api_record(item):
+    """Convertir un resultado de la API de búsqueda de IEEE en los campos del artículo."""
+    if not item.get("articleTitle"):
+        return None
+    authors = "; ".join(_plain(author.get("preferredName") or author.get("normalizedName") or "")
+                        for author in item.get("authors", []))
+    return {
+        "title": _plain(item["articleTitle"]),
+        "author": authors or "Unknown",
+        "year": str(item.get("publicationYear") or "Unknown"),
+        "journal": _plain(item.get("publicationTitle")) or "Unknown",
+        "tipo": item.get("articleContentType") or item.get("contentType") or "Unknown",
+        "publisher": item.get("publisher") or "Unknown",
+        "abstract": _plain(item.get("abstract")) or "Unknown",
+        "url": f"https://ieeexplore.ieee.org{item.get('documentLink', '')}",
+    }
+
+
+def api_records(data):
+    """Artículos de una respuesta de la API de búsqueda ya decodificada."""
+    records = []
+    for item in data.get("records", []):
+        try:
+            records.append(api_record(item))
+        except Exception as e:
+            print(f"Error al procesar un resultado: {e}")
+            records.append(None)
+    return records
+
+
+def parse_response(response):
+    """Artículos de una respuesta de la API de búsqueda (modo HTTP)."""
+    return api_records(response.json())
+
+
+@METRICS.timed("write")
+def write_records(file, page_num, records):
+    """Escribir en formato BibTeX los artículos de una página."""
+    METRICS.count("pages")
+    METRICS.count("records", sum(record is not None for record in records))
+    for i, record in enumerate(records):
+        if record is None:
+            continue
+        file.write(f"@article{{ref{page_num}_{i},\n")
+        file.write(f"  title = {{{record['title']}}},\n")
+        file.write(f"  author = {{{record['author']}}},\n")
+        file.write(f"  year = {{{record['year']}}},\n")
+        file.write(f"  journal = {{{record['journal']}}},\n")
+        file.write(f"  tipo = {{{record['tipo']}}},\n")
+        file.write(f"  publisher = {{{record['publisher']}}},\n")
+        file.write(f"  abstract = {{{record['abstract']}}},\n")
+        file.write(f"  url = {{{record['url']}}}\n")
+        file.write("}\n\n")
+
+
+async def scrape_over_http(context, page, file, limiter, progress, first_page=1, pipeline=None):
+    """Procesar la página `first_page` en `page` y pedir las siguientes a la API sin navegador.
+
+    Las páginas de resultados de IEEE se dibujan con JavaScript a partir de la API JSON
+    /rest/search, así que en modo HTTP se le pide a esa API cada página directamente.
+    """
+    print(f"Procesando página {first_page}...")
+    records = await extract_results(page)
+    if await save_page(write_records, file, first_page, records, progress, page.url, pipeline):
+        progress.finish()
+        return
+
+    parts = urlsplit(page.url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    rows_per_page = parse_qs(parts.query).get("rowsPerPage", ["25"])[0]
+
+    async with await open_client(context, page, HTTP_CONNECTIONS) as client:
+        def build_request(page_num):
+            search = {"queryText": QUERY, "highlight": False, "returnType": "SEARCH", "matchPubs": True,
+                      "rowsPerPage": int(rows_per_page), "pageNumber": page_num}
+            return client.build_request("POST", origin + API_PATH, json=search,
+                                        headers={"Origin": origin, "Accept": "application/json"})
+
+        pages = fetch_http_pages(client, build_request, parse_response, first_page + 1, MAX_PAGE,
+                                 HTTP_CONNECTIONS, limiter)
+        async with aclosing(pages):
+            async for page_num, records in pages:
+                print(f"Procesando página {page_num}...")
+                if await save_page(write_records, file, page_num, records, progress,
+                                   with_query(page.url, pageNumber=page_num), pipeline):
                     break
+    progress.finish()
+
+
+async def scrape_ieee_async(context, lean=False, resume=False, http=False, record=False, pipeline=None):
+    """Buscar en IEEE Xplore y guardar los resultados en Data/resultados_ieee.bib.
+
+    Usa una pestaña del BrowserContext `context`; la paginación es con los botones numerados
+    o, con `http`, pidiendo las páginas a la API sin navegador (ver scrape_over_http). Con
+    `lean` se activa el modo liviano en el contexto, con `resume` se continúa desde el
+    último punto de control (ver Progreso.py) y con `record` se graban las páginas de
+    resultados para reproducirlas sin red (ver Repeticion.py). Con `pipeline` cada página se
+    entrega además al unificador en línea (ver Unificador_duplicador/Flujo.py).
+    """
+    ensure_data_dir()
+    METRICS.bind(source="IEEE")
+    progress = Checkpoint("IEEE", QUERY)
+    resuming = resume and progress.load()
+    if resuming and progress.finished:
+        print("La búsqueda en IEEE ya había terminado; no hay nada que reanudar.")
+        if pipeline is not None:
+            await pipeline.prime(os.path.join("Data", "resultados_ieee.bib"), progress.offset)
+        return
+    if lean:
+        await use_lean_mode(context, **LEAN)
+    if record:
+        start_recording(context, "IEEE", api_path=API_PATH, parse_api=api_records)
+    limiter = RateLimiter(**RATE_LIMIT)
+    watch_responses(context, limiter)
+
+    start_time = time.time()
+    page = await context.new_page()
+
+    try:
+        # Entrar con la sesión guardada o, si no sirve, por el portal con login
+        search_selector = 'input[type="search"]'
+        if not await resume_session(context, page, "ieee", search_selector):
+            # Pasos 1 a 3: Portal, Fac. Ingeniería e "IEEE (DESCUBRIDOR)"
+            await open_database(page, "//a[contains(@href, \"https://ieeexplore-ieee-org.crai.referencistas.com/Xplore/home.jsp\")]//span[contains(text(), \"IEEE (Institute of Electrical and Electronics Engineers) - (DESCUBRIDOR)\")]")
+
+            # Pasos 4 a 6: Iniciar sesión con Google
+            await google_login(page)
+            await page.wait_for_selector(search_selector, timeout=60000)
+            await save_session(context, page, "ieee")
+
+        with METRICS.phase("search"):
+            if resuming and progress.cursor:
+                # Volver a la última página completa; sus artículos ya guardados se omiten
+                await page.goto(progress.cursor)
+                current_page = progress.last_page
             else:
-                print("No se encontró un elemento visible con el texto deseado.")
-
-            # Paso 4: Hacer clic en el botón de iniciar sesión con Google
-            google_login_button = "a#btn-google"
-            page.click(google_login_button)
-
-            # Paso 5: Ingresar el correo electrónico
-            email_input_selector = "input#identifierId"
-            email_user = os.getenv("EMAIL_USER")
-            page.fill(email_input_selector, email_user)
-            next_button_selector = "button:has-text('Siguiente')"
-            page.click(next_button_selector)
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 6: Ingresar la contraseña
-            password_input_selector = "input[name='Passwd']"
-            password_user = os.getenv("EMAIL_PASSWORD")
-            page.fill(password_input_selector, password_user)
-            page.click(next_button_selector)
-            page.wait_for_load_state("domcontentloaded")
-            print("Login exitoso, listo para comenzar el scraping.")
-
-            # Buscar el término deseado
-            search_selector = 'input[type="search"]'
-            page.wait_for_selector(search_selector, timeout=60000)
-            page.fill(search_selector, "generative artificial intelligence")
-            page.press(search_selector, "Enter")
-
-            # Esperar que los resultados se carguen
-            page.wait_for_selector(".List-results-items", timeout=60000)
-
-            # Cambiar a mostrar 100 resultados por página
-            try:
-                items_per_page_button = page.locator('button:has-text("Items Per Page")')
-                items_per_page_button.click()
-                option_100 = page.locator('button:has-text("100")')
-                option_100.click()
-                page.wait_for_timeout(5000)
-            except Exception as e:
-                print(f"No se pudo cambiar a 100 resultados por página: {e}")
-
-            # Crear el archivo para guardar los resultados
-            os.makedirs("Data", exist_ok=True)
-            filepath = os.path.join("Data", "resultados_ieee.bib")
-            with open(filepath, mode="w", encoding="utf-8") as file:
+                # Buscar el término deseado
+                await page.fill(search_selector, QUERY)
+                await page.press(search_selector, "Enter")
+
+                # Esperar que los resultados se carguen
+                await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+
+                # Cambiar a mostrar 100 resultados por página
+                try:
+                    marker = await results_marker(page, RESULTS_SELECTOR)
+                    items_per_page_button = page.locator('button:has-text("Items Per Page")')
+                    await items_per_page_button.click()
+                    option_100 = page.locator('button:has-text("100")')
+                    await option_100.click()
+                    await wait_for_new_results(page, RESULTS_SELECTOR, marker)
+                except Exception as e:
+                    print(f"No se pudo cambiar a 100 resultados por página: {e}")
                 current_page = 1
-                MAX_PAGE = 45
 
+        # Crear el archivo para guardar los resultados
+        os.makedirs("Data", exist_ok=True)
+        filepath = os.path.join("Data", "resultados_ieee.bib")
+        with progress.open_output(filepath, resuming) as file:
+            if pipeline is not None and progress.offset:
+                # Los artículos guardados antes de reanudar también van a la salida unificada
+                await pipeline.prime(filepath, progress.offset)
+            if http:
+                await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+                await scrape_over_http(context, page, file, limiter, progress, current_page, pipeline)
+            else:
                 while current_page <= MAX_PAGE:  # Iterar hasta el límite de página
                     print(f"Procesando página {current_page}...")
 
                     # Procesar los resultados actuales
-                    page.wait_for_selector(".List-results-items", timeout=60000)
-                    results = page.query_selector_all(".List-results-items")
-                    for i, result in enumerate(results):
-                        try:
-                            if not result:
-                                continue
-                            title_element = result.query_selector("a.fw-bold")
-                            if not title_element:
-                                continue
-
-                            title = title_element.inner_text()
-                            link = title_element.get_attribute("href")
-                            url = f"https://ieeexplore.ieee.org{link}"
-
-                            author_element = result.query_selector(".text-base-md-lh")
-                            authors = author_element.inner_text().replace("\n", " ").strip() if author_element else "Unknown"
-
-                            journal_element = result.query_selector("div.description > a[xplhighlight]")
-                            journal = journal_element.inner_text() if journal_element else "Unknown"
-
-                            year_element = result.query_selector(".publisher-info-container")
-                            if year_element:
-                                year_text = year_element.inner_text()
-                                match = re.search(r'\b\d{4}\b', year_text)
-                                year = match.group(0) if match else "Unknown"
-                            else:
-                                year = "Unknown"
-
-                            tipo_elements = result.query_selector_all("span[xplhighlight]")
-                            tipo = "Unknown"
-
-                            for element in tipo_elements:
-                                text = element.inner_text().strip()
-                                # Excluir si contiene "Year:", "Volume:", "Issue:" O cualquier dígito (0-9)
-                                if not (
-                                    "Year:" in text 
-                                    or "Volume:" in text 
-                                    or "Issue:" in text 
-                                    or re.search(r'\d', text)  # Busca cualquier número
-                                ):
-                                    tipo = text
-                                    break
-
-                            # PUBLISHER
-                            publisher_element = result.query_selector("button[xplhighlight] span.title")  # Localiza el título "Publisher:"
-                            if publisher_element and "Publisher:" in publisher_element.inner_text():
-                                # Busca el siguiente span hermano que contiene el nombre (IEEE)
-                                publisher = publisher_element.query_selector("xpath=following-sibling::span[1]").inner_text().strip()
-                            else:
-                                publisher = "Unknown"
-
-                            abstract_element = result.query_selector(".twist-container")
-                            abstract = abstract_element.inner_text() if abstract_element else "Unknown"
-
-                            # Escribir en formato BibTeX
-                            file.write(f"@article{{ref{current_page}_{i},\n")
-                            file.write(f"  title = {{{title}}},\n")
-                            file.write(f"  author = {{{authors}}},\n")
-                            file.write(f"  year = {{{year}}},\n")
-                            file.write(f"  journal = {{{journal}}},\n")
-                            file.write(f"  tipo = {{{tipo}}},\n")
-                            file.write(f"  publisher = {{{publisher}}},\n")
-                            file.write(f"  abstract = {{{abstract}}},\n")
-                            file.write(f"  url = {{{url}}}\n")
-                            file.write("}\n\n")
-
-                        except Exception as e:
-                            print(f"Error al procesar un resultado: {e}")
+                    await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+                    records = await extract_results(page)
+                    if await save_page(write_records, file, current_page, records, progress, page.url, pipeline):
+                        progress.finish()
+                        break
 
                     # Intentar ir a la siguiente página
                     try:
+                        marker = await results_marker(page, RESULTS_SELECTOR)
                         if current_page in [10, 20, 30, 40]:
                             print("Cargando las siguientes 10 páginas...")
                             next_button = page.locator('li.next-page-set button:has-text("Next")')
-                            if next_button.is_visible():
-                                next_button.click()
-                                page.wait_for_timeout(5000)
-                                page.wait_for_selector(".List-results-items", timeout=60000)
+                            if await next_button.is_visible():
+                                await limiter.acquire()
+                                with METRICS.phase("page_load"):
+                                    await next_button.click()
+                                    await wait_for_new_results(page, RESULTS_SELECTOR, marker)
                             else:
                                 print("El botón 'Next' no está disponible.")
+                                progress.finish()
                                 break
                         else:
                             print(f"Intentando ir a la página {current_page + 1}...")
                             next_page_button = page.locator(f'li button.stats-Pagination_{current_page + 1}')
-                            if next_page_button.is_visible():
-                                next_page_button.click()
-                                page.wait_for_timeout(5000)
-                                page.wait_for_selector(".List-results-items", timeout=60000)
+                            if await next_page_button.is_visible():
+                                await limiter.acquire()
+                                with METRICS.phase("page_load"):
+                                    await next_page_button.click()
+                                    await wait_for_new_results(page, RESULTS_SELECTOR, marker)
                             else:
                                 print("Ya se alcanzó el límite.")
+                                progress.finish()
                                 break
 
+                        limiter.success()
                         current_page += 1
                     except Exception as e:
                         print(f"No se pudo ir a la página {current_page + 1}: {e}")
                         break
+                else:
+                    progress.finish()
 
-                print(f"Los artículos se guardaron exitosamente en {filepath}")
+            print(f"Los artículos se guardaron exitosamente en {filepath}")
+    except Exception as e:
+        print(f"Error general: {e}")
+    finally:
+        print("Los artículos de la base IEEE se guardaron exitosamente")
+        await page.close()
+        end_time = time.time()
+        print(f"Scraper finalizado en {end_time - start_time:.2f} segundos.")
 
-        except Exception as e:
-            print(f"Error general: {e}")
-        finally:
-            print("Los artículos de la base IEEE se guardaron exitosamente")
-            browser.close()
-            end_time = time.time()
-            print(f"Scraper finalizado en {end_time - start_time:.2f} segundos.")
-
-scrape_ieee()
\ No newline at end of file
+
+def scrape_ieee(lean=False, resume=False, http=False, record=False):
+    run_alone(scrape_ieee_async, headless=lean, lean=lean, resume=resume, http=http, record=record)
+
+
+if __name__ == "__main__":
+    # Con --resume se continúa desde el último punto de control
+    args = source_parser("IEEE").parse_args()
+    scrape_ieee(lean=args.lean, resume=args.resume, http=args.http, record=args.record)
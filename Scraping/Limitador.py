@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+"""
+Limitador de ritmo adaptativo para las peticiones de cada fuente.
+
+Es un token bucket: cada página que se pide consume un token y los tokens se recargan
+a `rate` por segundo. El ritmo se ajusta solo (aumento aditivo, disminución
+multiplicativa): cada página que carga bien lo sube un poco hasta `max_rate`, y cada
+error o respuesta 429/503 lo reduce a la mitad hasta `min_rate`. Si la respuesta trae
+Retry-After, no se entregan tokens hasta que pase ese tiempo.
+
+Los scrapers llaman a success cuando una página de resultados termina de cargar y a
+failure cuando falla; watch_responses además reduce el ritmo cuando algún documento o
+petición XHR del BrowserContext de la fuente recibe un 429 o un 503. Las peticiones del
+modo HTTP lanzan Throttled en esos casos, y fetch_in_order le pasa su Retry-After al
+limitador.
+"""
+
+# Estados HTTP que indican que el sitio pide bajar el ritmo
+THROTTLE_STATUSES = frozenset((429, 503))
+
+
+class Throttled(Exception):
+    """Respuesta 429/503 a una petición hecha fuera del navegador (ver ClienteHTTP.py)."""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"el sitio pidió bajar el ritmo ({status})")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token bucket con ritmo adaptativo (ver la descripción del módulo)."""
+
+    def __init__(self, rate=1.0, min_rate=0.05, max_rate=4.0, burst=1, increase=0.05, decrease=0.5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Esperar hasta que haya un token disponible y consumirlo."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def success(self):
+        """Registrar una página que cargó bien: el ritmo sube un poco."""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def failure(self, retry_after=None):
+        """Registrar un error o un 429/503: el ritmo baja a la mitad y se respeta Retry-After."""
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+def retry_delay(response):
+    """Segundos indicados en el encabezado Retry-After de `response` (None si no hay)."""
+    value = response.headers.get("retry-after", "")
+    return float(value) if value.isdigit() else None
+
+
+def watch_responses(context, limiter):
+    """Reducir el ritmo de `limiter` cuando un documento o XHR de `context` recibe 429 o 503."""
+    def on_response(response):
+        if response.status in THROTTLE_STATUSES and response.request.resource_type in ("document", "xhr", "fetch"):
+            limiter.failure(retry_delay(response))
+            print(f"El sitio pidió bajar el ritmo ({response.status}); nuevo ritmo: {limiter.rate:.2f} páginas/s")
+
+    context.on("response", on_response)
@@ -0,0 +1,386 @@
+import Rutas  # Agrega Unificador_duplicador al path: va antes que los demás imports
+from dotenv import load_dotenv
+from playwright.async_api import async_playwright
+from urllib.parse import parse_qs, urlencode, urljoin, urlsplit
+import argparse
+import asyncio
+import json
+import os
+
+# Los scrapers registran sus métricas con el mismo módulo que el unificador
+from Metricas import METRICS
+
+"""
+Pasos compartidos por los scrapers de ACM, IEEE y Sage.
+
+Los tres scrapers entran por el portal de bases de datos de la biblioteca, eligen la
+Fac. Ingeniería y hacen clic en el enlace de su base de datos; IEEE y Sage además inician
+sesión con Google. Aquí están esos pasos en versión asíncrona, para que el ejecutor
+(Ejecutor.py) pueda correr las tres fuentes a la vez en un mismo navegador, cada una en
+su propio BrowserContext. fetch_pages descarga en varias pestañas las páginas de
+resultados que se pueden abrir directamente por URL (page_url_template deduce esas URL
+del enlace "siguiente"); fetch_in_order es la parte común que también usa el modo HTTP
+(ClienteHTTP.py) para entregar las páginas en orden. save_page escribe cada página, la
+registra en el punto de control y, en modo pipeline, la pasa al unificador en línea.
+
+En modo liviano (use_lean_mode) el contexto cancela las peticiones que no aportan texto:
+imágenes, video, fuentes, hojas de estilo y los dominios de analítica y del aviso de
+cookies. Cada scraper indica en LEAN qué bloquear, porque algunos pasos dependen de la
+visibilidad que dan los estilos.
+
+Después del primer inicio de sesión, save_session guarda las cookies del contexto y la URL
+a la que se llegó en Data/.sesiones. En las siguientes ejecuciones resume_session entra
+directo a esa URL con las cookies guardadas; solo si el sitio las rechaza se repite el
+recorrido por el portal y el login. Para forzar un login nuevo basta borrar el archivo.
+
+El portal, el login, la sesión guardada y cada carga de página se miden como fases de
+METRICS (ver Unificador_duplicador/Metricas.py); run_alone y Ejecutor.py las exportan al
+terminar.
+"""
+
+# Carga variables desde .env en la raíz del proyecto
+load_dotenv()
+
+PORTAL_URL = "https://library.uniquindio.edu.co/databases"
+FACULTY_SELECTOR = "div[data-content-listing-item='fac-ingenier-a']"
+COOKIES_SELECTOR = "button#onetrust-accept-btn-handler"
+SESSIONS_DIR = "Data/.sesiones"
+
+# Identifica el conjunto de resultados visible: cantidad y comienzo del primero
+_MARKER_JS = "items => items.length + '|' + (items.length ? items[0].innerText.slice(0, 200) : '')"
+_CHANGED_JS = f"""([selector, marker]) => {{
+    const items = Array.from(document.querySelectorAll(selector));
+    return items.length > 0 && ({_MARKER_JS})(items) !== marker;
+}}"""
+
+# Tipos de recurso y dominios que se bloquean en modo liviano
+LEAN_RESOURCES = frozenset(("image", "media", "font", "stylesheet"))
+TRACKER_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "cookielaw.org", "onetrust.com", "hotjar.com", "facebook.net", "scorecardresearch.com",
+    "crazyegg.com", "newrelic.com", "nr-data.net", "adobedtm.com", "omtrdc.net", "demdex.net",
+    "qualtrics.com", "addthis.com", "twitter.com", "linkedin.com",
+)
+
+
+def ensure_data_dir():
+    # Crear la carpeta "Data" si no existe
+    if not os.path.exists("Data"):
+        os.makedirs("Data")
+
+
+async def save_page(write_records, file, page_num, records, progress, cursor, pipeline=None):
+    """Escribir los artículos nuevos de una página y registrarla como completa.
+
+    `write_records` es el de cada scraper. Con `pipeline` (ver
+    Unificador_duplicador/Flujo.py) la página se entrega además al unificador en línea;
+    si su cola está llena, se espera a que libere lugar. Devuelve True si hay que dejar
+    de buscar porque las últimas páginas no trajeron artículos nuevos (ver Progreso.py).
+    """
+    unseen = progress.unseen(records)
+    write_records(file, page_num, unseen)
+    progress.page_done(file, page_num, cursor)
+    if pipeline is not None:
+        await pipeline.put(file.name, page_num, unseen)
+    if progress.exhausted:
+        print(f"{progress.stale_pages} páginas seguidas sin artículos nuevos. Finalizando.")
+        METRICS.count("early_stops")
+        return True
+    return False
+
+
+@METRICS.timed("portal")
+async def open_database(page, link_xpath):
+    """Entrar al portal, elegir Fac. Ingeniería y hacer clic en el enlace de la base de datos."""
+    # Paso 1: Acceder a la página principal
+    await page.goto(PORTAL_URL)
+    await page.wait_for_load_state("domcontentloaded")
+
+    # Paso 2: Hacer clic en "Fac. Ingeniería"
+    await page.click(FACULTY_SELECTOR)
+    await page.wait_for_load_state("domcontentloaded")
+
+    # Paso 3: Hacer clic en el primer enlace visible de la base de datos
+    elements = page.locator(link_xpath)
+    count = await elements.count()
+
+    for i in range(count):
+        if await elements.nth(i).is_visible():
+            await elements.nth(i).click()
+            await page.wait_for_load_state("domcontentloaded")
+            print(f"Se hizo clic en el elemento {i+1}")
+            break
+    else:
+        print("No se encontró un elemento visible con el texto deseado.")
+
+
+@METRICS.timed("login")
+async def google_login(page):
+    """Iniciar sesión con Google usando EMAIL_USER y EMAIL_PASSWORD del .env."""
+    # Paso 4: Hacer clic en el botón de iniciar sesión con Google
+    await page.click("a#btn-google")
+
+    # Paso 5: Ingresar el correo electrónico
+    next_button_selector = "button:has-text('Siguiente')"
+    await page.fill("input#identifierId", os.getenv("EMAIL_USER"))
+    await page.click(next_button_selector)
+    await page.wait_for_load_state("domcontentloaded")
+
+    # Paso 6: Ingresar la contraseña
+    await page.fill("input[name='Passwd']", os.getenv("EMAIL_PASSWORD"))
+    await page.click(next_button_selector)
+    await page.wait_for_load_state("domcontentloaded")
+    print("Login exitoso, listo para comenzar el scraping.")
+
+
+def session_path(name):
+    return os.path.join(SESSIONS_DIR, f"{name}.json")
+
+
+async def save_session(context, page, name):
+    """Guardar las cookies de `context` y la URL actual de `page` como sesión `name`."""
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+    session = {"url": page.url, "state": await context.storage_state()}
+    with open(session_path(name), mode="w", encoding="utf-8") as file:
+        json.dump(session, file)
+
+
+@METRICS.timed("session")
+async def resume_session(context, page, name, ready_selector, timeout=15000):
+    """Entrar con la sesión guardada `name`; devuelve True si aparece `ready_selector`.
+
+    Si no hay sesión guardada o el sitio la rechaza (no aparece `ready_selector`), se
+    borran las cookies del contexto y se devuelve False para hacer el login completo.
+    """
+    path = session_path(name)
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, encoding="utf-8") as file:
+            session = json.load(file)
+        await context.add_cookies(session["state"]["cookies"])
+        await page.goto(session["url"])
+        await page.wait_for_selector(ready_selector, timeout=timeout)
+        print("Se reutilizó la sesión guardada, se omite el inicio de sesión.")
+        return True
+    except Exception as e:
+        print(f"La sesión guardada ya no es válida ({e}). Iniciando sesión de nuevo.")
+        await context.clear_cookies()
+        return False
+
+
+async def accept_cookies(page):
+    """Aceptar el aviso de cookies de OneTrust, dentro de un iframe o en la página."""
+    try:
+        # Verificar si el botón está dentro de un iframe
+        for frame in page.frames:
+            button = await frame.query_selector(COOKIES_SELECTOR)
+            if button:
+                await button.click(force=True)
+                print("Cookies aceptadas desde iframe.")
+                return
+
+        # Si no se encuentra en un iframe, buscar en la página principal
+        await page.wait_for_selector(COOKIES_SELECTOR, timeout=10000)
+        cookies_button = await page.query_selector(COOKIES_SELECTOR)
+        if cookies_button and await cookies_button.is_visible():
+            await cookies_button.click(force=True)
+            print("Cookies aceptadas.")
+        else:
+            print("El botón no es visible o no se puede interactuar con él.")
+    except Exception as e:
+        print(f"Error al intentar aceptar las cookies: {e}")
+
+
+async def results_marker(page, items_selector):
+    """Texto que identifica los resultados visibles, para detectar cuándo cambian."""
+    return await page.eval_on_selector_all(items_selector, _MARKER_JS)
+
+
+async def wait_for_new_results(page, items_selector, marker, timeout=60000):
+    """Esperar a que haya resultados y sean distintos de los que tenían `marker`.
+
+    Reemplaza las pausas fijas después de un clic de paginación: termina en cuanto la
+    página muestra los resultados nuevos.
+    """
+    await page.wait_for_function(_CHANGED_JS, arg=[items_selector, marker], timeout=timeout)
+
+
+async def use_lean_mode(context, resources=LEAN_RESOURCES, domains=TRACKER_DOMAINS):
+    """Cancelar en `context` las peticiones de los tipos `resources` o hacia `domains`."""
+    resources = frozenset(resources)
+    domains = tuple(domains)
+
+    async def handle(route):
+        request = route.request
+        host = urlsplit(request.url).hostname or ""
+        if request.resource_type in resources or any(host == domain or host.endswith("." + domain)
+                                                      for domain in domains):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+
+
+def run_alone(scraper, headless=False, **options):
+    """Ejecutar un scraper asíncrono solo, con su propio navegador.
+
+    Es lo que usan scrape_acm, scrape_ieee y scrape_sage para seguir funcionando como
+    antes cuando se ejecuta un archivo por separado.
+    """
+    async def main():
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless)
+            try:
+                context = await browser.new_context()
+                await scraper(context, **options)
+            finally:
+                await browser.close()
+
+    try:
+        asyncio.run(main())
+    finally:
+        METRICS.export("scrapers")
+
+
+def source_parser(source):
+    """Opciones de línea de comandos comunes al ejecutar un scraper por separado (las mismas
+    que Ejecutor.py aplica a cada fuente)."""
+    parser = argparse.ArgumentParser(description=f"Correr el scraper de {source}.")
+    parser.add_argument("--lean", action="store_true",
+                        help="Modo liviano sin ventana: bloquear imágenes, estilos, fuentes y rastreadores")
+    parser.add_argument("--resume", action="store_true", help="Continuar desde el último punto de control")
+    parser.add_argument("--http", action="store_true",
+                        help="Descargar las páginas de resultados sin navegador después de la primera")
+    parser.add_argument("--record", action="store_true",
+                        help="Guardar las páginas de resultados en Data/fixtures para reproducirlas sin red")
+    return parser
+
+
+def with_query(url, **params):
+    """La misma `url` con los parámetros de consulta `params` cambiados o agregados."""
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    query.update({name: [str(value)] for name, value in params.items()})
+    return parts._replace(query=urlencode(query, doseq=True)).geturl()
+
+
+async def page_url_template(page, next_selector, current_page, param="startPage"):
+    """Función n -> URL de la página de resultados n, deducida del enlace "siguiente".
+
+    El enlace `next_selector` de la página `current_page` sirve de plantilla: las demás
+    páginas solo cambian el parámetro `param`, que puede estar desplazado respecto del
+    número de página (Sage y ACM cuentan desde 0). Devuelve None si no hay enlace.
+    """
+    next_button = await page.query_selector(next_selector)
+    next_page_url = await next_button.get_attribute("href") if next_button else None
+    value = parse_qs(urlsplit(next_page_url).query).get(param) if next_page_url else None
+    if not value or not value[0].isdigit():
+        return None
+    template = urljoin(page.url, next_page_url)
+    offset = int(value[0]) - (current_page + 1)
+
+    def url_for(page_num):
+        return with_query(template, **{param: page_num + offset})
+
+    return url_for
+
+
+async def fetch_in_order(load, first, last, workers, limiter=None, retries=2):
+    """Cargar las páginas `first`..`last` con hasta `workers` cargas a la vez.
+
+    `load(n)` es una corrutina que devuelve la lista de registros de la página n. Se
+    entregan pares (n, registros) en el orden de las páginas a medida que llegan. Las
+    cargas solo se adelantan `2 * workers` páginas a la última entregada, así que la
+    memoria queda acotada. Cada carga pide un turno a `limiter` (un RateLimiter) y le
+    informa si salió bien; una página que falla se reintenta `retries` veces. La primera
+    página vacía marca el final de la búsqueda; si una página no carga se entregan las
+    anteriores y luego se lanza RuntimeError.
+    """
+    results = {}
+    changed = asyncio.Condition()
+    window = 2 * workers
+    next_page = first  # Siguiente página que toma una carga
+    end = last + 1  # Primera página que ya no se procesa
+    emitted = first  # Siguiente página que se entrega
+
+    async def worker():
+        nonlocal next_page, end
+        while True:
+            async with changed:
+                await changed.wait_for(lambda: next_page >= end or next_page < emitted + window)
+                if next_page >= end:
+                    return
+                page_num = next_page
+                next_page += 1
+            for attempt in range(retries + 1):
+                try:
+                    if limiter:
+                        await limiter.acquire()
+                    with METRICS.phase("page_load"):
+                        records = await load(page_num)
+                    if limiter:
+                        limiter.success()
+                    break
+                except Exception as e:
+                    if limiter:
+                        limiter.failure(getattr(e, "retry_after", None))
+                    if attempt == retries:
+                        print(f"Error al cargar la página {page_num}: {e}. Finalizando.")
+                        records = None
+                    else:
+                        METRICS.count("retries")
+                        print(f"Reintentando cargar la página {page_num}: {e}")
+            async with changed:
+                if not records:
+                    end = min(end, page_num)
+                results[page_num] = records
+                changed.notify_all()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        while True:
+            async with changed:
+                await changed.wait_for(lambda: emitted in results or emitted >= end)
+                if emitted >= end:
+                    if emitted in results and results[emitted] is None:
+                        raise RuntimeError(f"No se pudo cargar la página {emitted}")
+                    return
+                records = results.pop(emitted)
+            yield emitted, records
+            async with changed:
+                emitted += 1
+                changed.notify_all()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def fetch_pages(context, url_for, extract, first, last, max_tabs, ready_selector, limiter=None, retries=2):
+    """Descargar las páginas `first`..`last` en paralelo con hasta `max_tabs` pestañas.
+
+    `url_for(n)` da la URL de la página n y `extract(tab)` devuelve la lista de registros
+    de la página cargada en `tab`. El orden, la ventana, los reintentos y el final de la
+    búsqueda son los de fetch_in_order.
+    """
+    tabs = asyncio.Queue()
+    for _ in range(max_tabs):
+        tabs.put_nowait(await context.new_page())
+
+    async def load(page_num):
+        tab = await tabs.get()
+        try:
+            await tab.goto(url_for(page_num))
+            await tab.wait_for_selector(ready_selector, timeout=60000)
+            return await extract(tab)
+        finally:
+            tabs.put_nowait(tab)
+
+    try:
+        async for item in fetch_in_order(load, first, last, max_tabs, limiter, retries):
+            yield item
+    finally:
+        while not tabs.empty():
+            await tabs.get_nowait().close()
@@ -0,0 +1,163 @@
+import Rutas  # Agrega Unificador_duplicador al path: va antes que los demás imports
+from Navegador import METRICS
+from Duplicados import canonical_url, extract_doi  # En Unificador_duplicador
+import json
+import os
+import re
+
+"""
+Puntos de control para reanudar un scraper donde quedó.
+
+Por cada fuente y búsqueda se guardan en Data/.progreso dos archivos:
+- <fuente>_<búsqueda>.json: la última página completa, la URL de esa página (el cursor
+  para volver a ella), el tamaño que tenía el archivo .bib en ese momento y si la
+  búsqueda terminó.
+- <fuente>_<búsqueda>.keys: una línea "página<TAB>clave" por cada artículo escrito (la
+  clave es el DOI del artículo, su URL canónica o, si no tiene, su título).
+
+Al reanudar, el archivo .bib se recorta al tamaño guardado (se descarta una página que
+quedó escrita a medias), el scraper vuelve a la URL de la última página completa y solo
+se escriben los artículos cuya clave no está registrada. Así se puede reanudar cualquier
+número de veces sin duplicar artículos.
+
+Las mismas claves filtran los artículos repetidos durante la búsqueda: un artículo que ya
+se escribió no se vuelve a escribir aunque el sitio lo muestre en otra página. Cuando
+`max_stale` páginas seguidas no traen ningún artículo nuevo (el sitio repite páginas o
+ya no tiene más resultados), la búsqueda se da por terminada en lugar de seguir hasta el
+límite de páginas de cada scraper.
+"""
+
+PROGRESS_DIR = "Data/.progreso"
+
+# Páginas seguidas sin artículos nuevos tras las que se deja de buscar
+STALE_PAGES = 3
+
+
+def record_key(record):
+    """Clave de un artículo: su DOI, su URL canónica o, si no se conoce ninguno, su título.
+
+    La URL se compara sin esquema, proxy de la biblioteca ni parámetros, así que el mismo
+    artículo visto por dos enlaces distintos tiene una sola clave.
+    """
+    doi = extract_doi(record)
+    if doi:
+        return f"doi:{doi}"
+    url = record.get("url", "")
+    canonical = canonical_url(url) if url and not url.endswith("Unknown") else None
+    return f"url:{canonical}" if canonical else f"title:{record.get('title', '')}"
+
+
+class Checkpoint:
+    """Progreso de una búsqueda `query` en la fuente `source`."""
+
+    def __init__(self, source, query, directory=PROGRESS_DIR, max_stale=STALE_PAGES):
+        slug = re.sub(r"[^a-z0-9]+", "_", query.lower()).strip("_")
+        base = os.path.join(directory, f"{source}_{slug}")
+        self.directory = directory
+        self.path = base + ".json"
+        self.keys_path = base + ".keys"
+        self.last_page = 0
+        self.cursor = None
+        self.offset = 0
+        self.finished = False
+        self.keys = set()
+        self.page_keys = []
+        self.max_stale = max_stale
+        self.stale_pages = 0
+
+    def load(self):
+        """Cargar el progreso guardado; devuelve False si no hay."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as file:
+            state = json.load(file)
+        self.last_page = state["last_page"]
+        self.cursor = state["cursor"]
+        self.offset = state["offset"]
+        self.finished = state["finished"]
+        # Las claves de una página que no alcanzó a registrarse como completa no cuentan
+        self.keys = set()
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, encoding="utf-8") as file:
+                for line in file:
+                    page_num, _, key = line.rstrip("\n").partition("\t")
+                    if page_num.isdigit() and int(page_num) <= self.last_page:
+                        self.keys.add(key)
+        return True
+
+    def reset(self):
+        """Olvidar el progreso guardado."""
+        for path in (self.path, self.keys_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.last_page = 0
+        self.cursor = None
+        self.offset = 0
+        self.finished = False
+        self.keys = set()
+        self.page_keys = []
+        self.stale_pages = 0
+
+    def open_output(self, filepath, resume):
+        """Abrir el archivo .bib: desde cero, o en el último punto guardado si se reanuda."""
+        os.makedirs(self.directory, exist_ok=True)
+        if resume and self.load() and os.path.exists(filepath):
+            file = open(filepath, mode="r+", encoding="utf-8")
+            file.truncate(self.offset)
+            file.seek(self.offset)
+            print(f"Reanudando desde la página {self.last_page} ({len(self.keys)} artículos ya guardados).")
+            return file
+        self.reset()
+        return open(filepath, mode="w", encoding="utf-8")
+
+    def unseen(self, records):
+        """Los registros de una página con None en lugar de los que ya se escribieron.
+
+        La clave de cada registro aceptado se registra al momento, así que un artículo
+        repetido dentro de la misma página también se descarta.
+        """
+        unseen = []
+        for record in records:
+            key = None if record is None else record_key(record)
+            if key is None or key in self.keys:
+                unseen.append(None)
+                continue
+            self.keys.add(key)
+            self.page_keys.append(key)
+            unseen.append(record)
+        METRICS.count("known_records", sum(record is not None for record in records)
+                      - sum(record is not None for record in unseen))
+        return unseen
+
+    @property
+    def exhausted(self):
+        """True si las últimas `max_stale` páginas no trajeron ningún artículo nuevo."""
+        return self.stale_pages >= self.max_stale
+
+    def page_done(self, file, page_num, cursor):
+        """Registrar como completa la página `page_num`, cuya URL es `cursor`, con las
+        claves que aceptó `unseen` desde la página anterior."""
+        # Al reanudar, la última página completa se procesa otra vez: sus artículos ya se conocen
+        if page_num > self.last_page:
+            self.stale_pages = 0 if self.page_keys else self.stale_pages + 1
+        file.flush()
+        with open(self.keys_path, mode="a", encoding="utf-8") as keys_file:
+            keys_file.writelines(f"{page_num}\t{key}\n" for key in self.page_keys)
+        self.page_keys = []
+        self.last_page = page_num
+        self.cursor = cursor
+        self.offset = file.tell()
+        self._save()
+
+    def finish(self):
+        """Marcar la búsqueda como terminada."""
+        self.finished = True
+        self._save()
+
+    def _save(self):
+        state = {"last_page": self.last_page, "cursor": self.cursor, "offset": self.offset,
+                 "finished": self.finished}
+        temporary = self.path + ".tmp"
+        with open(temporary, mode="w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
@@ -0,0 +1,144 @@
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import contextlib
+import glob
+import json
+import os
+import threading
+
+"""
+Grabación y reproducción de páginas de resultados para probar la extracción sin red.
+
+Grabar: con start_recording(context, fuente) (opción --record de Ejecutor.py o de cada
+scraper) cada página de resultados que procesa un scraper se guarda como
+Data/fixtures/<fuente>/NNNN.html. Se guarda el DOM ya dibujado (también el de IEEE, que
+arma sus resultados con JavaScript) y sin etiquetas <script>, para que al reproducirlo
+la página no vuelva a pedir nada al sitio. Junto a cada página se guarda en
+NNNN.expected.json lo que el scraper extrajo de ella: la salida esperada con la que se
+compara cada estrategia de extracción. Si la fuente tiene una API JSON (IEEE arma sus
+resultados con /rest/search), también se guarda la última respuesta de esa API en
+NNNN.api.json, con su propia salida esperada en NNNN.api.expected.json.
+
+Reproducir: replay_page muestra una de esas páginas en una pestaña con page.route, sin
+tocar la red (las demás peticiones se cancelan), y serve_fixtures las publica en un
+servidor HTTP local para probar el modo HTTP (ClienteHTTP.py). Benchmark_extraccion.py
+usa las dos cosas para medir la extracción de cada fuente.
+"""
+
+FIXTURES_DIR = "Data/fixtures"
+REPLAY_URL = "https://fixtures.local/"
+
+_SNAPSHOT_JS = """() => {
+    const root = document.documentElement.cloneNode(true);
+    root.querySelectorAll("script, noscript, iframe").forEach(element => element.remove());
+    return "<!DOCTYPE html>\\n" + root.outerHTML;
+}"""
+
+# Grabaciones activas por BrowserContext: fuente, carpeta y cantidad de páginas guardadas
+_recordings = {}
+
+
+def fixture_paths(source, directory=FIXTURES_DIR):
+    """Páginas grabadas de `source`, en el orden en que se grabaron."""
+    return sorted(glob.glob(os.path.join(directory, source, "*.html")))
+
+
+def api_fixture(path):
+    """Respuesta de la API grabada junto a la página `path` (NNNN.html -> NNNN.api.json)."""
+    return os.path.splitext(path)[0] + ".api.json"
+
+
+def expected_path(path):
+    """Archivo con la salida esperada de la página o respuesta grabada en `path`."""
+    return os.path.splitext(path)[0] + ".expected.json"
+
+
+def load_expected(path):
+    """Salida esperada de `path` (una lista de registros, None si no se pudo procesar), o
+    None si no se guardó."""
+    if not os.path.exists(expected_path(path)):
+        return None
+    with open(expected_path(path), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_json(path, value):
+    with open(path, mode="w", encoding="utf-8") as file:
+        json.dump(value, file, ensure_ascii=False, indent=1)
+
+
+def start_recording(context, source, directory=FIXTURES_DIR, api_path=None, parse_api=None):
+    """Guardar en `directory`/`source` las páginas de resultados que se procesen en `context`.
+
+    Con `api_path` también se guarda la última respuesta JSON de esa ruta antes de cada
+    página; `parse_api` convierte esa respuesta (ya decodificada) en registros.
+    """
+    folder = os.path.join(directory, source)
+    os.makedirs(folder, exist_ok=True)
+    recording = {"folder": folder, "count": len(fixture_paths(source, directory)), "api": None,
+                 "parse_api": parse_api}
+    _recordings[context] = recording
+    context.on("close", lambda _: _recordings.pop(context, None))
+
+    if api_path is not None:
+        async def keep_response(response):
+            if response.ok and urlsplit(response.url).path.endswith(api_path):
+                try:
+                    recording["api"] = await response.json()
+                except Exception:
+                    pass  # Respuesta que no es JSON o que ya no está disponible
+
+        context.on("response", keep_response)
+
+
+async def record_snapshot(page, records):
+    """Guardar la página de resultados de `page` y los `records` que se extrajeron de ella
+    si su contexto está grabando."""
+    recording = _recordings.get(page.context)
+    if recording is None:
+        return
+    recording["count"] += 1
+    path = os.path.join(recording["folder"], f"{recording['count']:04d}.html")
+    html = await page.evaluate(_SNAPSHOT_JS)
+    with open(path, mode="w", encoding="utf-8") as file:
+        file.write(html)
+    _write_json(expected_path(path), records)
+    if recording["api"] is not None:
+        _write_json(api_fixture(path), recording["api"])
+        _write_json(expected_path(api_fixture(path)), recording["parse_api"](recording["api"]))
+        recording["api"] = None
+
+
+async def replay_page(page, html):
+    """Mostrar `html` en `page` sin red: el documento sale de memoria y lo demás se cancela."""
+    async def handle(route):
+        if route.request.url == REPLAY_URL:
+            await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
+        else:
+            await route.abort()
+
+    await page.unroute("**/*")
+    await page.route("**/*", handle)
+    await page.goto(REPLAY_URL)
+
+
+@contextlib.contextmanager
+def serve_fixtures(directory=FIXTURES_DIR):
+    """Servidor HTTP local que publica `directory`; entrega la URL base (http://127.0.0.1:puerto/)."""
+    handler = partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Mantener la conexión abierta entre peticiones
+
+    def log_message(self, format, *args):
+        pass
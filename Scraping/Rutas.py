@@ -0,0 +1,20 @@
+import os
+import sys
+
+
+"""
+Arranque común de los scripts de Scraping.
+
+Los scrapers usan módulos de Unificador_duplicador (Metricas, Duplicados, Flujo, Indice)
+y los importan por nombre, igual que los de esta carpeta. Este módulo agrega esa carpeta
+al path una sola vez. Los puntos de entrada (ACM.py, IEE.py, Sage.py, Ejecutor.py y
+Benchmark_extraccion.py) y los módulos que usan el unificador lo importan antes que
+cualquier otro módulo, así que ningún import depende del orden de los demás.
+"""
+
+
+UNIFIER_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                                            "Unificador_duplicador"))
+
+if UNIFIER_DIR not in sys.path:
+    sys.path.append(UNIFIER_DIR)
@@ -1,5 +1,13 @@
-from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+import Rutas  # Agrega Unificador_duplicador al path: va antes que los demás imports
+from ClienteHTTP import fetch_http_pages, open_client
+from Extraccion import extract_items, extract_items_from_html
+from Limitador import RateLimiter, watch_responses
+from Navegador import (METRICS, accept_cookies, ensure_data_dir, fetch_pages, google_login, open_database,
+                       page_url_template, resume_session, run_alone, save_page, save_session, source_parser,
+                       use_lean_mode)
+from Progreso import Checkpoint
+from Repeticion import record_snapshot, start_recording
+from contextlib import aclosing
 import os
 import re
 import time
@@ -16,226 +24,305 @@ De esta pagina logramos extraer 2010 articulos con la estrucura de:
   url = {https://journals.sagepub.com/doi/abs/10.1177/1234567}
 }
 La función scrape_sage() accede a la página, busca artículos relacionados con "generative artificial intelligence",
-y guarda los resultados en un archivo BibTeX.
+y guarda los resultados en un archivo BibTeX. scrape_sage_async() hace lo mismo dentro de un
+BrowserContext, para correr junto a los demás scrapers desde Ejecutor.py. Con max_tabs mayor
+que 1, las páginas después de la primera se abren directamente por URL (startPage) en varias
+pestañas a la vez y se escriben en el orden de las páginas; con http=True esas páginas se
+descargan sin navegador (ver ClienteHTTP.py).
 """
 
 # -------------------------------------------------------------
 # USO DE CHATGPT PARA LA ESTRUCTURA DE LOS SCRAPES
 # -------------------------------------------------------------
 
-# Carga variables desde .env en la raíz del proyecto
-load_dotenv()
+QUERY = "generative artificial intelligence"
+RESULTS_SELECTOR = ".rlist.search-result__body.items-results > div"
+NEXT_SELECTOR = "a[aria-label='next']"
+MAX_PAGES = 5000
 
-def scrape_sage():
-    # Crear la carpeta "Data" si no existe
-    if not os.path.exists("Data"):
-        os.makedirs("Data")
 
-    with sync_playwright() as p:
-        start_time = time.time()
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
+# Modo liviano: se bloquea todo lo que no es texto, incluido el aviso de cookies
+# de OneTrust (ver Navegador.use_lean_mode)
+LEAN = {}
 
-        try:
-            # Paso 1: Acceder a la página principal
-            page.goto("https://library.uniquindio.edu.co/databases")
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 2: Hacer clic en "Fac. Ingeniería"
-            fac_ingenieria_selector = "div[data-content-listing-item='fac-ingenier-a']"
-            page.click(fac_ingenieria_selector)
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 3: Hacer clic en "SAGE Revistas - (DESCUBRIDOR) "
-            elements = page.locator("//a[contains(@href, 'journals.sagepub.com')]//span[contains(text(), 'SAGE Revistas - (DESCUBRIDOR) ')]")
-            count = elements.count()
-
-            for i in range(count):
-                if elements.nth(i).is_visible():
-                    elements.nth(i).click()
-                    page.wait_for_load_state("domcontentloaded")
-                    print(f"Se hizo clic en el elemento {i+1}")
-                    break
-            else:
-                print("No se encontró un elemento visible con el texto deseado.")
-
-            # Paso 4: Hacer clic en el botón de iniciar sesión con Google
-            google_login_button = "a#btn-google"
-            page.click(google_login_button)
-
-            # Paso 5: Ingresar el correo electrónico
-            email_input_selector = "input#identifierId"
-            email_user = os.getenv("EMAIL_USER")
-            page.fill(email_input_selector, email_user)
-            next_button_selector = "button:has-text('Siguiente')"
-            page.click(next_button_selector)
-            page.wait_for_load_state("domcontentloaded")
-
-            # Paso 6: Ingresar la contraseña
-            password_input_selector = "input[name='Passwd']"
-            email_password = os.getenv("EMAIL_PASSWORD")
-            page.fill(password_input_selector, email_password)
-            page.click(next_button_selector)
-            page.wait_for_load_state("domcontentloaded")
-            print("Login exitoso, listo para comenzar el scraping.")
+# Ritmo inicial y máximo de páginas por segundo (ver Limitador.py); con varias
+# pestañas se permiten ráfagas de hasta 4 páginas
+RATE_LIMIT = {"rate": 1.0, "max_rate": 4.0, "burst": 4}
 
-            # Espera y selecciona el botón de aceptar cookies
-            try:
-                # Verificar si el botón está dentro de un iframe
-                frames = page.frames
-                button_found = False
-
-                for frame in frames:
-                    # Buscar el botón en cada iframe
-                    button = frame.query_selector("button#onetrust-accept-btn-handler")
-                    if button:
-                        button_found = True
-                        button.click(force=True)
-                        print("Cookies aceptadas desde iframe.")
-                        break
+# Conexiones simultáneas en modo HTTP (ver ClienteHTTP.py)
+HTTP_CONNECTIONS = 4
 
-                # Si no se encuentra en un iframe, buscar en la página principal
-                if not button_found:
-                    page.wait_for_selector("button#onetrust-accept-btn-handler", timeout=10000)
-                    cookies_button = page.query_selector("button#onetrust-accept-btn-handler")
-                    if cookies_button and cookies_button.is_visible():
-                        cookies_button.click(force=True)
-                        print("Cookies aceptadas.")
-                    else:
-                        print("El botón no es visible o no se puede interactuar con él.")
+# Campos de cada resultado (ver Extraccion.py)
+FIELDS = {
+    "title": {"selector": ".sage-search-title"},
+    "link": {"selector": ".sage-search-title", "attr": "href"},
+    "authors": {"selector": ".issue-item__authors"},
+    "header": {"selector": ".issue-item__header"},
+    "journal": {"selector": ".issue-item__row"},
+    "tipo": {"selector": ".issue-item-access + span"},  # Hermano adyacente
+    "abstract": {"selector": ".issue-item__abstract__content"},
+}
 
-            except Exception as e:
-                print(f"Error al intentar aceptar las cookies: {e}")
 
-            # Buscar artículos
-            search_selector = "input[name='AllField']"
-            page.wait_for_selector(search_selector, timeout=60000)
-            page.fill(search_selector, "generative artificial intelligence")
-            page.press(search_selector, "Enter")
+def to_record(raw):
+    """Convertir los textos leídos de un resultado en los campos del artículo."""
+    match = re.search(r'\b\d{4}\b', raw["header"]) if raw["header"] else None
+    abstract = " ".join(raw["abstract"].split()).strip() if raw["abstract"] else "Unknown"
+    # Eliminar la palabra "Abstract"
+    if abstract.lower().startswith("abstract"):
+        abstract = abstract[8:].strip()  # Elimina los primeros 8 caracteres ("Abstract" + espacio)
+
+    return {
+        "title": raw["title"] if raw["title"] is not None else "Unknown",
+        "author": raw["authors"].replace("\n", ", ").strip() if raw["authors"] is not None else "Unknown",
+        "year": match.group(0) if match else "Unknown",
+        "journal": raw["journal"] if raw["journal"] is not None else "Unknown",
+        "tipo": raw["tipo"].strip() if raw["tipo"] is not None else "Unknown",
+        "publisher": "Unknown",
+        "abstract": abstract,
+        "url": "https://journals.sagepub.com" + (raw["link"] if raw["link"] is not None else "Unknown"),
+    }
+
+
+def to_records(raws):
+    """Convertir los resultados leídos en artículos (None si uno no se pudo procesar)."""
+    records = []
+    for raw in raws:
+        try:
+            records.append(to_record(raw))
+        except Exception as e:
+            print(f"Error al procesar un resultado: {e}")
+            records.append(None)
+    return records
+
+
+@METRICS.timed("extraction")
+async def extract_results(page, strategy=extract_items):
+    """Extraer los artículos de la página de resultados cargada en `page`.
+
+    Devuelve una lista de diccionarios en el orden de la página (None si un resultado
+    no se pudo procesar).
+    """
+    records = to_records(await strategy(page, RESULTS_SELECTOR, FIELDS))
+    await record_snapshot(page, records)
+    return records
+
+
+def parse_response(response):
+    """Artículos de una página de resultados descargada en modo HTTP."""
+    return to_records(extract_items_from_html(response.text, RESULTS_SELECTOR, FIELDS))
+
+
+@METRICS.timed("write")
+def write_records(file, page_num, records):
+    """Escribir en formato BibTeX los artículos de una página."""
+    METRICS.count("pages")
+    METRICS.count("records", sum(record is not None for record in records))
+    for i, record in enumerate(records):
+        if record is None:
+            continue
+        file.write(f"@article{{ref{page_num}_{i},\n")
+        file.write(f"  title = {{{record['title']}}},\n")
+        file.write(f"  author = {{{record['author']}}},\n")
+        file.write(f"  year = {{{record['year']}}},\n")
+        file.write(f"  journal = {{{record['journal']}}},\n")
+        file.write(f"  tipo = {{{record['tipo']}}},\n")
+        file.write(f"  publisher = {{{record['publisher']}}},\n")
+        file.write(f"  abstract = {{{record['abstract']}}},\n")
+        file.write(f"  url = {{{record['url']}}}\n")
+        file.write("}\n\n")
+
+
+async def scrape_in_tabs(context, page, file, max_tabs, limiter, progress, first_page=1, http=False,
+                         pipeline=None):
+    """Procesar la página `first_page` en `page` y las siguientes por URL.
+
+    Las siguientes se descargan en `max_tabs` pestañas o, con `http`, sin navegador con
+    HTTP_CONNECTIONS conexiones (ver ClienteHTTP.py).
+    """
+    print(f"Procesando página {first_page}...")
+    records = await extract_results(page)
+    if await save_page(write_records, file, first_page, records, progress, page.url, pipeline):
+        progress.finish()
+        return
+
+    # La URL del botón "Siguiente" sirve de plantilla para las demás páginas: solo cambia startPage
+    url_for = await page_url_template(page, NEXT_SELECTOR, first_page)
+    if url_for is None:
+        print("No se encontró el enlace a la siguiente página con startPage. Finalizando.")
+        progress.finish()
+        return
+
+    async def write_pages(pages):
+        async with aclosing(pages):
+            async for page_num, records in pages:
+                print(f"Procesando página {page_num}...")
+                if await save_page(write_records, file, page_num, records, progress, url_for(page_num), pipeline):
+                    break
+
+    if http:
+        async with await open_client(context, page, HTTP_CONNECTIONS) as client:
+            await write_pages(fetch_http_pages(client, lambda page_num: client.build_request("GET", url_for(page_num)),
+                                               parse_response, first_page + 1, MAX_PAGES, HTTP_CONNECTIONS, limiter))
+    else:
+        await write_pages(fetch_pages(context, url_for, extract_results, first_page + 1, MAX_PAGES,
+                                      max_tabs, RESULTS_SELECTOR, limiter))
+    progress.finish()
+
+
+async def scrape_sage_async(context, max_tabs=1, lean=False, resume=False, http=False, record=False,
+                            pipeline=None):
+    """Buscar en Sage y guardar los resultados en Data/resultados_Sage.bib.
+
+    Con `max_tabs` igual a 1 se avanza página por página en una sola pestaña; con más, las
+    páginas se descargan en paralelo (ver scrape_in_tabs); con `http` se descargan sin
+    navegador después de la primera. Con `lean` se activa el modo liviano en el contexto;
+    como el aviso de cookies queda bloqueado, no se espera. Con `resume` se continúa desde
+    el último punto de control (ver Progreso.py) y con `record` se graban las páginas de
+    resultados para reproducirlas sin red (ver Repeticion.py). Con `pipeline` cada página se
+    entrega además al unificador en línea (ver Unificador_duplicador/Flujo.py).
+    """
+    ensure_data_dir()
+    METRICS.bind(source="Sage")
+    progress = Checkpoint("Sage", QUERY)
+    resuming = resume and progress.load()
+    if resuming and progress.finished:
+        print("La búsqueda en Sage ya había terminado; no hay nada que reanudar.")
+        if pipeline is not None:
+            await pipeline.prime(os.path.join("Data", "resultados_Sage.bib"), progress.offset)
+        return
+    if lean:
+        await use_lean_mode(context, **LEAN)
+    if record:
+        start_recording(context, "Sage")
+    limiter = RateLimiter(**RATE_LIMIT)
+    watch_responses(context, limiter)
+
+    start_time = time.time()
+    page = await context.new_page()
+
+    try:
+        # Entrar con la sesión guardada o, si no sirve, por el portal con login
+        search_selector = "input[name='AllField']"
+        if not await resume_session(context, page, "sage", search_selector):
+            # Pasos 1 a 3: Portal, Fac. Ingeniería y "SAGE Revistas - (DESCUBRIDOR) "
+            await open_database(page, "//a[contains(@href, 'journals.sagepub.com')]//span[contains(text(), 'SAGE Revistas - (DESCUBRIDOR) ')]")
+
+            # Pasos 4 a 6: Iniciar sesión con Google
+            await google_login(page)
 
             # Espera y selecciona el botón de aceptar cookies
-            try:
-                # Verificar si el botón está dentro de un iframe
-                frames = page.frames
-                button_found = False
-
-                for frame in frames:
-                    # Buscar el botón en cada iframe
-                    button = frame.query_selector("button#onetrust-accept-btn-handler")
-                    if button:
-                        button_found = True
-                        button.click(force=True)
-                        print("Cookies aceptadas desde iframe.")
-                        break
+            if not lean:
+                await accept_cookies(page)
 
-                # Si no se encuentra en un iframe, buscar en la página principal
-                if not button_found:
-                    page.wait_for_selector("button#onetrust-accept-btn-handler", timeout=10000)
-                    cookies_button = page.query_selector("button#onetrust-accept-btn-handler")
-                    if cookies_button and cookies_button.is_visible():
-                        cookies_button.click(force=True)
-                        print("Cookies aceptadas.")
-                    else:
-                        print("El botón no es visible o no se puede interactuar con él.")
+            await page.wait_for_selector(search_selector, timeout=60000)
+            await save_session(context, page, "sage")
 
-            except Exception as e:
-                print(f"Error al intentar aceptar las cookies: {e}")
+        with METRICS.phase("search"):
+            if resuming and progress.cursor:
+                # Volver a la última página completa; sus artículos ya guardados se omiten
+                await page.goto(progress.cursor)
+                first_page = progress.last_page
+            else:
+                # Buscar artículos
+                await page.fill(search_selector, QUERY)
+                await page.press(search_selector, "Enter")
+                first_page = 1
+
+                # Espera y selecciona el botón de aceptar cookies
+                if not lean:
+                    await accept_cookies(page)
 
             # Esperar que los resultados se carguen
-            page.wait_for_selector(".rlist.search-result__body.items-results > div", timeout=60000)
-            results = page.query_selector_all(".rlist.search-result__body.items-results > div")
+            await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
             print("Artículos detectados")
 
-            # Guardar resultados en un archivo BibTeX
-            filepath = os.path.join("Data", "resultados_Sage.bib")
-            with open(filepath, mode="w", encoding="utf-8") as file:
+        # Guardar resultados en un archivo BibTeX
+        filepath = os.path.join("Data", "resultados_Sage.bib")
+        with progress.open_output(filepath, resuming) as file:
+            if pipeline is not None and progress.offset:
+                # Los artículos guardados antes de reanudar también van a la salida unificada
+                await pipeline.prime(filepath, progress.offset)
+            if max_tabs > 1 or http:
+                await scrape_in_tabs(context, page, file, max_tabs, limiter, progress, first_page, http, pipeline)
+            else:
+                # Plantilla de la misma búsqueda para cuando el botón "Siguiente" ya no sirve
+                url_for = await page_url_template(page, NEXT_SELECTOR, first_page)
+
                 # Segmento de iteración para avanzar por las páginas
-                for page_num in range(1, 5001):  # Iterar hasta la página 5000
+                for page_num in range(first_page, MAX_PAGES + 1):  # Iterar hasta la página 5000
                     print(f"Procesando página {page_num}...")
 
                     # Revalidar que los resultados están disponibles
-                    page.wait_for_selector(".rlist.search-result__body.items-results > div", timeout=60000)
-                    results = page.query_selector_all(".rlist.search-result__body.items-results > div")
-
-                    for i, result in enumerate(results):
-                        try:
-                            # Extraer información del artículo
-                            title = result.query_selector(".sage-search-title").inner_text() if result.query_selector(".sage-search-title") else "Unknown"
-                            link = result.query_selector(".sage-search-title").get_attribute("href") if result.query_selector(".sage-search-title") else "Unknown"
-                            authors = result.query_selector(".issue-item__authors").inner_text().replace("\n", ", ").strip() if result.query_selector(".issue-item__authors") else "Unknown"
-
-                            year_element = result.query_selector(".issue-item__header")
-                            year = re.search(r'\b\d{4}\b', year_element.inner_text()).group(0) if year_element and re.search(r'\b\d{4}\b', year_element.inner_text()) else "Unknown"
-                            journal = result.query_selector(".issue-item__row").inner_text() if result.query_selector(".issue-item__row") else "Unknown"
-
-                            tipo_element = result.query_selector(".issue-item-access + span")  # Hermano adyacente
-                            tipo = tipo_element.inner_text().strip() if tipo_element else "Unknown"
-
-                            abstract = (
-                                        " ".join(
-                                            result.query_selector(".issue-item__abstract__content")
-                                            .inner_text()
-                                            .split()
-                                        ).strip()
-                                        if result.query_selector(".issue-item__abstract__content")
-                                        else "Unknown"
-                                    )
-                            # Eliminar la palabra "Abstract" 
-                            if abstract.lower().startswith("abstract"):
-                                abstract = abstract[8:].strip()  # Elimina los primeros 8 caracteres ("Abstract" + espacio)
-
-                            publisher = "Unknown"
-
-                            # Escribir en formato BibTeX
-                            file.write(f"@article{{ref{page_num}_{i},\n")
-                            file.write(f"  title = {{{title}}},\n")
-                            file.write(f"  author = {{{authors}}},\n")
-                            file.write(f"  year = {{{year}}},\n")
-                            file.write(f"  journal = {{{journal}}},\n")
-                            file.write(f"  tipo = {{{tipo}}},\n")
-                            file.write(f"  publisher = {{{publisher}}},\n")
-                            file.write(f"  abstract = {{{abstract}}},\n")
-                            file.write(f"  url = {{{'https://journals.sagepub.com' + link}}}\n")
-                            file.write("}\n\n")
-                        except Exception as e:
-                            print(f"Error al procesar un resultado en la página {page_num}: {e}")
+                    await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+                    records = await extract_results(page)
+                    if await save_page(write_records, file, page_num, records, progress, page.url, pipeline):
+                        progress.finish()
+                        break
 
                     # Avanzar a la siguiente página usando el URL directamente
-                    try:
+                    if page_num >= 200:
                         # Si el número de página supera 200, construye el URL directamente
-                        if page_num >= 200:
-                            next_page_url = f"https://journals.sagepub.com/action/doSearch?AllField=computational+thinking&pageSize=10&startPage={page_num + 1}"
-                            print(f"Navegando directamente a la URL: {next_page_url}")
-                            page.goto(next_page_url)
-                        else:
-                            # Para las primeras páginas, intenta usar el botón "Siguiente"
-                            next_button = page.query_selector("a[aria-label='next']")
-                            if next_button:
-                                next_page_url = next_button.get_attribute("href")
-                                if next_page_url:
-                                    print(f"Navegando a la URL de la página {page_num + 1}")
-                                    page.goto(next_page_url)
-                                else:
-                                    print("No se encontró el enlace 'href' en el botón 'Siguiente'. Finalizando.")
-                                    break
-                            else:
-                                print("No se encontró el botón 'Siguiente'. Finalizando.")
-                                break
-
-                        # Esperar que los resultados de la nueva página se carguen
-                        page.wait_for_selector(".rlist.search-result__body.items-results > div", timeout=60000)
-
-                    except Exception as e:
-                        print(f"Error al cargar la página {page_num + 1}: {e}. Finalizando.")
+                        if url_for is None:
+                            print("No se encontró el enlace a la siguiente página con startPage. Finalizando.")
+                            progress.finish()
+                            break
+                        next_page_url = url_for(page_num + 1)
+                        print(f"Navegando directamente a la URL: {next_page_url}")
+                    else:
+                        # Para las primeras páginas, intenta usar el botón "Siguiente"
+                        next_button = await page.query_selector(NEXT_SELECTOR)
+                        if not next_button:
+                            print("No se encontró el botón 'Siguiente'. Finalizando.")
+                            progress.finish()
+                            break
+                        next_page_url = await next_button.get_attribute("href")
+                        if not next_page_url:
+                            print("No se encontró el enlace 'href' en el botón 'Siguiente'. Finalizando.")
+                            progress.finish()
+                            break
+                        print(f"Navegando a la URL de la página {page_num + 1}")
+
+                    # Cargar la siguiente página con reintentos (la misma URL en cada intento)
+                    retries = 3
+                    while retries > 0:
+                        try:
+                            await limiter.acquire()
+                            with METRICS.phase("page_load"):
+                                await page.goto(next_page_url)
+                                # Esperar que los resultados de la nueva página se carguen
+                                await page.wait_for_selector(RESULTS_SELECTOR, timeout=60000)
+                            limiter.success()
+                            break
+                        except Exception as e:
+                            retries -= 1
+                            METRICS.count("retries")
+                            limiter.failure()  # El limitador espera más antes del siguiente intento
+                            print(f"Error al cargar la página {page_num + 1}: {e}. Intentos restantes: {retries}")
+                    else:
+                        print(f"Error al intentar cargar la página {page_num + 1}. Finalizando.")
                         break
-
-            print(f"Los artículos se guardaron exitosamente en {filepath}")
-        except Exception as e:
-            print(f"Error general: {e}")
-        finally:
-            browser.close()
-            end_time = time.time()
-            print(f"Scraper para Sage finalizado en {end_time - start_time:.2f} segundos.\n")
-
-# Llamar a la función
-scrape_sage()
\ No newline at end of file
+                else:
+                    progress.finish()
+
+        print(f"Los artículos se guardaron exitosamente en {filepath}")
+    except Exception as e:
+        print(f"Error general: {e}")
+    finally:
+        await page.close()
+        end_time = time.time()
+        print(f"Scraper para Sage finalizado en {end_time - start_time:.2f} segundos.\n")
+
+
+def scrape_sage(max_tabs=1, lean=False, resume=False, http=False, record=False):
+    run_alone(scrape_sage_async, headless=lean, max_tabs=max_tabs, lean=lean, resume=resume, http=http,
+              record=record)
+
+
+if __name__ == "__main__":
+    # Llamar a la función (con --resume se continúa desde el último punto de control)
+    parser = source_parser("Sage")
+    parser.add_argument("--tabs", type=int, default=1,
+                        help="Pestañas para descargar páginas en paralelo (1: página por página)")
+    args = parser.parse_args()
+    scrape_sage(max_tabs=max(1, args.tabs), lean=args.lean, resume=args.resume, http=args.http, record=args.record)
@@ -0,0 +1,366 @@
+import argparse
+import contextlib
+import json
+import mmap
+import os
+import sys
+import time
+from collections import defaultdict
+from itertools import islice
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # numpy y scipy son opcionales: solo se necesitan para las estadísticas
+    numpy = None
+    sparse = None
+
+from Cambios import known, load_meta, prefix_hash, year_number
+from Metricas import METRICS
+from Temas import count_matrix, new_vocabulary
+from Tokenizador import iter_entries
+
+
+"""
+Estadísticas del corpus unificado (por año, tipo, publisher, journal, autores, temas y
+palabras de los resúmenes) calculadas sobre columnas de numpy.
+
+La primera vez se lee Data/unificados.bib y cada campo se guarda en Data/analitica como
+una columna de números (un .npy que después se abre con mmap):
+- year es el año como entero (0 si falta);
+- tipo, publisher y journal son el número de su valor en una tabla (0 si falta);
+- author, categories y keywords tienen varios valores por artículo: se guardan como la
+  lista de números de todos los artículos seguidos (`<campo>_codes`) y dónde empieza la
+  de cada artículo (`<campo>_offsets`). keywords son las palabras distintas del resumen
+  (las mismas que usan Temas.py e Indice.py).
+Las tablas de valores van en tablas.json. Contar por un campo es entonces un
+numpy.bincount sobre su columna (y los filtros por año, tipo o publisher, una máscara),
+sin recorrer los artículos en Python.
+
+Como en Indice.py, si solo se agregaron artículos al final del archivo se leen esos y
+se agregan a las columnas; si cambió el contenido ya leído, se vuelven a generar. La
+firma del contenido leído (un hash) es la versión del corpus: los resultados de cada
+consulta se guardan en resultados.json con esa versión y se reutilizan mientras el
+corpus no cambie, así que repetir una consulta no vuelve a calcular nada.
+
+Uso: python Unificador_duplicador/Analitica.py [--limit N] [--year-from AÑO] [--year-to AÑO] [--tipo T]
+                                              [--publisher P] [--json] [--rebuild]
+"""
+
+
+ANALYTICS_DIR = "Data/analitica"
+SOURCE_PATH = "Data/unificados.bib"
+FORMAT_VERSION = 1
+BATCH_SIZE = 100000
+
+# Campos con un valor por artículo y con varios (y cómo se separan en unificados.bib)
+SINGLE_FIELDS = ("tipo", "publisher", "journal")
+MULTI_FIELDS = {"author": (",", ";"), "categories": (";",)}
+FIELDS = ("year",) + SINGLE_FIELDS + tuple(MULTI_FIELDS) + ("keywords",)
+# Restos de la página que los scrapers guardan como si fueran autores
+NOT_AUTHORS = frozenset(("[...]", "View all", "..."))
+
+
+def _require():
+    if sparse is None:
+        raise RuntimeError("Para las estadísticas hay que instalar los paquetes numpy y scipy")
+
+
+
+
+
+# -------------------------------------------------------------
+# Columnas
+# -------------------------------------------------------------
+
+def _encode(values, table):
+    """Números de `values` en `table` (un diccionario de new_vocabulary)."""
+    return numpy.fromiter(map(table.__getitem__, values), dtype=numpy.int32, count=len(values))
+
+
+def _encode_lists(values, separators, table):
+    """(inicios, números) de un campo con varios valores por artículo separados por `separators`.
+
+    Como en Temas.count_matrix, todo el lote se corta de una vez y cada valor distinto se
+    limpia una sola vez.
+    """
+    separator = separators[0]
+    text = "\x00".join(values)
+    for other in separators[1:]:
+        text = text.replace(other, separator)
+    raw = new_vocabulary()
+    raw["\x00"]
+    parts = text.replace("\x00", f"{separator}\x00{separator}").split(separator)
+    ids = numpy.fromiter(map(raw.__getitem__, parts), dtype=numpy.int64, count=len(parts))
+
+    # Número de cada valor crudo en la tabla (0 para el separador, los vacíos y los descartados)
+    cleaned = (part.strip() for part in raw)
+    lookup = numpy.fromiter((table[part] if part and part not in NOT_AUTHORS and known(part) else 0
+                             for part in cleaned), dtype=numpy.int32, count=len(raw))
+    rows = numpy.cumsum(ids == raw["\x00"])
+    codes = lookup[ids]
+    keep = codes > 0
+    offsets = numpy.zeros(len(values) + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(rows[keep], minlength=len(values)), out=offsets[1:])
+    return offsets, codes[keep]
+
+
+def _build_columns(data, start, tables):
+    """Columnas de los artículos de `data` desde `start`; devuelve (columnas, artículos, fin)."""
+    parts = defaultdict(list)
+    names = ("year",) + SINGLE_FIELDS + tuple(MULTI_FIELDS) + ("abstract",)
+    entries = iter_entries(data, names, start=start)
+    records, end = 0, start
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        values = {name: [entry.fields.get(name) for entry in batch] for name in names}
+        parts["year"].append(numpy.fromiter(map(year_number, values["year"]), dtype=numpy.int16, count=len(batch)))
+        for name in SINGLE_FIELDS:
+            column = [value.strip() if known(value) else "" for value in values[name]]
+            parts[name].append(_encode(column, tables[name]))
+        lists = {name: _encode_lists([value or "" for value in values[name]], separators, tables[name])
+                 for name, separators in MULTI_FIELDS.items()}
+        abstracts = [value if known(value) else "" for value in values["abstract"]]
+        matrix = count_matrix(abstracts, tables["keywords"])
+        lists["keywords"] = (matrix.indptr.astype(numpy.int64), matrix.indices.astype(numpy.int32))
+        for name, (offsets, codes) in lists.items():
+            parts[f"{name}_offsets"].append(offsets)
+            parts[f"{name}_codes"].append(codes)
+        records += len(batch)
+        end = batch[-1].end
+    return parts, records, end
+
+
+def _concatenate(chunks, offsets=False):
+    """Unir los tramos de una columna; los inicios de cada tramo se corren por lo anterior."""
+    if not offsets:
+        return numpy.concatenate(chunks)
+    joined, base = [chunks[0][:1]], 0
+    for chunk in chunks:
+        joined.append(chunk[1:] + base)
+        base += int(chunk[-1])
+    return numpy.concatenate(joined)
+
+
+def _column_names():
+    return ("year",) + SINGLE_FIELDS + tuple(f"{name}_{part}" for name in tuple(MULTI_FIELDS) + ("keywords",)
+                                             for part in ("offsets", "codes"))
+
+
+
+def _save_json(path, value):
+    with open(path + ".tmp", mode="w", encoding="utf-8") as file:
+        json.dump(value, file, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def _load_tables(directory):
+    with open(os.path.join(directory, "tablas.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+
+@METRICS.timed("analytics_columns")
+def update_columns(source=SOURCE_PATH, directory=ANALYTICS_DIR, rebuild=False):
+    """Poner al día las columnas de `source`; devuelve cuántos artículos se leyeron.
+
+    Si solo se agregaron artículos al final del archivo, se leen esos y se agregan a las
+    columnas. Si cambió lo ya leído (o con `rebuild`), se generan de nuevo.
+    """
+    _require()
+    if not os.path.exists(source):
+        print(f"No existe el archivo {source}; no hay nada que analizar.")
+        return 0
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(source)
+    meta = None if rebuild else load_meta(directory, FORMAT_VERSION)
+    if meta and meta["source"] == os.path.abspath(source) and meta["size"] == stat.st_size \
+            and meta["mtime_ns"] == stat.st_mtime_ns:
+        return 0
+
+    with open(source, mode="rb") as file:
+        # mmap no admite archivos vacíos
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else contextlib.nullcontext(b"") as data:
+            appended = (meta and meta["source"] == os.path.abspath(source) and stat.st_size >= meta["end"]
+                        and prefix_hash(data, meta["end"]) == meta["prefix_hash"])
+            tables = {name: new_vocabulary() for name in SINGLE_FIELDS + tuple(MULTI_FIELDS) + ("keywords",)}
+            if appended:
+                start, previous = meta["end"], meta["records"]
+                for name, values in _load_tables(directory).items():
+                    for value in values:
+                        tables[name][value]
+            else:
+                start, previous = 0, 0
+                for name in SINGLE_FIELDS:
+                    tables[name][""]  # El 0 de los campos de un valor es "sin dato"
+                for name in tuple(MULTI_FIELDS):
+                    tables[name]["\x00"]  # En los de varios valores el 0 no se usa
+
+            parts, records, end = _build_columns(data, start, tables)
+            if appended:
+                for name in _column_names():
+                    parts[name].insert(0, numpy.load(os.path.join(directory, f"{name}.npy")))
+            new_meta = {"version": FORMAT_VERSION, "byteorder": sys.byteorder, "source": os.path.abspath(source),
+                        "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "end": end,
+                        "prefix_hash": prefix_hash(data, end), "records": previous + records}
+
+    # Sin meta.json las columnas a medio escribir no se usan
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(os.path.join(directory, "meta.json"))
+    for name in _column_names():
+        chunks = parts[name]
+        if chunks:
+            column = _concatenate(chunks, name.endswith("_offsets"))
+        else:
+            column = numpy.zeros(1 if name.endswith("_offsets") else 0,
+                                 dtype=numpy.int64 if name.endswith("_offsets") else numpy.int32)
+        numpy.save(os.path.join(directory, f"{name}.npy"), column)
+    _save_json(os.path.join(directory, "tablas.json"), {name: list(table) for name, table in tables.items()})
+    _save_json(os.path.join(directory, "meta.json"), new_meta)
+    print(f"Columnas actualizadas: {records} artículos nuevos, {new_meta['records']} en total.")
+    return records
+
+
+# -------------------------------------------------------------
+# Consultas
+# -------------------------------------------------------------
+
+class Analytics:
+    """Conteos sobre las columnas de `directory`, guardados por versión del corpus."""
+
+    def __init__(self, directory=ANALYTICS_DIR, source=SOURCE_PATH, update=True):
+        _require()
+        if update:
+            update_columns(source, directory)
+        meta = load_meta(directory, FORMAT_VERSION)
+        if meta is None:
+            raise RuntimeError(f"No hay columnas en {directory}; hay que crearlas con update_columns")
+        self.directory = directory
+        self.records = meta["records"]
+        # La firma del contenido leído identifica la versión del corpus
+        self.version = meta["prefix_hash"]
+        self.tables = _load_tables(directory)
+        self.columns = {name: numpy.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                        for name in _column_names()}
+        self._results_path = os.path.join(directory, "resultados.json")
+        try:
+            with open(self._results_path, encoding="utf-8") as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            saved = {}
+        self.results = saved.get("results", {}) if saved.get("corpus") == self.version else {}
+        self._changed = False
+
+    def _mask(self, year_from, year_to, tipo, publisher):
+        """Artículos que cumplen los filtros (None si no hay filtros)."""
+        mask = None
+
+        def restrict(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        years = self.columns["year"]
+        if year_from is not None:
+            restrict(years >= year_from)
+        if year_to is not None:
+            restrict((years <= year_to) & (years > 0))
+        for name, value in (("tipo", tipo), ("publisher", publisher)):
+            if value is not None:
+                value = value.strip().casefold()
+                codes = [code for code, known in enumerate(self.tables[name]) if known.casefold() == value]
+                restrict(numpy.isin(self.columns[name], codes))
+        return mask
+
+    def counts(self, field, limit=None, year_from=None, year_to=None, tipo=None, publisher=None):
+        """Pares (valor, cantidad de artículos) de `field`, de mayor a menor cantidad.
+
+        Los años se ordenan por año. En los campos de un valor, los artículos sin dato
+        aparecen con el valor "".
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Campo desconocido: {field} (se puede contar por {', '.join(FIELDS)})")
+        key = json.dumps([field, limit, year_from, year_to, tipo, publisher], ensure_ascii=False)
+        if key not in self.results:
+            with METRICS.phase("analytics_query", field=field):
+                self.results[key] = self._count(field, limit, self._mask(year_from, year_to, tipo, publisher))
+            self._changed = True
+        return [tuple(pair) for pair in self.results[key]]
+
+    def _count(self, field, limit, mask):
+        if field == "year" or field in SINGLE_FIELDS:
+            codes = self.columns[field]
+            if mask is not None:
+                codes = codes[mask]
+        else:
+            offsets, codes = self.columns[f"{field}_offsets"], self.columns[f"{field}_codes"]
+            if mask is not None:
+                rows = numpy.repeat(mask, numpy.diff(offsets))
+                codes = codes[rows]
+
+        if field == "year":
+            totals = numpy.bincount(codes.astype(numpy.int64))
+            return [[int(year) if year else "", int(totals[year])] for year in numpy.flatnonzero(totals)]
+        totals = numpy.bincount(codes, minlength=len(self.tables[field]))
+        present = numpy.flatnonzero(totals)
+        if limit is not None and len(present) > limit:
+            # Solo se ordenan los `limit` mayores
+            present = present[numpy.argpartition(-totals[present], limit - 1)[:limit]]
+        order = present[numpy.lexsort((present, -totals[present]))]
+        table = self.tables[field]
+        return [[table[code], int(totals[code])] for code in order]
+
+    def report(self, limit=10, **filters):
+        """Conteos de todos los campos (los `limit` mayores, salvo los años) y el total."""
+        report = {"records": self.records}
+        for field in FIELDS:
+            report[field] = self.counts(field, None if field == "year" else limit, **filters)
+        return report
+
+    def close(self):
+        """Guardar los resultados nuevos para las próximas consultas con el mismo corpus."""
+        if self._changed:
+            _save_json(self._results_path, {"corpus": self.version, "results": self.results})
+            self._changed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def report(limit=10, directory=ANALYTICS_DIR, source=SOURCE_PATH, **filters):
+    """Informe de todos los campos (actualizando antes las columnas si hace falta)."""
+    with Analytics(directory, source) as analytics:
+        return analytics.report(limit, **filters)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estadísticas de los artículos unificados.")
+    parser.add_argument("--limit", type=int, default=10, help="Cantidad de valores por campo")
+    parser.add_argument("--year-from", type=int, help="Año mínimo")
+    parser.add_argument("--year-to", type=int, help="Año máximo")
+    parser.add_argument("--tipo", help="Tipo de publicación (por ejemplo Journals o Conferences)")
+    parser.add_argument("--publisher", help="Publisher")
+    parser.add_argument("--json", action="store_true", help="Mostrar el informe como JSON")
+    parser.add_argument("--source", default=SOURCE_PATH, help="Archivo BibTeX analizado")
+    parser.add_argument("--dir", default=ANALYTICS_DIR, help="Carpeta de las columnas")
+    parser.add_argument("--rebuild", action="store_true", help="Volver a generar las columnas desde cero")
+    args = parser.parse_args()
+
+    update_columns(args.source, args.dir, rebuild=args.rebuild)
+    with Analytics(args.dir, args.source, update=False) as analytics:
+        start = time.perf_counter()
+        result = analytics.report(max(1, args.limit), year_from=args.year_from, year_to=args.year_to,
+                                  tipo=args.tipo, publisher=args.publisher)
+        elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"{result['records']} artículos")
+        for field in FIELDS:
+            print(f"\n{field}:")
+            for value, count in result[field]:
+                print(f"{count:10}  {value or '(sin dato)'}")
+    print(f"\nInforme calculado en {elapsed * 1000:.1f} ms.")
@@ -0,0 +1,319 @@
+import argparse
+import contextlib
+import json
+import mmap
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # resource no existe en Windows: no se informa el pico de memoria del proceso
+    resource = None
+
+from Categorizacion import (filter_unique, iter_articles, read_bibtex, save_bibtex, save_duplicates,
+                            unify_results_from_files)
+from Duplicados import DuplicateIndex
+from Tokenizador import iter_entries
+
+
+"""
+Benchmark del unificador sobre corpus BibTeX sintéticos.
+
+generate_corpus escribe tres archivos con la forma de Data/resultados_*.bib (IEEE, Sage y
+ACM, en la proporción de los reales) con `entries` artículos, de los cuales una fracción
+`duplicate_rate` repite un artículo anterior: la misma entrada en otra base, el título con
+otras mayúsculas y puntuación, o el título con una palabra menos (para el emparejamiento
+por similitud). Con la misma semilla el corpus es siempre el mismo.
+
+Para cada tamaño se miden por separado, en un proceso nuevo, las etapas iter_entries
+(el tokenizador solo) e iter_entries_full (el mismo sin su camino rápido, para saber
+cuánto aporta), read_bibtex, filter_unique (deduplicación), save_bibtex y
+save_duplicates, y en otro proceso la
+unificación completa (unify_results_from_files). De cada etapa se guarda el tiempo y el
+pico de memoria del proceso (RSS) al terminarla; con --trace-memory también el pico de
+memoria de Python durante la etapa (tracemalloc, que hace más lentas las etapas).
+
+Con --workers se mide además la lectura (iter_articles) con cada cantidad de procesos,
+sin el tamaño mínimo de Categorizacion.MIN_PARALLEL_SIZE, y se informa cuánto más rápida
+es que la lectura en serie. Estas mediciones deciden si conviene leer en paralelo.
+
+Los resultados se escriben en JSON (Data/benchmarks/unificador_<fecha>.json por defecto)
+y con --compare se comparan etapa por etapa con los de una ejecución anterior.
+
+Uso: python Unificador_duplicador/Benchmark_unificador.py [--sizes 10000 100000 1000000]
+     [--duplicate-rate 0.1] [--seed 1] [--workers 1 2 4] [--trace-memory] [--output archivo] [--compare archivo]
+"""
+
+
+RESULTS_DIR = "Data/benchmarks"
+FORMAT_VERSION = 1
+
+# Proporción de artículos de cada base en los archivos reales
+SOURCE_WEIGHTS = (("ieee", 0.84), ("Sage", 0.12), ("ACM", 0.04))
+TIPOS = ("Conference Paper", "Journal Article", "Research Article", "Review Article", "Book Chapter")
+PUBLISHERS = ("IEEE", "SAGE Publications", "ACM", "Springer", "Elsevier")
+
+
+def _vocabulary(rng, size=5000):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "zo", "be", "da", "fi", "go", "pu", "se", "tra",
+                 "gen", "cor", "lin", "mod", "tex", "ar", "in", "on", "er", "al"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _render(key, source, title, authors, year, journal, tipo, publisher, abstract, doi):
+    if source == "ieee":
+        url = f"https://ieeexplore.ieee.org/document/{doi.rsplit('/', 1)[-1]}/"
+    elif source == "Sage":
+        url = f"https://journals.sagepub.com/doi/abs/{doi}"
+    else:
+        url = f"https://dl.acm.org/doi/{doi}"
+    lines = [f"@article{{{key},", f"  title = {{{title}}},", f"  author = {{{authors}}},", f"  year = {{{year}}},",
+             f"  journal = {{{journal}}},"]
+    if source != "ACM":
+        lines += [f"  tipo = {{{tipo}}},", f"  publisher = {{{publisher}}},"]
+    lines += [f"  abstract = {{{abstract}}},", f"  url = {{{url}}}", "}", "", ""]
+    return "\n".join(lines)
+
+
+def generate_corpus(directory, entries, duplicate_rate=0.1, seed=1, abstract_words=60):
+    """Escribir en `directory` un corpus sintético y devolver sus archivos y datos.
+
+    Devuelve un diccionario con los archivos (`files`) y cuántos artículos repetidos se
+    generaron (`duplicates`). Si el corpus ya existe con los mismos parámetros, se reutiliza.
+    """
+    manifest_path = os.path.join(directory, "corpus.json")
+    parameters = {"entries": entries, "duplicate_rate": duplicate_rate, "seed": seed,
+                  "abstract_words": abstract_words}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest["parameters"] == parameters and all(os.path.exists(path) for path in manifest["files"]):
+            return manifest
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    surnames = [word.capitalize() for word in rng.sample(vocabulary, 800)]
+    journals = [" ".join(rng.sample(vocabulary, 4)).title() for _ in range(300)]
+    names, weights = zip(*SOURCE_WEIGHTS)
+    paths = {name: os.path.join(directory, f"resultados_{name}.bib") for name in names}
+    files = {name: open(path, mode="w", encoding="utf-8") for name, path in paths.items()}
+    counts = dict.fromkeys(names, 0)
+    originals = []  # Muestra de artículos ya escritos para repetirlos
+    duplicates = 0
+
+    try:
+        for number in range(entries):
+            source = rng.choices(names, weights)[0]
+            if originals and rng.random() < duplicate_rate:
+                title, authors, year, journal, tipo, publisher, abstract, doi = rng.choice(originals)
+                variant = rng.randrange(3)
+                if variant > 0:
+                    # Otra entrada del mismo artículo: sin el DOI en común
+                    doi = f"10.{rng.randint(1000, 9999)}/{number}"
+                if variant == 1:
+                    title = title.upper() + "."
+                elif variant == 2:
+                    words = title.split()
+                    del words[rng.randrange(1, len(words) - 1)]
+                    title = " ".join(words)
+                duplicates += 1
+            else:
+                title = " ".join(rng.choices(vocabulary, k=rng.randint(10, 16))).capitalize()
+                authors = "; ".join(f"{rng.choice('ABCDEFGHJKLMNPRST')}. {rng.choice(surnames)}"
+                                    for _ in range(rng.randint(1, 5)))
+                year = str(rng.randint(2015, 2025))
+                journal = rng.choice(journals)
+                tipo = rng.choice(TIPOS)
+                publisher = rng.choice(PUBLISHERS)
+                abstract = " ".join(rng.choices(vocabulary, k=abstract_words)).capitalize() + "."
+                doi = f"10.{rng.randint(1000, 9999)}/{number}"
+                article = (title, authors, year, journal, tipo, publisher, abstract, doi)
+                if len(originals) < 50000:
+                    originals.append(article)
+                else:
+                    originals[rng.randrange(len(originals))] = article
+            counts[source] += 1
+            key = f"ref{counts[source] // 25 + 1}_{counts[source] % 25}"
+            files[source].write(_render(key, source, title, authors, year, journal, tipo, publisher, abstract, doi))
+    finally:
+        for file in files.values():
+            file.close()
+
+    manifest = {"parameters": parameters, "files": list(paths.values()), "duplicates": duplicates,
+                "bytes": sum(os.path.getsize(path) for path in paths.values())}
+    with open(manifest_path, mode="w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    return manifest
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa kilobytes y macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class _Stages:
+    """Tiempos y memoria de las etapas que se corren dentro de un proceso."""
+
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.results = {}
+        if trace_memory:
+            tracemalloc.start()
+
+    def run(self, name, function):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        value = function()
+        stage = {"seconds": round(time.perf_counter() - start, 4), "peak_rss_mb": _peak_rss_mb()}
+        if self.trace_memory:
+            stage["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        self.results[name] = stage
+        return value
+
+
+def _count_entries(files, simple):
+    count = 0
+    for filename in files:
+        with open(filename, mode="rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                count += sum(1 for _ in iter_entries(data, simple=simple))
+    return count
+
+
+def _run_stages(files, workdir, trace_memory):
+    stages = _Stages(trace_memory)
+    with open(os.devnull, mode="w") as devnull, contextlib.redirect_stdout(devnull):
+        stages.run("iter_entries", lambda: _count_entries(files, simple=True))
+        stages.run("iter_entries_full", lambda: _count_entries(files, simple=False))
+        articles = stages.run("read_bibtex", lambda: [article for filename in files for article in read_bibtex(filename)])
+        index = DuplicateIndex()
+        duplicates = {}
+        uniques = stages.run("filter_unique", lambda: list(filter_unique(articles, index, duplicates)))
+        stages.run("save_bibtex", lambda: save_bibtex(os.path.join(workdir, "unificados.bib"), uniques))
+        stages.run("save_duplicates", lambda: save_duplicates(os.path.join(workdir, "duplicados.bib"), duplicates))
+    return {"stages": stages.results, "articles": len(articles), "unique": len(uniques),
+            "duplicate_groups": len(duplicates),
+            "duplicates": sum(len(group["files"]) - 1 for group in duplicates.values())}
+
+
+def _run_unify(files, workdir, trace_memory):
+    stages = _Stages(trace_memory)
+    # unify_results_from_files escribe en Data/ relativo a la carpeta actual
+    os.chdir(workdir)
+    with open(os.devnull, mode="w") as devnull, contextlib.redirect_stdout(devnull):
+        stages.run("unify_results_from_files", lambda: unify_results_from_files(*files))
+    return stages.results
+
+
+def _run_parse(files, workers, trace_memory):
+    stages = _Stages(trace_memory)
+    # Sin tamaño mínimo: se reparte cada archivo aunque sea chico
+    stages.run(f"iter_articles_{workers}w",
+               lambda: sum(1 for _ in iter_articles(*files, workers=workers, min_parallel_size=0)))
+    return stages.results
+
+
+def _in_new_process(function, *args):
+    # Un proceso nuevo por medición: el pico de memoria no arrastra el de otra etapa o tamaño
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(function, *args).result()
+
+
+def run_benchmark(sizes, duplicate_rate=0.1, seed=1, workers=(1,), trace_memory=False, corpus_dir=None):
+    """Medir las etapas del unificador para cada tamaño de `sizes`; devuelve el informe."""
+    corpus_dir = corpus_dir or os.path.join(tempfile.gettempdir(), "benchmark_unificador")
+    runs = []
+    for entries in sizes:
+        directory = os.path.abspath(os.path.join(corpus_dir, f"corpus_{entries}_{duplicate_rate}_{seed}"))
+        start = time.perf_counter()
+        corpus = generate_corpus(directory, entries, duplicate_rate, seed)
+        print(f"Corpus de {entries} artículos listo en {time.perf_counter() - start:.1f} s "
+              f"({corpus['bytes'] / 2 ** 20:.1f} MB, {corpus['duplicates']} repetidos)")
+        with tempfile.TemporaryDirectory() as workdir:
+            run = _in_new_process(_run_stages, corpus["files"], workdir, trace_memory)
+            run["stages"].update(_in_new_process(_run_unify, corpus["files"], workdir, trace_memory))
+            if set(workers) - {1}:
+                # La lectura en serie también se mide: es la referencia de las demás
+                for count in sorted({1, *workers}):
+                    run["stages"].update(_in_new_process(_run_parse, corpus["files"], count, trace_memory))
+        run.update({"entries": entries, "duplicate_rate": duplicate_rate, "generated_duplicates": corpus["duplicates"],
+                    "bytes": corpus["bytes"]})
+        runs.append(run)
+        for name, stage in run["stages"].items():
+            print(f"  {name:25} {stage['seconds']:9.3f} s  {entries / stage['seconds']:12.0f} art/s  "
+                  f"RSS máx. {stage['peak_rss_mb']} MB")
+        print(f"  {run['unique']} únicos y {run['duplicates']} duplicados detectados")
+        speedup = run["stages"]["iter_entries_full"]["seconds"] / run["stages"]["iter_entries"]["seconds"]
+        print(f"  Tokenizador: {speedup:.2f}x respecto del recorrido completo de cada entrada")
+        serial = run["stages"].get("iter_articles_1w")
+        for count in sorted(set(workers) - {1}):
+            speedup = serial["seconds"] / run["stages"][f"iter_articles_{count}w"]["seconds"]
+            print(f"  Lectura con {count} procesos: {speedup:.2f}x respecto de la lectura en serie")
+    return {
+        "version": FORMAT_VERSION,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "workers": list(workers),
+        "cpus": os.cpu_count(),
+        "trace_memory": trace_memory,
+        "runs": runs,
+    }
+
+
+def compare(report, previous):
+    """Imprimir, etapa por etapa, el cociente de tiempos respecto de un informe anterior."""
+    earlier = {(run["entries"], run["duplicate_rate"]): run for run in previous["runs"]}
+    if report["trace_memory"] != previous["trace_memory"]:
+        print("Atención: solo una de las ejecuciones usó --trace-memory; los tiempos no son comparables.")
+    for run in report["runs"]:
+        before = earlier.get((run["entries"], run["duplicate_rate"]))
+        if before is None:
+            continue
+        print(f"{run['entries']} artículos, comparado con {previous['date']}:")
+        for name, stage in run["stages"].items():
+            if name in before["stages"]:
+                ratio = stage["seconds"] / before["stages"][name]["seconds"]
+                print(f"  {name:25} {ratio:6.2f}x {'(más lento)' if ratio > 1.1 else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Medir el unificador sobre corpus sintéticos.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Cantidad de artículos de cada corpus")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="Fracción de artículos repetidos")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla del generador")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="Cantidades de procesos con las que medir la lectura (iter_articles)")
+    parser.add_argument("--trace-memory", action="store_true", help="Medir también el pico de memoria de Python")
+    parser.add_argument("--corpus-dir", help="Carpeta donde generar y reutilizar los corpus")
+    parser.add_argument("--output", help="Archivo JSON de resultados")
+    parser.add_argument("--compare", help="Archivo JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.duplicate_rate, args.seed, args.workers, args.trace_memory,
+                           args.corpus_dir)
+    output = args.output or os.path.join(RESULTS_DIR, f"unificador_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, mode="w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Resultados guardados en {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(report, json.load(file))
@@ -0,0 +1,163 @@
+import hashlib
+import marshal
+import os
+import struct
+
+from Registro import Article
+
+
+"""
+Caché binaria de los artículos ya leídos de cada archivo BibTeX.
+
+Por cada archivo de entrada se guarda en Data/.cache una instantánea con marshal: primero
+una cabecera con la ruta, el tamaño, la fecha de modificación y el hash del contenido, y
+después los artículos en bloques (una tupla de valores por artículo). Cada parte se guarda
+con su longitud delante y se decodifica con marshal.loads, que es mucho más rápido que
+leer objeto por objeto desde el archivo. Al volver a leer el
+archivo, si la cabecera coincide se cargan los bloques sin pasar por el tokenizador. Si
+solo cambió la fecha pero el hash es el mismo, la instantánea sigue sirviendo. Si el
+archivo cambió, la instantánea se descarta y se vuelve a generar.
+
+"""
+
+
+CACHE_DIR = "Data/.cache"
+FORMAT_VERSION = 1
+BLOCK_SIZE = 5000
+
+_LENGTH = struct.Struct("<I")
+
+
+def content_hash(filename):
+    """Hash BLAKE2b del contenido de un archivo, leído por bloques."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, mode="rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def snapshot_path(filename, cache_dir=CACHE_DIR):
+    """Ruta de la instantánea que corresponde a `filename`."""
+    name = hashlib.blake2b(os.path.abspath(filename).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(cache_dir, f"{name}.snap")
+
+
+def _write_part(file, value):
+    data = marshal.dumps(value)
+    file.write(_LENGTH.pack(len(data)))
+    file.write(data)
+
+
+def _read_part(file):
+    """Leer una parte; devuelve None al final de la instantánea."""
+    length = file.read(_LENGTH.size)
+    if len(length) < _LENGTH.size:
+        raise EOFError("instantánea incompleta")
+    return marshal.loads(file.read(_LENGTH.unpack(length)[0]))
+
+
+def _read_header(path):
+    try:
+        with open(path, mode="rb") as file:
+            return _read_part(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _is_valid(header, filename, stat):
+    """Indicar si la cabecera corresponde al contenido actual de `filename`."""
+    if not header or header.get("version") != FORMAT_VERSION or header.get("size") != stat.st_size:
+        return False
+    if header.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    # Mismo tamaño pero otra fecha (p. ej. el archivo se copió): se compara el contenido
+    return header.get("hash") == content_hash(filename)
+
+
+def _load(path):
+    with open(path, mode="rb") as file:
+        _read_part(file)  # Cabecera
+        while True:
+            block = _read_part(file)
+            if block is None:
+                return
+            for values in block:
+                yield Article.from_values(values)
+
+
+def _store(path, filename, stat, articles):
+    """Escribir la instantánea mientras se entregan los artículos recién leídos."""
+    header = {"version": FORMAT_VERSION, "source": os.path.abspath(filename), "size": stat.st_size,
+              "mtime_ns": stat.st_mtime_ns, "hash": content_hash(filename)}
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, mode="wb") as file:
+            _write_part(file, header)
+            block = []
+            for article in articles:
+                block.append(article.values())
+                if len(block) >= BLOCK_SIZE:
+                    _write_part(file, block)
+                    block = []
+                yield article
+            if block:
+                _write_part(file, block)
+            _write_part(file, None)
+    except BaseException:
+        # Lectura con error o interrumpida: lo leído no es el archivo completo
+        os.remove(temporary)
+        raise
+    # Solo una instantánea completa reemplaza a la anterior
+    os.replace(temporary, path)
+
+
+def iter_cached(filename, parse, cache_dir=CACHE_DIR):
+    """Entregar los artículos de `filename` desde la caché o, si no sirve, con `parse()`.
+
+    `parse` es una función sin argumentos que devuelve un iterador de artículos; su
+    resultado se guarda como nueva instantánea a medida que se consume. `parse` debe
+    propagar los errores de lectura: si falla, se informa el error, los artículos ya
+    entregados quedan como estaban y no se guarda la instantánea.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError as e:
+        print(f"Error al leer el archivo {filename}: {e}")
+        return
+    path = snapshot_path(filename, cache_dir)
+    header = _read_header(path)
+    if _is_valid(header, filename, stat):
+        if header["mtime_ns"] != stat.st_mtime_ns:
+            # Contenido igual con otra fecha: se actualiza la cabecera para la próxima vez
+            yield from _store(path, filename, stat, _load(path))
+        else:
+            yield from _load(path)
+        return
+
+    if header is not None:
+        os.remove(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        yield from _store(path, filename, stat, parse())
+    except Exception as e:
+        print(f"Error al leer el archivo {filename}: {e}")
+
+
+def evict_stale(cache_dir=CACHE_DIR):
+    """Borrar las instantáneas de archivos que ya no existen o de otra versión del formato.
+
+    También borra los temporales de escrituras interrumpidas. Devuelve cuántas borró.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith(".snap"):
+            header = _read_header(path)
+            if header and header.get("version") == FORMAT_VERSION and os.path.exists(header.get("source", "")):
+                continue
+        os.remove(path)
+        removed += 1
+    return removed
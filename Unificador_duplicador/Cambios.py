@@ -0,0 +1,42 @@
+import hashlib
+import json
+import os
+import sys
+
+
+"""
+Detección de cambios compartida por los archivos que se generan a partir de otros.
+
+Indice.py y Analitica.py (sobre unificados.bib) e Incremental.py (sobre los archivos de
+cada fuente) guardan hasta qué byte leyeron un archivo y el hash de esos bytes. Si al
+volver a leerlo sigue empezando igual, solo se procesa lo que se agregó al final; si no,
+se vuelve a generar todo. Los valores que faltan se escriben como "Unknown ..." en
+unificados.bib, y los dos primeros los descartan igual.
+
+"""
+
+
+def prefix_hash(data, end):
+    """Hash de los primeros `end` bytes de `data` (bytes o mmap), en hexadecimal."""
+    return hashlib.blake2b(data[:end], digest_size=16).hexdigest()
+
+
+def load_meta(directory, version):
+    """Leer meta.json de `directory`; None si no existe, está dañado o es de otra versión
+    del formato o de otro orden de bytes."""
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == version and meta.get("byteorder") == sys.byteorder else None
+
+
+def known(value):
+    """Indicar si un campo tiene valor (no falta ni quedó como "Unknown ...")."""
+    return value and not value.startswith(("Unknown", "Unkown"))
+
+
+def year_number(value):
+    """Año como entero; 0 si falta o no es un año de cuatro cifras."""
+    return int(value) if value and value.isdigit() and len(value) == 4 else 0
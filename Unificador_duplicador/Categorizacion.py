@@ -1,4 +1,19 @@
+import contextlib
+import mmap
 import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from Cache import evict_stale, iter_cached
+from Duplicados import THRESHOLD, DuplicateIndex
+from Indice import update_index
+from Metricas import METRICS
+from Registro import Article
+from Serializador import compression_for, open_output, read_compressed, render_article, write_bibtex
+from Temas import Categorizer
+from Tokenizador import iter_entries
 
 
 """ 
@@ -13,134 +28,327 @@ realizar el respectivo guardado en la misma carpeta.
 # USO DE CHATGPT PARA LA LECTURA CORRECTA DEL BIBTEXT
 # -------------------------------------------------------------
 
+# Por debajo de este tamaño, repartir un archivo entre procesos cuesta más de lo que ahorra.
+# Medido con Benchmark_unificador.py --workers 1 2 4 (máquina de 1 núcleo): con 85 MB la
+# lectura tarda 1,6 s en serie, 4,7 s con 2 procesos y 5,4 s con 4; con 8,5 MB, 0,15 s,
+# 1,5 s y 2,9 s. Arrancar los procesos y pasarles los Article cuesta más que lo que se
+# ahorra, así que la lectura en paralelo no se usa por defecto (ver __main__).
+MIN_PARALLEL_SIZE = 256 * 1024 * 1024
+CHUNKS_PER_WORKER = 4
+
+_ENTRY_START = re.compile(rb"\n@[ \t]*[A-Za-z]+[ \t]*\{")
+
+
+def article_from_entry(filename, entry):
+    """Convertir una entrada del tokenizador en un `Article` (guarda el archivo de origen)."""
+    return Article.from_fields(filename, entry.key, entry.fields)
+
+
+def iter_bibtex(filename, fields=None, start=0, end=None, strict=False):
+    """Leer un archivo BibTeX de forma perezosa, entregando un `Article` por artículo.
+
+    El archivo se proyecta en memoria (mmap) y se recorre con el tokenizador, así que
+    solo se mantiene decodificado el artículo actual. Si se indica `fields`, solo se
+    decodifican esos campos. La clave de la entrada se conserva en "entry_key".
+    `start` y `end` limitan la lectura a un rango de bytes alineado con las entradas.
+    Si no se puede leer el archivo, el error se informa y se termina; con `strict` se
+    propaga, para que quien guarda lo leído (la caché) sepa que quedó incompleto.
+    """
+    try:
+        if compression_for(filename):
+            # Los archivos comprimidos (.gz, .zst) se descomprimen completos en memoria
+            for entry in iter_entries(read_compressed(filename), fields, start, end):
+                yield article_from_entry(filename, entry)
+            return
+        with open(filename, mode="rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for entry in iter_entries(data, fields, start, end):
+                    yield article_from_entry(filename, entry)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"Error al leer el archivo {filename}: {e}")
+
+
 def read_bibtex(filename):
-    """Leer un archivo BibTeX y convertirlo en una lista de diccionarios."""
-    articles = []
+    """Leer un archivo BibTeX y convertirlo en una lista de artículos."""
+    return list(iter_bibtex(filename))
+
+
+def split_chunks(data, count):
+    """Dividir `data` en hasta `count` rangos (inicio, fin) que empiezan en una entrada '@'."""
+    size = len(data)
+    bounds = [0]
+    for i in range(1, count):
+        match = _ENTRY_START.search(data, max(size * i // count, bounds[-1]))
+        if not match:
+            break
+        if match.start() + 1 > bounds[-1]:
+            bounds.append(match.start() + 1)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _read_chunk(filename, start, end, fields):
+    """Leer un rango de un archivo BibTeX en un proceso del pool."""
+    return list(iter_bibtex(filename, fields, start, end, strict=True))
+
+
+def iter_bibtex_parallel(filename, pool, workers, fields=None, strict=False, min_size=MIN_PARALLEL_SIZE):
+    """Leer un archivo BibTeX repartiendo bloques entre los procesos de `pool`.
+
+    Los bloques se alinean con el inicio de las entradas y se entregan en el orden del
+    archivo. Solo se mantienen en vuelo `2 * workers` bloques para acotar la memoria.
+    Los archivos de menos de `min_size` bytes y los comprimidos se leen en serie. Los
+    errores se tratan como en iter_bibtex (con `strict` se propagan).
+    """
     try:
-        with open(filename, mode="r", encoding="utf-8") as file:
-            current_article = {}
-            for line in file:
-                line = line.strip()
-                if line.startswith("@article"):
-                    current_article = {"source_file": filename}  # Guardar el archivo de origen
-                elif line == "}":
-                    if current_article:
-                        articles.append(current_article)
-                else:
-                    # Parsear las líneas clave-valor
-                    if "=" in line:
-                        key, value = line.split("=", 1)
-                        key = key.strip()
-                        value = value.strip().strip("{}").strip(",")
-                        current_article[key] = value
+        if os.path.getsize(filename) < min_size or compression_for(filename):
+            yield from iter_bibtex(filename, fields, strict=strict)
+            return
+        with open(filename, mode="rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                chunks = split_chunks(data, workers * CHUNKS_PER_WORKER)
+
+        pending = deque()
+        for start, end in chunks:
+            pending.append(pool.submit(_read_chunk, filename, start, end, fields))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
     except Exception as e:
+        if strict:
+            raise
         print(f"Error al leer el archivo {filename}: {e}")
-    return articles
 
 # -----------------------------------------------------------------------------
 # USO DE CHATGPT PARA INVESTIGAR EL MANEJO DE ARCHIVOS DUPLICADOS Y UNIFICAR
 # -----------------------------------------------------------------------------
 
 
-def unify_results_from_files(*filenames):
-    """Unificar resultados a partir de varios archivos BibTeX."""
-    datasets = [read_bibtex(filename) for filename in filenames]
+def iter_articles(*filenames, workers=1, cache=False, min_parallel_size=MIN_PARALLEL_SIZE):
+    """Recorrer los artículos de varios archivos BibTeX, uno a la vez y en orden.
 
-    unique_articles = {}
-    duplicates = {}
+    Con `workers` mayor que 1 (o None para usar todos los núcleos) los archivos de al
+    menos `min_parallel_size` bytes se leen en paralelo; el orden de los artículos es el
+    mismo que en serie. Con `cache`
+    los archivos que no cambiaron se cargan desde su instantánea en Data/.cache sin
+    volver a leer el BibTeX (ver Cache.py).
+    """
+    workers = workers or os.cpu_count() or 1
+    if cache:
+        evict_stale()
+    if workers == 1:
+        for filename in filenames:
+            if cache:
+                yield from iter_cached(filename, lambda: iter_bibtex(filename, strict=True))
+            else:
+                yield from iter_bibtex(filename)
+        return
 
-    for dataset in datasets:
-        for article in dataset:
-            if "title" not in article:
-                print(f"Artículo sin título: {article}")
-                continue
-
-            key = article["title"].strip().lower()
-            if key in unique_articles:
-                if key not in duplicates:
-                    duplicates[key] = {"article": article, "files": [unique_articles[key]["source_file"]]}
-                duplicates[key]["files"].append(article["source_file"])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for filename in filenames:
+            if cache:
+                yield from iter_cached(filename, lambda: iter_bibtex_parallel(filename, pool, workers, strict=True,
+                                                                              min_size=min_parallel_size))
             else:
-                unique_articles[key] = article
+                yield from iter_bibtex_parallel(filename, pool, workers, min_size=min_parallel_size)
+
+
+def _merge_groups(duplicates, index, absorbed, root):
+    """Pasar el grupo `absorbed` al grupo `root` tras una unión en el índice.
+
+    El artículo que representaba a `absorbed` ya se entregó como único; aquí se anota
+    como una repetición más del grupo que queda y quien escribe la salida lo quita
+    después con drop_absorbed.
+    """
+    group = duplicates.pop(absorbed, None)
+    target = duplicates.setdefault(root, {"article": group["article"] if group else None,
+                                          "files": [index.source(root)], "scores": []})
+    target["files"].append(index.source(absorbed))
+    target["scores"].append(1.0)
+    if group:
+        target["files"].extend(group["files"][1:])
+        target["scores"].extend(group["scores"])
+
+
+def filter_unique(articles, index, duplicates, absorbed=None):
+    """Entregar solo los artículos no vistos y acumular los repetidos en `duplicates`.
+
+    `index` es un `DuplicateIndex`: empareja por DOI, URL canónica o título normalizado
+    y, si nada coincide, por similitud de títulos (MinHash/LSH). Guarda el archivo de
+    origen de cada artículo único sin conservarlo completo en memoria. Cada grupo de
+    duplicados lleva la similitud de cada repetición con el original.
+
+    Un artículo posterior puede unir dos grupos cuyos originales ya se entregaron (A y B
+    distintos, pero C igual a los dos): el id del grupo absorbido se agrega a `absorbed`
+    para quitar su artículo de la salida al terminar (ver drop_absorbed).
+    """
+    for article in articles:
+        if "title" not in article:
+            print(f"Artículo sin título: {article}")
+            continue
+
+        match = index.add(article)
+        for group, root in index.pop_merges():
+            _merge_groups(duplicates, index, group, root)
+            if absorbed is not None:
+                absorbed.add(group)
+        if match:
+            key, score = match
+            group = duplicates.setdefault(key, {"article": None, "files": [index.source(key)], "scores": []})
+            if group["article"] is None:
+                group["article"] = article
+            group["files"].append(article["source_file"])
+            group["scores"].append(score)
+        else:
+            yield article
+
+
+def unify_results_from_files(*filenames, workers=1, threshold=THRESHOLD, cache=False, categorizer=None):
+    """Unificar resultados a partir de varios archivos BibTeX.
+
+    Los artículos se leen y se escriben en `unificados.bib` a medida que se recorren,
+    sin cargar los archivos de entrada completos en memoria. `workers` indica cuántos
+    procesos usar para leer los archivos grandes (en serie por defecto: ver
+    MIN_PARALLEL_SIZE) y `threshold` la similitud mínima entre
+    títulos para considerarlos duplicados. Con `cache` se reutilizan las instantáneas
+    de los archivos que no cambiaron. Con un `categorizer` (Temas.Categorizer) cada
+    artículo único se escribe con el campo `categories`.
+    """
+    index = DuplicateIndex(threshold)
+    duplicates = {}
+    absorbed = set()
 
     # Crear la carpeta "Data" si no existe
     if not os.path.exists("Data"):
         os.makedirs("Data")
 
-    # Guardar resultados unificados y duplicados
-    save_bibtex("Data/unificados.bib", unique_articles.values())
-    save_duplicates("Data/duplicados.bib", duplicates)
+    # Guardar resultados unificados y duplicados (midiendo por separado lectura, deduplicación y escritura)
+    articles = METRICS.timed_iter(iter_articles(*filenames, workers=workers, cache=cache), "parse")
+    unique = METRICS.timed_iter(filter_unique(articles, index, duplicates, absorbed), "dedup")
+    fields = ()
+    if categorizer is not None:
+        unique = categorizer.label_articles(unique)
+        fields = ("categories",)
+    with METRICS.phase("write"):
+        save_bibtex("Data/unificados.bib", unique, fields=fields)
+        drop_absorbed("Data/unificados.bib", absorbed)
+        save_duplicates("Data/duplicados.bib", duplicates)
+    METRICS.count("duplicate_groups", len(duplicates))
 
 # -------------------------------------------------------------
 # USO DE CHATGPT PARA LA ESTRUCTURA DE GUARDADO
 # -------------------------------------------------------------
 
-def save_bibtex(filename, articles):
-    """Guardar artículos en formato BibTeX."""
-    try:
-        with open(filename, mode="w", encoding="utf-8") as file:
-            for i, article in enumerate(articles):
-                title = article.get("title", "Unknown Title")
-                authors = article.get("author", "Unknown Authors")
-                year = article.get("year", "Unknown Year")
-                journal = article.get("journal", "Unknown Journal")
-                tipo = article.get("tipo", "Unknown Type")
-                publisher = article.get("publisher", "Unkown Publisher")
-                abstract = article.get("abstract", "Unknown Abstract")
-                url = article.get("url", "Unknown URL")
-
-                file.write(f"@article{{ref{i},\n")
-                file.write(f"  title = {{{title}}},\n")
-                file.write(f"  author = {{{authors}}},\n")
-                file.write(f"  year = {{{year}}},\n")
-                file.write(f"  journal = {{{journal}}},\n")
-                file.write(f"  tipo = {{{tipo}}},\n")
-                file.write(f"  publisher = {{{publisher}}},\n")
-                file.write(f"  abstract = {{{abstract}}},\n")
-                file.write(f"  url = {{{url}}}\n")
-                file.write("}\n\n")
+def save_bibtex(filename, articles, mode="w", start=0, fields=()):
+    """Guardar artículos en formato BibTeX.
 
+    Con `mode="a"` se agregan al final del archivo; `start` es el número de la primera
+    referencia (ref{start}) para no repetir las claves ya escritas. Si el nombre termina
+    en .gz o .zst, la salida se comprime. `fields` son campos adicionales (como
+    "categories") que se escriben al final de los artículos que los tienen.
+    """
+    if fields:
+        rows = ((article, [(name, article.get(name)) for name in fields if article.get(name)])
+                for article in articles)
+    else:
+        rows = ((article, ()) for article in articles)
+    try:
+        write_bibtex(filename, rows, mode, start)
         print(f"Archivo guardado correctamente: {filename}")
     except Exception as e:
         print(f"Error al guardar el archivo {filename}: {e}")
 
+def drop_absorbed(filename, absorbed, prefix="ref"):
+    """Quitar de `filename` las entradas {prefix}{id} de los grupos absorbidos.
+
+    Las claves de unificados.bib son el id de cada artículo único, así que alcanza con
+    buscarlas (ver replace_entries). Devuelve cuántas entradas se quitaron.
+    """
+    if not absorbed:
+        return 0
+    removed = replace_entries(filename, dict.fromkeys(absorbed), prefix)
+    print(f"Artículos quitados de {filename} por unirse a otro grupo: {removed}")
+    return removed
+
+
+def replace_entries(filename, replacements, prefix="ref"):
+    """Reemplazar en `filename` cada entrada {prefix}{id} por el artículo `replacements[id]`
+    (con la misma clave) o quitarla si es None.
+
+    Las demás entradas se copian tal cual (con su clave) a un archivo aparte que reemplaza
+    al original. Devuelve cuántas entradas se reemplazaron o quitaron.
+    """
+    if not replacements:
+        return 0
+    articles = {f"{prefix}{record_id}": article for record_id, article in replacements.items()}
+    compression = compression_for(filename)
+    with contextlib.ExitStack() as stack:
+        if compression:
+            data = read_compressed(filename)
+        else:
+            file = stack.enter_context(open(filename, mode="rb"))
+            data = stack.enter_context(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        changed, kept_from = 0, 0
+        temporary = filename + ".tmp"
+        with open_output(temporary, mode="w", compression=compression) as output:
+            for entry in iter_entries(data, fields=()):
+                if entry.key not in articles:
+                    output.write(data[kept_from:entry.end].decode("utf-8", errors="replace"))
+                    kept_from = entry.end
+                    continue
+                output.write(data[kept_from:entry.start].decode("utf-8", errors="replace"))
+                if articles[entry.key] is not None:
+                    output.write(render_article(articles[entry.key], entry.key))
+                # La entrada se va junto con la línea en blanco que la separa de la siguiente
+                # (render_article ya termina con una)
+                kept_from = entry.end
+                while data[kept_from:kept_from + 1] in (b"\n", b"\r"):
+                    kept_from += 1
+                changed += 1
+            output.write(data[kept_from:].decode("utf-8", errors="replace"))
+    os.replace(temporary, filename)
+    return changed
+
 # -------------------------------------------------------------
 # USO DE CHATGPT PARA LA ESTRUCTURA DE GUARDADO
 # -------------------------------------------------------------
 
+def duplicate_rows(duplicates):
+    """Pares (artículo, campos extra) de cada grupo de duplicados, para write_bibtex."""
+    return ((data["article"], (("shared_files", ", ".join(data["files"])),
+                               ("similarity", ", ".join(f"{score:.2f}" for score in data.get("scores", [])))))
+            for data in duplicates.values())
+
+
 def save_duplicates(filename, duplicates):
-    """Guardar duplicados en formato BibTeX con información de las páginas compartidas."""
-    try:
-        with open(filename, mode="w", encoding="utf-8") as file:
-            for i, (key, data) in enumerate(duplicates.items()):
-                article = data["article"]
-                files = ", ".join(data["files"])
-
-                title = article.get("title", "Unknown Title")
-                authors = article.get("author", "Unknown Authors")
-                year = article.get("year", "Unknown Year")
-                journal = article.get("journal", "Unknown Journal")
-                tipo = article.get("tipo", "Unknown Type")
-                publisher = article.get("publisher", "Unkown Publisher")
-                abstract = article.get("abstract", "Unknown Abstract")
-                url = article.get("url", "Unknown URL")
-
-                file.write(f"@article{{ref_dup{i},\n")
-                file.write(f"  title = {{{title}}},\n")
-                file.write(f"  author = {{{authors}}},\n")
-                file.write(f"  year = {{{year}}},\n")
-                file.write(f"  journal = {{{journal}}},\n")
-                file.write(f"  tipo = {{{tipo}}},\n")
-                file.write(f"  publisher = {{{publisher}}},\n")
-                file.write(f"  abstract = {{{abstract}}},\n")
-                file.write(f"  url = {{{url}}},\n")
-                file.write(f"  shared_files = {{{files}}}\n")
-                file.write("}\n\n")
+    """Guardar duplicados en formato BibTeX con información de las páginas compartidas.
 
+    `similarity` lista la similitud de cada repetición con el primer artículo del grupo.
+    """
+    try:
+        write_bibtex(filename, duplicate_rows(duplicates), prefix="ref_dup")
         print(f"Archivo de duplicados guardado correctamente: {filename}")
     except Exception as e:
         print(f"Error al guardar el archivo {filename}: {e}")
 
 
-# Pasamos los archivos bib con los datos para crear un solo archivo "Unificados"
-unify_results_from_files("Data/resultados_ACM.bib", "Data/resultados_ieee.bib", "Data/resultados_Sage.bib")
\ No newline at end of file
+if __name__ == "__main__":
+    # Con --categorize (palabras clave) o --centroid se agregan los temas de Temas.py
+    categorizer = None
+    if "--centroid" in sys.argv:
+        categorizer = Categorizer(method="centroid")
+    elif "--categorize" in sys.argv:
+        categorizer = Categorizer()
+    # Con --workers N se leen en paralelo los archivos de más de MIN_PARALLEL_SIZE (en serie por defecto)
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else 1
+    # Pasamos los archivos bib con los datos para crear un solo archivo "Unificados"
+    unify_results_from_files("Data/resultados_ACM.bib", "Data/resultados_ieee.bib", "Data/resultados_Sage.bib",
+                             workers=workers, cache=True, categorizer=categorizer)
+    # Índice de búsqueda sobre unificados.bib (ver Indice.py)
+    update_index()
+    METRICS.export("unificador")
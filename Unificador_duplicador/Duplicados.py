@@ -0,0 +1,258 @@
+import hashlib
+import html
+import re
+import struct
+import unicodedata
+from array import array
+
+
+"""
+Detección de artículos duplicados entre las bases de datos (ACM, IEEE y Sage).
+
+Primero se buscan coincidencias exactas por bloques: el DOI (del campo doi, de la URL o
+embebido en el journal de ACM), la URL canónica y un hash del título normalizado. Las
+coincidencias unen grupos con union-find y cada búsqueda es O(1).
+
+Si ninguna clave coincide, se recurre a MinHash y LSH (locality-sensitive hashing): cada
+título normalizado se convierte en un conjunto de palabras y pares de palabras, y su firma
+se divide en bandas guardadas en tablas hash. Solo se comparan los artículos que comparten
+alguna banda, así que el costo por artículo no crece con el tamaño del corpus.
+
+"""
+
+
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.8
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+_UNKNOWN = ("", "unknown", "unknown authors", "unknown year", "unknown url")
+_DOI = re.compile(r"\b10\.\d{4,9}/[^\s\"<>{}]+")
+_URL = re.compile(r"^(?:[a-z][a-z0-9+.-]*:)?//([^/?#]+)([^?#]*)", re.IGNORECASE)
+# Dominio del proxy de la biblioteca (p. ej. ieeexplore-ieee-org.crai.referencistas.com)
+PROXY_SUFFIX = ".crai.referencistas.com"
+
+
+def normalize_text(text):
+    """Normalizar un texto: entidades HTML, acentos, mayúsculas y signos de puntuación."""
+    text = unicodedata.normalize("NFKD", html.unescape(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(_NON_ALNUM.sub(" ", text.casefold()).split())
+
+
+def title_key(title, normalized=None):
+    """Hash de 64 bits con signo del título normalizado (se puede pasar ya normalizado)."""
+    if normalized is None:
+        normalized = normalize_text(title)
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def extract_doi(article):
+    """DOI del artículo en minúsculas, buscado en doi, url y journal; o None."""
+    for field in ("doi", "url", "journal"):
+        match = _DOI.search(article.get(field, ""))
+        if match:
+            return match.group(0).rstrip(".,;)").lower()
+    return None
+
+
+def canonical_url(url):
+    """URL sin esquema, www, proxy de la biblioteca, parámetros ni barra final; o None."""
+    match = _URL.match(url.strip())
+    if not match:
+        return None
+    host, path = match.group(1).lower(), match.group(2).rstrip("/")
+    if host.endswith(PROXY_SUFFIX):
+        host = host[:-len(PROXY_SUFFIX)].replace("-", ".")
+    if host.startswith("www."):
+        host = host[4:]
+    return host + path
+
+
+def identity_keys(article, normalized=None):
+    """Claves exactas con las que el índice reconoce a un artículo: "doi:..." y "url:..."
+    si los tiene y, siempre al final, el hash del título (se puede pasar ya normalizado)."""
+    doi = extract_doi(article)
+    url = article.get("url", "")
+    url = canonical_url(url) if url.strip().lower() not in _UNKNOWN else None
+    keys = [key for key in (doi and "doi:" + doi, url and "url:" + url) if key]
+    keys.append(title_key(article["title"], normalized))
+    return keys
+
+
+def shingles(normalized):
+    """Conjunto de palabras y pares de palabras consecutivas de un texto ya normalizado."""
+    words = normalized.split()
+    items = set(words)
+    items.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return items
+
+
+def minhash(items, num_perm=NUM_PERM):
+    """Firma MinHash de un conjunto de cadenas.
+
+    Cada elemento produce `num_perm` valores de 32 bits con una sola llamada a SHAKE-128;
+    la firma es el mínimo de cada posición entre todos los elementos.
+    """
+    unpack = struct.Struct(f"<{num_perm}I").unpack
+    rows = [unpack(hashlib.shake_128(shingle.encode("utf-8")).digest(4 * num_perm)) for shingle in items]
+    return array("I", map(min, zip(*rows)))
+
+
+def similarity(first, second):
+    """Estimación de la similitud de Jaccard a partir de dos firmas MinHash."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def _year(article):
+    """Año del artículo como entero, o None si no se conoce."""
+    year = article.get("year", "").strip()
+    return int(year) if year.isdigit() else None
+
+
+def _surnames(article):
+    """Apellidos normalizados de los autores (separados por ',', ';' o ' and ')."""
+    authors = article.get("author", "")
+    if authors.strip().lower() in _UNKNOWN:
+        return frozenset()
+    names = (normalize_text(name).split() for name in re.split(r"[;,]| and ", authors))
+    return frozenset(words[-1] for words in names if words)
+
+
+class DuplicateIndex:
+    """Índice de duplicados: bloques exactos (DOI, URL y título) con respaldo MinHash/LSH.
+
+    `add` devuelve el grupo del artículo ya indexado al que corresponde uno nuevo. Los ids
+    de grupo son los ids de los artículos únicos, en orden de llegada. Cuando un artículo
+    comparte claves con dos grupos distintos, estos se unen (union-find) en el más antiguo
+    y la unión queda en `merges` hasta que se lee con `pop_merges`.
+
+    Una coincidencia solo por título se verifica como en LSH: si `check_year` está activo,
+    dos artículos con años conocidos que difieren en más de uno no son duplicados; con
+    `check_authors`, deben compartir al menos un apellido cuando ambos tienen autores.
+    Con `fuzzy=False` no se usa MinHash.
+    """
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS,
+                 check_authors=True, check_year=True, fuzzy=True):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.check_authors = check_authors
+        self.check_year = check_year
+        self.fuzzy = fuzzy
+        self.keys = {}
+        self.parent = []
+        self.records = []
+        self.signatures = {}
+        self.buckets = {}
+        self.merges = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def source(self, record_id):
+        """Archivo de origen del artículo indexado con `record_id`."""
+        return self.records[record_id][2]
+
+    def restore(self, record_id, parent, year, surnames, source_file, signature=None):
+        """Volver a cargar un artículo único guardado (los ids deben llegar en orden)."""
+        self.records.append((year, surnames, source_file))
+        self.parent.append(parent)
+        if signature is not None:
+            self.signatures[record_id] = signature
+            for band_key in self._band_keys(signature):
+                self.buckets.setdefault(band_key, []).append(record_id)
+
+    def find(self, record_id):
+        """Grupo (raíz del union-find) al que pertenece `record_id`."""
+        parent = self.parent
+        root = record_id
+        while parent[root] != root:
+            root = parent[root]
+        while parent[record_id] != root:
+            parent[record_id], record_id = root, parent[record_id]
+        return root
+
+    def pop_merges(self):
+        """Devolver y vaciar la lista de uniones `(grupo absorbido, grupo que queda)`."""
+        merges, self.merges = self.merges, []
+        return merges
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [hash((band, *signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def _compatible(self, record, year, surnames):
+        other_year, other_surnames, _ = record
+        if self.check_year and year is not None and other_year is not None and abs(year - other_year) > 1:
+            return False
+        if self.check_authors and surnames and other_surnames and not surnames & other_surnames:
+            return False
+        return True
+
+    def _fuzzy_match(self, signature, band_keys, year, surnames):
+        best = None
+        checked = set()
+        for band_key in band_keys:
+            for candidate in self.buckets.get(band_key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                score = similarity(signature, self.signatures[candidate])
+                if score >= self.threshold and (best is None or score > best[1]) \
+                        and self._compatible(self.records[candidate], year, surnames):
+                    best = (candidate, score)
+        return best
+
+    def add(self, article):
+        """Buscar el grupo de `article`; si no tiene, indexarlo como artículo nuevo.
+
+        Devuelve `(id de grupo, similitud)` (1.0 para coincidencias por clave), o None si
+        el artículo es nuevo; en ese caso queda indexado con el siguiente id.
+        """
+        year = _year(article)
+        surnames = _surnames(article)
+        normalized = normalize_text(article["title"])
+        keys = identity_keys(article, normalized)
+        title = keys[-1]
+
+        roots = {self.find(self.keys[key]) for key in keys[:-1] if key in self.keys}
+        owner = self.keys.get(title)
+        if owner is not None and self._compatible(self.records[owner], year, surnames):
+            roots.add(self.find(owner))
+
+        if roots:
+            root = min(roots)
+            for other in roots - {root}:
+                self.parent[other] = root
+                self.merges.append((other, root))
+            for key in keys:
+                self.keys.setdefault(key, root)
+            return root, 1.0
+
+        signature = band_keys = None
+        if self.fuzzy:
+            signature = minhash(shingles(normalized) or {normalized}, self.num_perm)
+            band_keys = self._band_keys(signature)
+            best = self._fuzzy_match(signature, band_keys, year, surnames)
+            if best:
+                root = self.find(best[0])
+                for key in keys:
+                    self.keys.setdefault(key, root)
+                return root, best[1]
+
+        record_id = len(self.records)
+        self.records.append((year, surnames, article["source_file"]))
+        self.parent.append(record_id)
+        for key in keys:
+            self.keys.setdefault(key, record_id)
+        if signature is not None:
+            self.signatures[record_id] = signature
+            for band_key in band_keys:
+                self.buckets.setdefault(band_key, []).append(record_id)
+        return None
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+
+from Categorizacion import drop_absorbed, duplicate_rows, filter_unique, iter_bibtex
+from Duplicados import THRESHOLD, DuplicateIndex
+from Metricas import METRICS
+from Registro import Article
+from Serializador import render_article, write_bibtex
+
+
+"""
+Unificación en línea: los scrapers entregan cada página y el unificador la procesa al
+momento, sin volver a leer los archivos resultados_*.bib al final.
+
+Con la opción --pipeline de Scraping/Ejecutor.py cada scraper, después de escribir una
+página en su archivo, la pone en la cola de un `Pipeline`. Un consumidor la saca de la
+cola, la pasa por el mismo índice de duplicados que Categorizacion.py (filter_unique) y
+agrega los artículos únicos al final de unificados.bib; duplicados.bib se reescribe
+cada `interval` segundos si cambió y una última vez al cerrar. Al cerrar también se
+quitan de unificados.bib los artículos cuyos grupos se unieron a otro después de
+escribirlos (ver Categorizacion.drop_absorbed).
+
+La cola admite `max_pages` páginas: si el unificador se atrasa, el scraper que quiera
+entregar otra espera (back-pressure), así que en memoria solo hay esas páginas más el
+índice de duplicados. La deduplicación corre en un hilo para no frenar a los
+navegadores, que comparten el bucle de eventos.
+
+Como los artículos llegan en el orden en que terminan las páginas de las tres fuentes,
+el artículo que queda como original de un grupo puede no ser el mismo que elige la
+unificación por lotes (que lee ACM, IEEE y Sage en ese orden); los grupos son los mismos.
+"""
+
+
+UNIFIED_PATH = "Data/unificados.bib"
+DUPLICATES_PATH = "Data/duplicados.bib"
+
+# Páginas que pueden esperar en la cola antes de frenar a los scrapers
+QUEUE_PAGES = 8
+# Segundos mínimos entre dos reescrituras de duplicados.bib
+DUPLICATES_INTERVAL = 5.0
+
+
+class Pipeline:
+    """Cola acotada de páginas de resultados y el consumidor que las unifica al llegar."""
+
+    def __init__(self, unified_path=UNIFIED_PATH, duplicates_path=DUPLICATES_PATH, threshold=THRESHOLD,
+                 max_pages=QUEUE_PAGES, interval=DUPLICATES_INTERVAL):
+        self.unified_path = unified_path
+        self.duplicates_path = duplicates_path
+        self.interval = interval
+        self.queue = asyncio.Queue(max_pages)
+        self.index = DuplicateIndex(threshold)
+        self.duplicates = {}
+        self.absorbed = set()
+        self.written = 0
+        self._file = None
+        self._consumer = None
+        self._saved_repeated = None
+        self._saved_at = 0.0
+
+    def start(self):
+        """Abrir unificados.bib (desde cero) y empezar a consumir la cola."""
+        folder = os.path.dirname(self.unified_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._file = open(self.unified_path, mode="w", encoding="utf-8")
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def put(self, source_file, page_num, records):
+        """Entregar los registros de una página (None en los que no hay que unificar).
+
+        Espera si la cola está llena hasta que el unificador libere lugar.
+        """
+        await self.queue.put((source_file, page_num, records, None))
+
+    async def prime(self, filename, end):
+        """Unificar los artículos que `filename` ya tenía hasta el byte `end` (al reanudar)."""
+        await self.queue.put((filename, None, None, end))
+
+    async def close(self):
+        """Esperar a que se unifique todo lo entregado y guardar duplicados.bib."""
+        if self._consumer is None:
+            return
+        await self.queue.put(None)
+        try:
+            await self._consumer
+        finally:
+            self._consumer = None
+            await asyncio.to_thread(self._save_duplicates, True)
+            self._file.close()
+            # Los originales de grupos que se unieron después de escribirlos
+            await asyncio.to_thread(drop_absorbed, self.unified_path, self.absorbed)
+            METRICS.count("duplicate_groups", len(self.duplicates), stage="unificador")
+            print(f"Archivo guardado correctamente: {self.unified_path} ({self.written - len(self.absorbed)} artículos únicos)")
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _consume(self):
+        METRICS.bind(stage="unificador")
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            try:
+                await asyncio.to_thread(self._process, *item)
+            except Exception as e:
+                # Un error en una página no detiene a los scrapers ni al resto de la unificación
+                print(f"Error al unificar una página de {item[0]}: {e}")
+
+    def _process(self, source_file, page_num, records, end):
+        if end is not None:
+            articles = iter_bibtex(source_file, end=end)
+        else:
+            articles = (Article.from_fields(source_file, f"ref{page_num}_{i}", record)
+                        for i, record in enumerate(records) if record is not None)
+        unique = METRICS.timed_iter(filter_unique(articles, self.index, self.duplicates, self.absorbed), "dedup")
+        with METRICS.phase("write"):
+            chunk = []
+            for article in unique:
+                chunk.append(render_article(article, f"ref{self.written}"))
+                self.written += 1
+            self._file.write("".join(chunk))
+            self._file.flush()
+        self._save_duplicates()
+
+    def _save_duplicates(self, final=False):
+        # Cada repetición nueva agrega un archivo a su grupo: si el total no cambió, no hay nada nuevo
+        repeated = sum(len(data["files"]) for data in self.duplicates.values())
+        if repeated == self._saved_repeated or (not final and time.monotonic() - self._saved_at < self.interval):
+            return
+        with METRICS.phase("write"):
+            # Se escribe aparte y se reemplaza, para que nunca se lea un archivo a medias
+            temporary = self.duplicates_path + ".tmp"
+            write_bibtex(temporary, duplicate_rows(self.duplicates), prefix="ref_dup")
+            os.replace(temporary, self.duplicates_path)
+        self._saved_repeated = repeated
+        self._saved_at = time.monotonic()
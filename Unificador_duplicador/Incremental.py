@@ -0,0 +1,332 @@
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import sys
+from array import array
+
+from Cambios import prefix_hash
+from Categorizacion import article_from_entry, filter_unique, replace_entries, save_bibtex, save_duplicates
+from Duplicados import THRESHOLD, DuplicateIndex, identity_keys
+from Indice import update_index
+from Metricas import METRICS
+from Registro import Article
+from Tokenizador import iter_entries
+
+
+"""
+Unificación incremental respaldada por un índice SQLite en la carpeta Data.
+
+El índice guarda, por cada archivo de entrada, su tamaño, fecha de modificación y hasta
+qué byte se procesó; por cada artículo leído, su identidad (DOI, URL canónica o hash del
+título: la misma clave con la que lo reconoce el índice de duplicados), el hash de su
+contenido y si quedó como artículo único (ref{id} en unificados.bib) o en un grupo de
+duplicados; y el estado del índice de duplicados (claves, grupos y firmas MinHash).
+
+En cada ejecución solo se leen los archivos que cambiaron. Si un scraper agregó páginas
+al final, se lee solo lo nuevo. Si el archivo se reescribió, cada artículo se busca por
+identidad y no por clave, así que cambiar las claves o el orden no genera duplicados:
+los artículos con el mismo contenido se omiten, los modificados reemplazan su entrada
+de unificados.bib y los que ya no están se quitan (si tenían repeticiones, la primera
+pasa a ocupar su lugar). Los artículos únicos nuevos se agregan al final de
+unificados.bib y duplicados.bib se regenera desde el índice (solo contiene los grupos
+de duplicados).
+
+"""
+
+
+INDEX_PATH = "Data/indice_unificacion.sqlite"
+UNIFIED_PATH = "Data/unificados.bib"
+DUPLICATES_PATH = "Data/duplicados.bib"
+
+# Versión del esquema (PRAGMA user_version): si no coincide, el índice se vuelve a generar
+_FORMAT_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, offset INTEGER, prefix_hash BLOB
+);
+CREATE TABLE IF NOT EXISTS sources (
+    source_file TEXT, identity TEXT, occurrence INTEGER, content BLOB, record_id INTEGER,
+    member INTEGER, PRIMARY KEY (source_file, identity, occurrence)
+);
+CREATE TABLE IF NOT EXISTS uniques (
+    record_id INTEGER PRIMARY KEY, parent INTEGER, year INTEGER, surnames TEXT,
+    source_file TEXT, signature BLOB
+);
+CREATE TABLE IF NOT EXISTS keys (key PRIMARY KEY, record_id INTEGER);
+CREATE TABLE IF NOT EXISTS groups (group_id INTEGER PRIMARY KEY, data TEXT);
+"""
+
+# Separador de apellidos al guardarlos como texto
+_SEP = "\x1f"
+
+
+def record_hash(article):
+    """Hash del contenido de un artículo (sin su archivo de origen ni su clave)."""
+    content = _SEP.join(f"{key}={value}" for key, value in sorted(article.items())
+                        if key not in ("source_file", "entry_key"))
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+
+
+def _connect(index_path, reset):
+    """Abrir el índice; si se pide `reset` o es de otra versión, se vacía. Devuelve
+    `(conexión, si se vació)`."""
+    connection = sqlite3.connect(index_path)
+    reset = reset or connection.execute("PRAGMA user_version").fetchone()[0] != _FORMAT_VERSION
+    if reset:
+        connection.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS records; "
+                                 "DROP TABLE IF EXISTS sources; DROP TABLE IF EXISTS uniques; "
+                                 "DROP TABLE IF EXISTS keys; DROP TABLE IF EXISTS groups;")
+        connection.execute(f"PRAGMA user_version = {_FORMAT_VERSION}")
+    connection.executescript(_SCHEMA)
+    return connection, reset
+
+
+def _pending_files(connection, filenames):
+    """Archivos que cambiaron desde la última ejecución, con el byte desde el que leer.
+
+    Los archivos que no existen se informan y se omiten; el resto se unifica igual.
+    """
+    pending = []
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            print(f"No se encontró el archivo {filename}; se omite.")
+            continue
+        row = connection.execute("SELECT size, mtime_ns, offset, prefix_hash FROM files WHERE path = ?",
+                                 (filename,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            continue
+        start = 0
+        if row and stat.st_size >= row[2] > 0:
+            with open(filename, mode="rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if prefix_hash(data, row[2]) == row[3]:
+                        start = row[2]  # Solo se agregó contenido al final
+        pending.append((filename, start, stat))
+    return pending
+
+
+def _load_index(connection, threshold):
+    index = DuplicateIndex(threshold)
+    sources = {}
+    for record_id, parent, year, surnames, source_file, signature in connection.execute(
+            "SELECT record_id, parent, year, surnames, source_file, signature FROM uniques ORDER BY record_id"):
+        if signature is not None:
+            signature = array("I", signature)
+        surnames = frozenset(surnames.split(_SEP)) if surnames else frozenset()
+        source_file = sources.setdefault(source_file, sys.intern(source_file))
+        index.restore(record_id, parent, year, surnames, source_file, signature)
+    index.keys = dict(connection.execute("SELECT key, record_id FROM keys ORDER BY rowid"))
+    return index
+
+
+def _iter_new_articles(connection, pending, offsets, index, duplicates, changes):
+    """Leer los archivos pendientes y entregar solo los artículos que no estaban registrados.
+
+    Cada artículo se busca por archivo, identidad y número de repetición de esa identidad
+    en el archivo, así que las claves y el orden de las entradas no importan. Si el
+    contenido cambió, el artículo único se anota en `changes["replaced"]` para reescribir
+    su entrada (o, si era una repetición, actualiza su grupo en `duplicates`). Las filas
+    nuevas o modificadas quedan en `changes["rows"]` y las registradas que ya no están en
+    un archivo leído desde el principio, en `changes["removed"]`.
+    """
+    rows, replaced = changes["rows"], changes["replaced"]
+    for filename, start, stat in pending:
+        offsets[filename] = start
+        stored = {(identity, occurrence): (content, record_id, member)
+                  for identity, occurrence, content, record_id, member in connection.execute(
+                      "SELECT identity, occurrence, content, record_id, member FROM sources WHERE source_file = ?",
+                      (filename,))}
+        occurrences = {}
+        if start:
+            # Solo se lee lo agregado al final: las repeticiones siguen la numeración guardada
+            for identity, occurrence in stored:
+                occurrences[identity] = max(occurrences.get(identity, 0), occurrence + 1)
+        if stat.st_size:
+            with open(filename, mode="rb") as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    for entry in iter_entries(data, start=start):
+                        offsets[filename] = entry.end
+                        article = article_from_entry(filename, entry)
+                        if "title" not in article:
+                            yield article  # filter_unique lo informa y lo descarta
+                            continue
+                        keys = identity_keys(article)
+                        identity = str(keys[0])
+                        occurrence = occurrences.get(identity, 0)
+                        occurrences[identity] = occurrence + 1
+                        content = record_hash(article)
+                        known = stored.pop((identity, occurrence), None)
+                        if known is None:
+                            record_id = len(index)
+                            yield article
+                            # Al volver, filter_unique ya lo procesó: si quedó como único tiene el id siguiente
+                            member = int(len(index) == record_id)
+                            if member:
+                                record_id = index.find(index.keys[keys[0]])
+                            rows.append((filename, identity, occurrence, content, record_id, member))
+                            changes["new"] += 1
+                        elif known[0] != content:
+                            _, record_id, member = known
+                            rows.append((filename, identity, occurrence, content, record_id, member))
+                            changes["changed"] += 1
+                            root = index.find(record_id)
+                            if not member and root == record_id:
+                                replaced[record_id] = article
+                                for key in keys:
+                                    index.keys.setdefault(key, record_id)
+                            elif root in duplicates and _same_record(duplicates[root]["article"], filename, identity):
+                                duplicates[root]["article"] = article
+        if not start:
+            changes["removed"].extend((filename, identity, occurrence, record_id, member)
+                                      for (identity, occurrence), (_, record_id, member) in stored.items())
+
+
+def _identity(article):
+    """Identidad con la que se registra un artículo en `sources`: su primera clave exacta."""
+    return str(identity_keys(article)[0])
+
+
+def _same_record(article, filename, identity):
+    return article["source_file"] == filename and _identity(article) == identity
+
+
+def _remove_records(index, duplicates, removed, replaced):
+    """Quitar los artículos registrados que ya no están en su archivo.
+
+    Una repetición se quita de su grupo. Un artículo único se quita de unificados.bib
+    (`replaced[id] = None`), salvo que tenga repeticiones: entonces el artículo del grupo
+    ocupa su entrada. Devuelve `(promoted, dropped)`: las repeticiones que pasaron a ser
+    únicas, como `(id, archivo, identidad)`, y los ids de los artículos únicos quitados.
+    """
+    promoted, dropped = [], []
+    gone = {(filename, identity) for filename, identity, _, _, _ in removed}
+    # Primero las repeticiones, para que cada grupo quede como está antes de reemplazar su original
+    for filename, identity, _, record_id, member in sorted(removed, key=lambda row: -row[4]):
+        root = index.find(record_id)
+        group = duplicates.get(root)
+        if member or root != record_id:
+            if group and filename in group["files"][1:]:
+                _remove_member(group, group["files"].index(filename, 1))
+        elif group is None:
+            replaced[record_id] = None
+            dropped.append(record_id)
+        else:
+            article = group["article"]
+            source = article["source_file"]
+            if (source, _identity(article)) in gone or source not in group["files"][1:]:
+                # El artículo del grupo también se quitó: la entrada se va y el grupo queda
+                replaced[record_id] = None
+                continue
+            replaced[record_id] = article
+            group["files"][0] = source
+            _remove_member(group, group["files"].index(source, 1))
+            year, surnames, _ = index.records[record_id]
+            index.records[record_id] = (year, surnames, source)
+            promoted.append((record_id, source, _identity(article)))
+        if group is not None and not group["scores"]:
+            del duplicates[root]
+    return promoted, dropped
+
+
+def _remove_member(group, position):
+    del group["files"][position]
+    del group["scores"][position - 1]
+
+
+def _save_state(connection, index, known_records, known_keys, known_parents, duplicates, promoted, dropped):
+    connection.executemany(
+        "INSERT INTO uniques VALUES (?, ?, ?, ?, ?, ?)",
+        ((record_id, index.parent[record_id], year, _SEP.join(sorted(surnames)), source_file,
+          index.signatures[record_id].tobytes() if record_id in index.signatures else None)
+         for record_id, (year, surnames, source_file) in enumerate(index.records)
+         if record_id >= known_records))
+    connection.executemany(
+        "UPDATE uniques SET parent = ? WHERE record_id = ?",
+        ((parent, record_id) for record_id, (parent, old) in enumerate(zip(index.parent, known_parents))
+         if parent != old))
+    connection.executemany(
+        "INSERT INTO keys VALUES (?, ?)",
+        (item for position, item in enumerate(index.keys.items()) if position >= known_keys))
+    # Una repetición que reemplazó a su original ocupa su id; un artículo quitado deja de emparejar
+    for record_id, source_file, identity in promoted:
+        connection.execute("UPDATE uniques SET source_file = ? WHERE record_id = ?", (source_file, record_id))
+        connection.execute("UPDATE sources SET record_id = ?, member = 0 WHERE rowid = (SELECT rowid FROM sources "
+                           "WHERE source_file = ? AND identity = ? AND member = 1 LIMIT 1)",
+                           (record_id, source_file, identity))
+    connection.executemany("DELETE FROM keys WHERE record_id = ?", ((record_id,) for record_id in dropped))
+    connection.executemany("UPDATE uniques SET signature = NULL WHERE record_id = ?",
+                           ((record_id,) for record_id in dropped))
+    connection.execute("DELETE FROM groups")
+    connection.executemany("INSERT INTO groups VALUES (?, ?)",
+                           ((group_id, json.dumps(data, ensure_ascii=False, default=Article.to_dict))
+                            for group_id, data in duplicates.items()))
+
+
+def unify_incremental(*filenames, index_path=INDEX_PATH, threshold=THRESHOLD):
+    """Unificar solo los artículos nuevos, modificados o quitados desde la última ejecución.
+
+    Si no existe el índice o `unificados.bib`, o el índice es de otra versión, se hace una
+    unificación completa y se construye el índice. Devuelve la cantidad de artículos
+    nuevos, modificados o quitados.
+    """
+    # Crear la carpeta "Data" si no existe
+    if not os.path.exists("Data"):
+        os.makedirs("Data")
+
+    connection, reset = _connect(index_path, not os.path.exists(UNIFIED_PATH) or not os.path.exists(index_path))
+    try:
+        pending = _pending_files(connection, filenames)
+        if not pending:
+            print("No hay cambios en los archivos de entrada.")
+            return 0
+
+        index = _load_index(connection, threshold)
+        known_records, known_keys, known_parents = len(index), len(index.keys), list(index.parent)
+        duplicates = {group_id: json.loads(data) for group_id, data in connection.execute("SELECT * FROM groups")}
+        for data in duplicates.values():
+            data["article"] = Article(**data["article"])
+
+        offsets = {}
+        changes = {"new": 0, "changed": 0, "rows": [], "replaced": {}, "removed": []}
+        articles = METRICS.timed_iter(_iter_new_articles(connection, pending, offsets, index, duplicates, changes),
+                                      "parse")
+        absorbed = set()
+        unique = METRICS.timed_iter(filter_unique(articles, index, duplicates, absorbed), "dedup")
+        with METRICS.phase("write"):
+            save_bibtex(UNIFIED_PATH, unique, mode="w" if reset else "a", start=known_records)
+            promoted, dropped = _remove_records(index, duplicates, changes["removed"], changes["replaced"])
+            # Los grupos absorbidos se quitan aunque su artículo también haya cambiado
+            replace_entries(UNIFIED_PATH, {**changes["replaced"], **dict.fromkeys(absorbed)})
+            if changes["rows"] or changes["removed"] or reset:
+                save_duplicates(DUPLICATES_PATH, duplicates)
+
+        with METRICS.phase("index"), connection:
+            connection.executemany("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)", changes["rows"])
+            connection.executemany("DELETE FROM sources WHERE source_file = ? AND identity = ? AND occurrence = ?",
+                                   (row[:3] for row in changes["removed"]))
+            _save_state(connection, index, known_records, known_keys, known_parents, duplicates, promoted, dropped)
+            for filename, _, stat in pending:
+                with open(filename, mode="rb") as file:
+                    digest = prefix_hash(file.read(offsets[filename]), offsets[filename])
+                connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                                   (filename, stat.st_size, stat.st_mtime_ns, offsets[filename], digest))
+
+        total = changes["new"] + changes["changed"] + len(changes["removed"])
+        print(f"Artículos nuevos: {changes['new']}, modificados: {changes['changed']}, "
+              f"quitados: {len(changes['removed'])}")
+        return total
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    unify_incremental("Data/resultados_ACM.bib", "Data/resultados_ieee.bib", "Data/resultados_Sage.bib")
+    # Los artículos nuevos quedaron al final de unificados.bib y los modificados se reescribieron en su lugar:
+    # el índice de búsqueda detecta cuál de los dos casos es
+    update_index()
+    METRICS.export("unificador")
@@ -0,0 +1,478 @@
+import argparse
+import contextlib
+import heapq
+import json
+import marshal
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:  # numpy es opcional: sin él las consultas se puntúan en Python puro
+    numpy = None
+
+from Cambios import known, load_meta, prefix_hash, year_number
+from Duplicados import normalize_text
+from Metricas import METRICS
+from Registro import Article
+from Tokenizador import iter_entries
+
+
+"""
+Índice invertido de texto completo con ranking BM25 sobre Data/unificados.bib.
+
+El índice se guarda en Data/indice como segmentos: cada segmento cubre un tramo de bytes
+del archivo unificado y es un solo archivo binario que se proyecta en memoria (mmap) al
+consultar, sin leerlo ni decodificarlo completo. Un segmento tiene:
+- por artículo: el byte donde empieza en el archivo unificado, el año, el tipo y el
+  publisher (como números de una tabla) y la cantidad de palabras de cada campo en un
+  byte (exacta hasta 127 y aproximada en un 5 % por encima; ver _length_code);
+- el diccionario de términos ordenado (se busca por bisección directamente en el mmap);
+- por término, su lista de artículos (4 bytes cada uno) y cuántas veces aparece en cada
+  campo (1 byte por campo).
+
+Se indexan el título, el resumen, los autores y el journal. La puntuación es BM25F: las
+frecuencias de cada campo se normalizan por el largo del campo y se suman con el peso de
+FIELD_WEIGHTS antes de aplicar la saturación de BM25. Las estadísticas (cantidad de
+artículos, largos promedio y frecuencia de cada término) son las de todos los segmentos;
+como el largo de cada campo ocupa un byte, la normalización por largo de una consulta es
+una tabla de 256 valores por campo y no hay que recorrer todos los artículos.
+Si numpy está instalado, las listas se leen como arreglos sobre el mmap y se puntúan de
+una vez; si no, se recorren en Python.
+
+update_index agrega un segmento con los artículos que se escribieron al final del archivo
+desde la última vez (Incremental.py y el modo pipeline solo agregan al final); si el
+contenido ya indexado cambió, o hay más de MAX_SEGMENTS segmentos, el índice se
+reconstruye en un solo segmento.
+
+Uso: python Unificador_duplicador/Indice.py "consulta" [--year-from AÑO] [--year-to AÑO] [--tipo T]
+                                             [--publisher P] [--limit N] [--rebuild]
+Sin consulta solo se actualiza el índice.
+"""
+
+
+INDEX_DIR = "Data/indice"
+SOURCE_PATH = "Data/unificados.bib"
+FORMAT_VERSION = 1
+MAX_SEGMENTS = 8
+
+# Campos indexados y su peso en BM25F
+FIELD_WEIGHTS = (("title", 3.0), ("abstract", 1.0), ("author", 1.5), ("journal", 0.5))
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it", "its", "of",
+    "on", "or", "that", "the", "their", "this", "to", "was", "were", "which", "with",
+    "de", "del", "el", "en", "la", "las", "los", "para", "por", "un", "una", "y",
+))
+
+_MAGIC = b"BM25SEG\0"
+_LENGTH = struct.Struct("<I")
+_FIELDS = tuple(name for name, _ in FIELD_WEIGHTS)
+_WEIGHTS = tuple(weight for _, weight in FIELD_WEIGHTS)
+# Tipo de cada arreglo del segmento (códigos de array)
+_TYPECODES = {"offsets": "Q", "years": "h", "tipos": "H", "publishers": "H", "term_offsets": "I",
+              "dfs": "I", "postings_at": "Q", "term_blob": "B", "postings": "B",
+              **{f"len_{name}": "B" for name in _FIELDS}}
+_NUMPY_TYPES = {"Q": "uint64", "h": "int16", "H": "uint16", "I": "uint32", "B": "uint8"}
+
+
+def tokenize(text):
+    """Palabras normalizadas de `text` sin las palabras vacías."""
+    return [word for word in normalize_text(text).split() if word not in STOPWORDS]
+
+
+
+def _length_code(length):
+    """Largo de un campo en un byte: exacto hasta 127 palabras y con un error de hasta 5 % por encima."""
+    if length < 128:
+        return length
+    return min(255, 128 + int(math.log(length / 128) / math.log(1.05)))
+
+
+def _code_length(code):
+    return code if code < 128 else 128 * 1.05 ** (code - 128)
+
+
+
+
+# -------------------------------------------------------------
+# Construcción de segmentos
+# -------------------------------------------------------------
+
+def build_segment(data, path, start=0, end=None):
+    """Indexar las entradas de `data` entre `start` y `end` y guardarlas en `path`.
+
+    Devuelve (cantidad de artículos, byte donde termina la última entrada indexada).
+    """
+    offsets, years = array("Q"), array("h")
+    tipos, publishers = array("H"), array("H")
+    lengths = [array("B") for _ in _FIELDS]
+    totals = [0] * len(_FIELDS)
+    tables = {"tipos": {"": 0}, "publishers": {"": 0}}
+    # término -> [artículo, frecuencia en cada campo, ...] (cinco enteros por aparición)
+    postings = {}
+    last = start
+
+    for doc, entry in enumerate(iter_entries(data, start=start, end=end)):
+        fields = entry.fields
+        offsets.append(entry.start)
+        years.append(year_number(fields.get("year")))
+        for name, column in (("tipos", tipos), ("publishers", publishers)):
+            value = fields.get(name[:-1], "")
+            value = value.strip().casefold() if known(value) else ""
+            column.append(tables[name].setdefault(value, len(tables[name])))
+
+        counts = []
+        for i, (name, column) in enumerate(zip(_FIELDS, lengths)):
+            words = tokenize(fields[name]) if known(fields.get(name)) else []
+            column.append(_length_code(len(words)))
+            totals[i] += len(words)
+            counts.append(Counter(words))
+        for term in set().union(*counts):
+            row = postings.get(term)
+            if row is None:
+                row = postings[term] = array("I")
+            row.append(doc)
+            # Con la saturación de BM25, más de 255 apariciones en un campo no cambian el puntaje
+            row.extend(min(count[term], 0xFF) for count in counts)
+        last = entry.end
+
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+    term_blob = bytearray()
+    term_offsets, dfs, postings_at = array("I", [0]), array("I"), array("Q")
+    blob = bytearray()
+    width = 1 + len(_FIELDS)
+    for term in terms:
+        row = postings.pop(term)
+        term_blob += term.encode("utf-8")
+        term_offsets.append(len(term_blob))
+        dfs.append(len(row) // width)
+        postings_at.append(len(blob))
+        # Artículos (uint32) y luego la frecuencia de cada campo (uint8), campo por campo
+        blob += row[0::width].tobytes()
+        for position in range(1, width):
+            blob += array("B", row[position::width]).tobytes()
+
+    sections = {"offsets": offsets, "years": years, "tipos": tipos, "publishers": publishers,
+                "term_offsets": term_offsets, "dfs": dfs, "postings_at": postings_at,
+                "term_blob": term_blob, "postings": blob,
+                **{f"len_{name}": column for name, column in zip(_FIELDS, lengths)}}
+    header = {
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "docs": len(offsets),
+        "terms": len(terms),
+        "total_lengths": totals,
+        "tipos": sorted(tables["tipos"], key=tables["tipos"].get),
+        "publishers": sorted(tables["publishers"], key=tables["publishers"].get),
+        "sections": {},
+    }
+    _write_segment(path, header, sections)
+    return len(offsets), last
+
+
+def _write_segment(path, header, sections):
+    position = 0
+    for name, values in sections.items():
+        size = len(values) * (values.itemsize if isinstance(values, array) else 1)
+        header["sections"][name] = [position, size]
+        position += size + (-size % 8)  # Cada sección empieza alineada a 8 bytes
+    encoded = marshal.dumps(header)
+    base = len(_MAGIC) + _LENGTH.size + len(encoded)
+    base += -base % 8
+    with open(path + ".tmp", mode="wb") as file:
+        file.write(_MAGIC)
+        file.write(_LENGTH.pack(len(encoded)))
+        file.write(encoded)
+        for name, values in sections.items():
+            file.seek(base + header["sections"][name][0])
+            file.write(values if isinstance(values, bytearray) else values.tobytes())
+        file.truncate(base + position)
+    os.replace(path + ".tmp", path)
+
+
+# -------------------------------------------------------------
+# Actualización del índice
+# -------------------------------------------------------------
+
+
+def _save_meta(directory, meta):
+    path = os.path.join(directory, "meta.json")
+    with open(path + ".tmp", mode="w", encoding="utf-8") as file:
+        json.dump(meta, file, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+@METRICS.timed("search_index")
+def update_index(source=SOURCE_PATH, directory=INDEX_DIR, rebuild=False):
+    """Poner al día el índice de `source`; devuelve cuántos artículos se indexaron.
+
+    Si solo se agregaron artículos al final del archivo, se indexan esos en un segmento
+    nuevo. Si cambió lo ya indexado (o con `rebuild`), se reconstruye todo.
+    """
+    if not os.path.exists(source):
+        print(f"No existe el archivo {source}; no hay nada que indexar.")
+        return 0
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(source)
+    meta = None if rebuild else load_meta(directory, FORMAT_VERSION)
+    if meta and meta["source"] == os.path.abspath(source) and meta["size"] == stat.st_size \
+            and meta["mtime_ns"] == stat.st_mtime_ns:
+        return 0
+
+    with open(source, mode="rb") as file:
+        # mmap no admite archivos vacíos
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else contextlib.nullcontext(b"") as data:
+            appended = (meta and meta["source"] == os.path.abspath(source) and stat.st_size >= meta["end"]
+                        and prefix_hash(data, meta["end"]) == meta["prefix_hash"])
+            if appended and len(meta["segments"]) < MAX_SEGMENTS:
+                segments, start, counter = meta["segments"], meta["end"], meta["next_segment"]
+            else:
+                segments, start, counter = [], 0, (meta or {}).get("next_segment", 0)
+
+            name = f"seg_{counter:04d}.idx"
+            docs, end = build_segment(data, os.path.join(directory, name), start)
+            if docs:
+                segments = segments + [{"file": name, "start": start, "end": end, "docs": docs}]
+                counter += 1
+            else:
+                os.remove(os.path.join(directory, name))
+                end = start
+            new_meta = {"version": FORMAT_VERSION, "byteorder": sys.byteorder, "source": os.path.abspath(source),
+                        "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "end": end,
+                        "prefix_hash": prefix_hash(data, end), "next_segment": counter, "segments": segments}
+
+    _save_meta(directory, new_meta)
+    # Los segmentos que quedaron fuera (tras reconstruir) ya no se usan
+    current = {segment["file"] for segment in segments}
+    for stale in os.listdir(directory):
+        if stale.endswith(".idx") and stale not in current:
+            os.remove(os.path.join(directory, stale))
+    print(f"Índice actualizado: {docs} artículos nuevos, {sum(s['docs'] for s in segments)} en total "
+          f"({len(segments)} segmentos).")
+    return docs
+
+
+# -------------------------------------------------------------
+# Consultas
+# -------------------------------------------------------------
+
+class _Segment:
+    """Un segmento proyectado en memoria."""
+
+    def __init__(self, path):
+        self.file = open(path, mode="rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{path} no es un segmento del índice")
+        length = _LENGTH.unpack_from(self.data, len(_MAGIC))[0]
+        start = len(_MAGIC) + _LENGTH.size
+        self.header = marshal.loads(self.data[start:start + length])
+        base = start + length
+        self.base = base + (-base % 8)
+        self.docs = self.header["docs"]
+        self.terms = self.header["terms"]
+        self.view = memoryview(self.data)
+        self.arrays = {name: self._array(name) for name in _TYPECODES if name not in ("term_blob", "postings")}
+        self.postings = self.base + self.header["sections"]["postings"][0]
+        self.term_blob = self.base + self.header["sections"]["term_blob"][0]
+
+    def _array(self, name):
+        position, size = self.header["sections"][name]
+        return self.view[self.base + position:self.base + position + size].cast(_TYPECODES[name])
+
+    def lookup(self, term):
+        """(df, posición de la lista) de `term`, o None si no está en el segmento."""
+        key = term.encode("utf-8")
+        offsets = self.arrays["term_offsets"]
+        low, high = 0, self.terms
+        while low < high:
+            middle = (low + high) // 2
+            word = self.data[self.term_blob + offsets[middle]:self.term_blob + offsets[middle + 1]]
+            if word < key:
+                low = middle + 1
+            elif word > key:
+                high = middle
+            else:
+                return self.arrays["dfs"][middle], self.postings + self.arrays["postings_at"][middle]
+        return None
+
+    def codes(self, table, value):
+        """Números de la tabla `table` (tipos o publishers) cuyos valores contienen `value`."""
+        value = value.strip().casefold()
+        return [code for code, name in enumerate(self.header[table]) if name and value in name]
+
+    def close(self):
+        self.arrays.clear()
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+
+class SearchIndex:
+    """Consultas BM25 sobre el índice de `directory` (se actualiza al abrirlo si hace falta)."""
+
+    def __init__(self, directory=INDEX_DIR, source=SOURCE_PATH, update=True):
+        if update:
+            update_index(source, directory)
+        meta = load_meta(directory, FORMAT_VERSION)
+        if meta is None:
+            raise RuntimeError(f"No hay un índice en {directory}; hay que crearlo con update_index")
+        self.source = meta["source"]
+        self.segments = [_Segment(os.path.join(directory, segment["file"])) for segment in meta["segments"]]
+        self.docs = sum(segment.docs for segment in self.segments)
+        totals = [sum(segment.header["total_lengths"][i] for segment in self.segments) for i in range(len(_FIELDS))]
+        averages = [total / self.docs if self.docs else 1.0 for total in totals]
+        # Peso del campo / (1 - B + B * largo / largo promedio) para cada largo posible (un byte)
+        self.norms = [[weight / (1.0 - B + B * _code_length(code) / (average or 1.0)) for code in range(256)]
+                      for weight, average in zip(_WEIGHTS, averages)]
+        if numpy is not None:
+            self.norms = [numpy.array(table) for table in self.norms]
+        self._source_file = None
+        self._source_data = None
+
+    def _allowed(self, segment, year_from, year_to, tipo, publisher):
+        """Función artículo -> bool (o máscara de numpy) con los filtros; None si no hay filtros."""
+        checks = []
+        if year_from is not None or year_to is not None:
+            low, high = year_from or 1, year_to or 9999
+            checks.append(("years", lambda value: low <= value <= high, (low, high)))
+        for table, value in (("tipos", tipo), ("publishers", publisher)):
+            if value is not None:
+                codes = segment.codes(table, value)
+                if not codes:
+                    return False  # Ningún artículo del segmento tiene ese valor
+                checks.append((table, frozenset(codes).__contains__, codes))
+        if not checks:
+            return None
+        if numpy is not None:
+            mask = numpy.ones(segment.docs, dtype=bool)
+            for name, _, value in checks:
+                column = numpy.frombuffer(segment.arrays[name], dtype=_NUMPY_TYPES[_TYPECODES[name]])
+                mask &= (column >= value[0]) & (column <= value[1]) if name == "years" else numpy.isin(column, value)
+            return mask
+        columns = [(segment.arrays[name], test) for name, test, _ in checks]
+        return lambda doc: all(test(column[doc]) for column, test in columns)
+
+    def search(self, query, limit=10, year_from=None, year_to=None, tipo=None, publisher=None):
+        """Los `limit` artículos más relevantes para `query`, como pares (puntaje, Article).
+
+        `year_from`/`year_to` limitan el año (inclusive); `tipo` y `publisher` se buscan
+        dentro del valor de cada artículo sin distinguir mayúsculas ("journal" incluye
+        "Journal Article").
+        """
+        terms = Counter(tokenize(query))
+        # Primero se ubica cada término en cada segmento para conocer su frecuencia total
+        found = {term: [(position, segment.lookup(term)) for position, segment in enumerate(self.segments)]
+                 for term in terms}
+        dfs = {term: sum(hit[0] for _, hit in hits if hit) for term, hits in found.items()}
+
+        best = []
+        for position, segment in enumerate(self.segments):
+            allowed = self._allowed(segment, year_from, year_to, tipo, publisher)
+            if allowed is False:
+                continue
+            hits = [(term, hits[position][1]) for term, hits in found.items() if hits[position][1]]
+            if not hits:
+                continue
+            lengths = [segment.arrays[f"len_{name}"] for name in _FIELDS]
+            if numpy is not None:
+                scores = numpy.zeros(segment.docs)
+                for term, (df, at) in hits:
+                    docs = numpy.frombuffer(segment.data, dtype=numpy.uint32, count=df, offset=at)
+                    weighted = numpy.zeros(df)
+                    for i, (norm, column) in enumerate(zip(self.norms, lengths)):
+                        tfs = numpy.frombuffer(segment.data, dtype=numpy.uint8, count=df, offset=at + (4 + i) * df)
+                        weighted += tfs * norm[numpy.frombuffer(column, dtype=numpy.uint8)[docs]]
+                    scores[docs] += terms[term] * _idf(self.docs, dfs[term]) * weighted * (K1 + 1) / (K1 + weighted)
+                if allowed is not None:
+                    scores[~allowed] = 0.0
+                candidates = numpy.flatnonzero(scores)
+                if len(candidates) > limit:
+                    candidates = candidates[numpy.argpartition(scores[candidates], -limit)[-limit:]]
+                ranked = ((float(scores[doc]), position, int(doc)) for doc in candidates)
+            else:
+                scores = {}
+                for term, (df, at) in hits:
+                    docs = segment.view[at:at + 4 * df].cast("I")
+                    weighted = {}
+                    for i, (norm, column) in enumerate(zip(self.norms, lengths)):
+                        start = at + (4 + i) * df
+                        for doc, tf in zip(docs, segment.view[start:start + df]):
+                            if tf:
+                                weighted[doc] = weighted.get(doc, 0.0) + tf * norm[column[doc]]
+                    factor = terms[term] * _idf(self.docs, dfs[term]) * (K1 + 1)
+                    for doc, value in weighted.items():
+                        scores[doc] = scores.get(doc, 0.0) + factor * value / (K1 + value)
+                    docs.release()
+                if allowed is not None:
+                    scores = {doc: score for doc, score in scores.items() if allowed(doc)}
+                ranked = ((score, position, doc) for doc, score in scores.items())
+            best = heapq.nlargest(limit, [*best, *ranked])
+        return [(score, self.article(position, doc)) for score, position, doc in best]
+
+    def article(self, position, doc):
+        """El artículo `doc` del segmento `position`, leído de unificados.bib."""
+        if self._source_data is None:
+            self._source_file = open(self.source, mode="rb")
+            self._source_data = mmap.mmap(self._source_file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = self.segments[position].arrays["offsets"][doc]
+        entry = next(iter_entries(self._source_data, start=offset))
+        return Article.from_fields(self.source, entry.key, entry.fields)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        if self._source_data is not None:
+            self._source_data.close()
+            self._source_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _idf(docs, df):
+    return math.log(1.0 + (docs - df + 0.5) / (df + 0.5))
+
+
+def search(query, limit=10, directory=INDEX_DIR, source=SOURCE_PATH, **filters):
+    """Consultar el índice (actualizándolo antes si hace falta); ver SearchIndex.search."""
+    with SearchIndex(directory, source) as index:
+        return index.search(query, limit, **filters)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Buscar en los artículos unificados con BM25.")
+    parser.add_argument("query", nargs="?", help="Consulta (sin consulta solo se actualiza el índice)")
+    parser.add_argument("--year-from", type=int, help="Año mínimo")
+    parser.add_argument("--year-to", type=int, help="Año máximo")
+    parser.add_argument("--tipo", help="Tipo de publicación (por ejemplo Journals o Conferences)")
+    parser.add_argument("--publisher", help="Publisher")
+    parser.add_argument("--limit", type=int, default=10, help="Cantidad de resultados")
+    parser.add_argument("--source", default=SOURCE_PATH, help="Archivo BibTeX indexado")
+    parser.add_argument("--index-dir", default=INDEX_DIR, help="Carpeta del índice")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruir el índice desde cero")
+    args = parser.parse_args()
+
+    update_index(args.source, args.index_dir, rebuild=args.rebuild)
+    if args.query:
+        with SearchIndex(args.index_dir, args.source, update=False) as index:
+            start = time.perf_counter()
+            results = index.search(args.query, max(1, args.limit), args.year_from, args.year_to, args.tipo,
+                                   args.publisher)
+            elapsed = time.perf_counter() - start
+            for rank, (score, article) in enumerate(results, 1):
+                print(f"{rank:3}. {score:7.3f}  {article.get('year', '')}  {article.get('title', '')}")
+                print(f"     {article.get('url', '')}")
+            print(f"{len(results)} resultados de {index.docs} artículos en {elapsed * 1000:.1f} ms.")
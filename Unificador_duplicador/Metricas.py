@@ -0,0 +1,184 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import time
+
+
+"""
+Tiempos por fase y contadores de los scrapers y del unificador.
+
+Cada fase se mide con `METRICS.phase("login")`, con el decorador `METRICS.timed("login")`
+o con `timed_iter` para las etapas que son generadores (la lectura y la deduplicación del
+unificador), y se acumula por nombre y etiquetas: cantidad de veces, tiempo total y
+tiempo máximo. El tiempo de una fase es propio: no incluye el de las fases que se
+midieron dentro de ella, así que la suma de todas las fases es el tiempo medido. Si una
+fase termina con una excepción se cuenta un error con las mismas etiquetas.
+
+`bind(source="ACM")` fija etiquetas para la tarea actual (y las que cree): así las tres
+fuentes que corren a la vez en Ejecutor.py quedan separadas sin pasar la fuente a cada
+función.
+
+`export` agrega una línea JSON por métrica a Data/metricas/metricas.jsonl (el historial
+de todas las ejecuciones) y reescribe Data/metricas/<componente>.prom en el formato de
+texto de Prometheus (el que lee el textfile collector de node_exporter).
+"""
+
+
+METRICS_DIR = "Data/metricas"
+
+# Etiquetas fijadas con bind y tiempo de las fases anidadas en la fase actual
+_labels = contextvars.ContextVar("metricas_etiquetas", default=())
+_current = contextvars.ContextVar("metricas_fase", default=None)
+
+
+class Metrics:
+    """Tiempos por fase y contadores acumulados en memoria hasta `export`."""
+
+    def __init__(self):
+        self.timings = {}  # (fase, etiquetas) -> [veces, segundos, máximo]
+        self.counters = {}  # (nombre, etiquetas) -> valor
+        self.started = time.time()
+
+    def _key(self, name, labels):
+        merged = dict(_labels.get())
+        merged.update(labels)
+        return name, tuple(sorted(merged.items()))
+
+    def bind(self, **labels):
+        """Agregar `labels` a todas las métricas que registre la tarea actual."""
+        merged = dict(_labels.get())
+        merged.update(labels)
+        _labels.set(tuple(sorted(merged.items())))
+
+    def observe(self, name, seconds, times=1, slowest=None, **labels):
+        """Sumar `seconds` (en `times` veces, la más lenta de `slowest`) a la fase `name`."""
+        timing = self.timings.setdefault(self._key(name, labels), [0, 0.0, 0.0])
+        timing[0] += times
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds if slowest is None else slowest)
+
+    def count(self, name, amount=1, **labels):
+        """Sumar `amount` al contador `name`."""
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def phase(self, name, **labels):
+        """Medir el bloque como una vez de la fase `name` (sirve también con await adentro)."""
+        parent = _current.get()
+        nested = [0.0]
+        token = _current.set(nested)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count("errors", phase=name, **labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            if parent is not None:
+                parent[0] += elapsed
+            self.observe(name, elapsed - nested[0], **labels)
+
+    def timed(self, name, **labels):
+        """Decorador que mide cada llamada a la función (o corrutina) como la fase `name`."""
+        def decorate(function):
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    with self.phase(name, **labels):
+                        return await function(*args, **kwargs)
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with self.phase(name, **labels):
+                        return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def timed_iter(self, iterable, name, **labels):
+        """Entregar los elementos de `iterable` midiendo el tiempo que tarda en producirlos.
+
+        Se registra una sola observación al terminar, con una vez por elemento.
+        """
+        iterator = iter(iterable)
+        total = 0.0
+        slowest = 0.0
+        items = 0
+        try:
+            while True:
+                parent = _current.get()
+                nested = [0.0]
+                token = _current.set(nested)
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed = time.perf_counter() - start
+                    _current.reset(token)
+                    if parent is not None:
+                        parent[0] += elapsed
+                    total += elapsed - nested[0]
+                    slowest = max(slowest, elapsed - nested[0])
+                items += 1
+                yield item
+        finally:
+            self.observe(name, total, items, slowest, **labels)
+
+    def export(self, component, directory=METRICS_DIR):
+        """Guardar las métricas de `component` en JSON lines y en formato Prometheus."""
+        os.makedirs(directory, exist_ok=True)
+        now = time.time()
+        run = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started))
+        lines = []
+        for (name, labels), (times, seconds, slowest) in sorted(self.timings.items()):
+            lines.append({"run": run, "time": round(now, 3), "component": component, "phase": name,
+                          "labels": dict(labels), "count": times, "seconds": round(seconds, 6),
+                          "max_seconds": round(slowest, 6)})
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append({"run": run, "time": round(now, 3), "component": component, "counter": name,
+                          "labels": dict(labels), "value": value})
+        with open(os.path.join(directory, "metricas.jsonl"), mode="a", encoding="utf-8") as file:
+            file.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+
+        path = os.path.join(directory, f"{component}.prom")
+        with open(path + ".tmp", mode="w", encoding="utf-8") as file:
+            file.write(self.prometheus(component))
+        # El collector no debe leer un archivo a medio escribir
+        os.replace(path + ".tmp", path)
+
+    def prometheus(self, component):
+        """Las métricas en el formato de texto de Prometheus."""
+        def series(name, labels, value):
+            text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+            return f"{name}{{{text}}} {value}\n" if text else f"{name} {value}\n"
+
+        out = []
+        phases = sorted(self.timings.items())
+        for suffix, kind, position, description in (
+                ("phase_seconds_total", "counter", 1, "Tiempo propio acumulado de cada fase"),
+                ("phase_runs_total", "counter", 0, "Veces que se ejecutó cada fase"),
+                ("phase_seconds_max", "gauge", 2, "Tiempo máximo de una ejecución de cada fase")):
+            if phases:
+                out.append(f"# HELP {component}_{suffix} {description}\n# TYPE {component}_{suffix} {kind}\n")
+                out.extend(series(f"{component}_{suffix}", (("phase", name),) + labels, round(timing[position], 6))
+                           for (name, labels), timing in phases)
+        for counter in sorted({name for name, _ in self.counters}):
+            out.append(f"# TYPE {component}_{counter}_total counter\n")
+            out.extend(series(f"{component}_{counter}_total", labels, value)
+                       for (name, labels), value in sorted(self.counters.items()) if name == counter)
+        return "".join(out)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Registro compartido por todo el proceso
+METRICS = Metrics()
@@ -0,0 +1,123 @@
+import sys
+
+
+"""
+Registro compacto de un artículo.
+
+Cada artículo se guarda en un objeto con __slots__ en lugar de un diccionario: no lleva
+tabla hash propia y sus campos ocupan una posición fija. Los campos de pocos valores
+distintos (archivo de origen, año, tipo, publisher y journal) se internan, de modo que
+todos los artículos con el mismo valor comparten una sola cadena en memoria.
+
+La clase conserva la interfaz de diccionario que usa el resto del código (get, [], in,
+items), así que se puede usar donde antes se usaba un dict.
+
+"""
+
+
+FIELDS = ("source_file", "entry_key", "title", "author", "year", "journal", "tipo",
+          "publisher", "abstract", "url")
+
+# Campos con pocos valores distintos que se comparten entre artículos
+CATEGORICAL_FIELDS = frozenset(("source_file", "year", "journal", "tipo", "publisher"))
+# Campos de una entrada que se guardan directamente en su slot
+_KNOWN_FIELDS = frozenset(FIELDS[2:])
+
+
+class Article:
+    """Artículo con los campos conocidos en slots y los demás en `extra` (o None)."""
+
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, **fields):
+        for name in FIELDS:
+            setattr(self, name, None)
+        self.extra = None
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_fields(cls, source_file, entry_key, fields):
+        """Crear un artículo a partir de los campos decodificados de una entrada."""
+        if not fields.keys() <= _KNOWN_FIELDS:
+            # Campos fuera de FIELDS (van a `extra`) o que repiten source_file/entry_key
+            article = cls(source_file=source_file, entry_key=entry_key)
+            for name, value in fields.items():
+                article[name] = value
+            return article
+        # Caso común: cada valor va directo a su slot
+        get = fields.get
+        year, journal, tipo, publisher = get("year"), get("journal"), get("tipo"), get("publisher")
+        article = cls.__new__(cls)
+        article.source_file = sys.intern(source_file)
+        article.entry_key = entry_key
+        article.title = get("title")
+        article.author = get("author")
+        article.year = sys.intern(year) if isinstance(year, str) else year
+        article.journal = sys.intern(journal) if isinstance(journal, str) else journal
+        article.tipo = sys.intern(tipo) if isinstance(tipo, str) else tipo
+        article.publisher = sys.intern(publisher) if isinstance(publisher, str) else publisher
+        article.abstract = get("abstract")
+        article.url = get("url")
+        article.extra = None
+        return article
+
+    @classmethod
+    def from_values(cls, values):
+        """Reconstruir un artículo a partir de la tupla que devuelve `values`."""
+        article = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            if name in CATEGORICAL_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(article, name, value)
+        return article
+
+    def values(self):
+        """Valores de los campos en el orden de FIELDS, seguidos de `extra`."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setitem__(self, name, value):
+        if name in CATEGORICAL_FIELDS and isinstance(value, str):
+            value = sys.intern(value)
+        if name in FIELDS:
+            setattr(self, name, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[name] = value
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        if name in FIELDS:
+            value = getattr(self, name)
+        else:
+            value = self.extra.get(name) if self.extra else None
+        return default if value is None else value
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def items(self):
+        """Pares (campo, valor) de los campos presentes, en el orden de FIELDS."""
+        for name in FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                yield name, value
+        if self.extra:
+            yield from self.extra.items()
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, Article):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Article({self.to_dict()!r})"
@@ -0,0 +1,127 @@
+import gzip
+import io
+from itertools import islice
+from operator import attrgetter
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional: solo se necesita para escribir .zst
+    zstandard = None
+
+from Registro import Article
+
+
+"""
+Serializador BibTeX compartido por save_bibtex y save_duplicates.
+
+Cada artículo se convierte en texto con una sola operación de formato y los registros se
+escriben por lotes, uniendo muchos artículos en una sola llamada a write. Las llaves de
+los valores se escapan (\\{ \\}) para que el archivo se pueda volver a leer con el
+tokenizador sin perder ni romper campos. La salida puede comprimirse con gzip o zstd.
+
+"""
+
+
+BATCH_SIZE = 1000
+
+# Campos que se escriben siempre, con el valor que se usa cuando faltan
+DEFAULTS = (
+    ("title", "Unknown Title"),
+    ("author", "Unknown Authors"),
+    ("year", "Unknown Year"),
+    ("journal", "Unknown Journal"),
+    ("tipo", "Unknown Type"),
+    ("publisher", "Unkown Publisher"),
+    ("abstract", "Unknown Abstract"),
+    ("url", "Unknown URL"),
+)
+
+_NAMES = tuple(name for name, _ in DEFAULTS)
+_VALUES = tuple(default for _, default in DEFAULTS)
+_GET_FIELDS = attrgetter(*_NAMES)
+
+def escape(value):
+    """Escapar las llaves de un valor para escribirlo entre llaves."""
+    if "{" in value or "}" in value:
+        return value.replace("{", "\\{").replace("}", "\\}")
+    return value
+
+
+def render_article(article, key, extra=()):
+    """Texto BibTeX de un artículo; `extra` son pares (campo, valor) que van al final."""
+    if isinstance(article, Article):
+        values = _GET_FIELDS(article)
+    else:
+        values = tuple(map(article.get, _NAMES))
+    if None in values:
+        values = [default if value is None else value for value, default in zip(values, _VALUES)]
+
+    # Se escapan todos los valores de una vez y solo si alguno tiene llaves
+    text = "\0".join(values)
+    if "{" in text or "}" in text:
+        values = escape(text).split("\0")
+    title, author, year, journal, tipo, publisher, abstract, url = values
+    tail = "".join(f",\n  {name} = {{{escape(str(value))}}}" for name, value in extra) if extra else ""
+    return (f"@article{{{key},\n  title = {{{title}}},\n  author = {{{author}}},\n  year = {{{year}}},\n"
+            f"  journal = {{{journal}}},\n  tipo = {{{tipo}}},\n  publisher = {{{publisher}}},\n"
+            f"  abstract = {{{abstract}}},\n  url = {{{url}}}{tail}\n}}\n\n")
+
+
+def compression_for(filename):
+    """Compresión que corresponde a la extensión del archivo: "gzip", "zstd" o None."""
+    if filename.endswith(".gz"):
+        return "gzip"
+    if filename.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def open_output(filename, mode="w", compression=None):
+    """Abrir un archivo de texto UTF-8 para escribir, comprimido si se indica."""
+    compression = compression or compression_for(filename)
+    if compression == "gzip":
+        return gzip.open(filename, mode + "t", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Para escribir archivos .zst hay que instalar el paquete zstandard")
+        raw = open(filename, mode + "b")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8")
+    return open(filename, mode=mode, encoding="utf-8", buffering=1024 * 1024)
+
+
+def read_compressed(filename, compression=None):
+    """Leer y descomprimir completo un archivo .gz o .zst, devolviendo sus bytes."""
+    compression = compression or compression_for(filename)
+    if compression == "gzip":
+        with gzip.open(filename, "rb") as file:
+            return file.read()
+    if zstandard is None:
+        raise RuntimeError("Para leer archivos .zst hay que instalar el paquete zstandard")
+    with open(filename, "rb") as file:
+        return zstandard.ZstdDecompressor().stream_reader(file).read()
+
+
+def write_bibtex(filename, rows, mode="w", start=0, prefix="ref", compression=None, batch_size=BATCH_SIZE,
+                 keep_keys=False):
+    """Escribir `rows`, pares (artículo, campos extra), como entradas {prefix}{n}.
+
+    La numeración empieza en `start`. Con `keep_keys` cada artículo conserva la clave con
+    la que se leyó (entry_key), por ejemplo al reescribir unificados.bib, cuyas claves usa
+    el índice de Incremental.py. Devuelve la cantidad de artículos escritos.
+    """
+    count = 0
+    rows = iter(rows)
+    with open_output(filename, mode, compression) as file:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            first = start + count
+            if keep_keys:
+                text = "".join([render_article(article, article["entry_key"], extra) for article, extra in batch])
+            else:
+                text = "".join([render_article(article, f"{prefix}{first + i}", extra)
+                                for i, (article, extra) in enumerate(batch)])
+            file.write(text)
+            count += len(batch)
+    return count
@@ -0,0 +1,277 @@
+import argparse
+import contextlib
+import html
+import json
+import os
+from collections import Counter, defaultdict
+from itertools import chain, islice
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # numpy y scipy son opcionales: solo se necesitan para categorizar
+    numpy = None
+    sparse = None
+
+from Indice import tokenize
+from Metricas import METRICS
+from Serializador import compression_for, write_bibtex
+
+
+"""
+Categorización de artículos por temas con matrices TF-IDF dispersas.
+
+Cada lote de artículos (título y resumen) se convierte en una matriz dispersa de scipy
+con una fila por artículo y una columna por palabra: el texto de todo el lote se corta
+en palabras de una vez, cada palabra distinta se normaliza y se numera una sola vez y la
+matriz se arma con arreglos de numpy, sin recorrer los artículos uno por uno. Las
+frecuencias se suavizan (log(1 + tf)), se multiplican por el IDF del lote y cada fila se
+normaliza a largo 1.
+
+Los temas salen de una taxonomía de palabras clave (TAXONOMY o un JSON
+{"tema": ["palabra o frase", ...]}). Con el método "keywords", el puntaje de cada tema
+es el producto de la fila por las palabras del tema (una frase reparte su peso entre sus
+palabras) y se asignan hasta `max_labels` temas con puntaje de al menos `threshold`.
+Con "centroid", los artículos que las palabras clave asignan con seguridad sirven de
+ejemplos: el centroide de cada tema es el promedio de sus filas y cada artículo recibe
+el tema del centroide más parecido (similitud coseno), aunque no mencione ninguna
+palabra clave.
+
+Los temas se escriben en el campo `categories` de unificados.bib: con la opción
+--categorize (o --centroid) de Categorizacion.py durante la unificación, o con este
+archivo sobre un unificados.bib ya generado.
+
+Uso: python Unificador_duplicador/Temas.py [archivo.bib] [--method keywords|centroid] [--taxonomy archivo.json]
+                                           [--threshold X]
+"""
+
+
+UNIFIED_PATH = "Data/unificados.bib"
+BATCH_SIZE = 100000
+THRESHOLD = 0.08
+MAX_LABELS = 3
+# Similitud mínima con el centroide para asignar un tema con el método "centroid"
+MIN_SIMILARITY = 0.05
+SEPARATOR = "; "
+
+TAXONOMY = {
+    "Educación": ["education", "educational", "students", "student", "teaching", "teachers", "learning outcomes",
+                  "curriculum", "university", "classroom", "higher education", "assessment", "pedagogy"],
+    "Modelos de lenguaje": ["large language model", "language models", "llm", "llms", "chatgpt", "gpt",
+                            "natural language processing", "nlp", "prompt", "prompting", "transformer", "bert"],
+    "Imágenes y multimedia": ["image", "images", "diffusion", "gan", "gans", "generative adversarial", "video",
+                              "audio", "music", "text to image", "computer vision", "synthesis"],
+    "Salud": ["health", "healthcare", "medical", "medicine", "clinical", "patients", "patient", "disease",
+              "diagnosis", "hospital", "mental health"],
+    "Ética y sociedad": ["ethics", "ethical", "bias", "fairness", "privacy", "law", "legal", "regulation",
+                         "policy", "copyright", "misinformation", "trust", "society"],
+    "Seguridad": ["security", "attack", "attacks", "intrusion", "malware", "adversarial", "cybersecurity",
+                  "privacy preserving", "threat", "detection"],
+    "Ingeniería de software": ["software", "code", "programming", "developers", "code generation",
+                               "software engineering", "testing", "github copilot", "requirements"],
+    "Negocios e industria": ["business", "marketing", "industry", "management", "customer", "enterprise",
+                             "manufacturing", "supply chain", "finance", "economic"],
+}
+
+_DOC = b"\x00"
+# Minúsculas y espacio en lugar de los signos ASCII; los bytes de UTF-8 (>= 128) y el separador \x00 quedan igual
+_ASCII = bytes(code if code == 0 or code >= 128 or chr(code).isalnum() else 32 for code in range(256)).lower()
+
+
+def load_taxonomy(path):
+    """Leer una taxonomía {"tema": ["palabra o frase", ...]} desde un archivo JSON."""
+    with open(path, encoding="utf-8") as file:
+        taxonomy = json.load(file)
+    if not isinstance(taxonomy, dict) or not all(isinstance(words, list) for words in taxonomy.values()):
+        raise ValueError(f"{path} debe tener un objeto JSON con una lista de palabras por tema")
+    return taxonomy
+
+
+def _require():
+    if sparse is None:
+        raise RuntimeError("Para categorizar hay que instalar los paquetes numpy y scipy")
+
+
+def count_matrix(texts, vocabulary):
+    """Matriz dispersa (artículos x palabras) con cuántas veces aparece cada palabra.
+
+    El lote se corta como un solo texto en bytes (con `\\x00` entre artículos) pasando a
+    minúsculas y quitando los signos ASCII. La normalización completa (acentos y demás
+    signos, como Indice.tokenize) se hace una sola vez por palabra distinta, no por
+    aparición. Las palabras nuevas se agregan a `vocabulary` (ver new_vocabulary).
+    """
+    data = html.unescape("\x00".join(texts)).encode("utf-8").translate(_ASCII)
+    raw = new_vocabulary()
+    raw[_DOC]
+    tokens = data.replace(_DOC, b" \x00 ").split()
+    ids = numpy.fromiter(map(raw.__getitem__, tokens), dtype=numpy.int64, count=len(tokens))
+
+    # Cada palabra cruda se convierte en cero (signos, palabras vacías), una o varias palabras
+    words = [[vocabulary[word] for word in tokenize(token.decode("utf-8", "replace"))] for token in raw]
+    lengths = numpy.fromiter(map(len, words), dtype=numpy.int64, count=len(words))
+    columns = numpy.fromiter(chain.from_iterable(words), dtype=numpy.int64, count=int(lengths.sum()))
+    starts = numpy.cumsum(lengths) - lengths
+
+    rows = numpy.cumsum(ids == raw[_DOC])
+    repeats = lengths[ids]
+    rows = numpy.repeat(rows, repeats)
+    positions = numpy.arange(len(rows)) - numpy.repeat(numpy.cumsum(repeats) - repeats, repeats)
+    columns = columns[numpy.repeat(starts[ids], repeats) + positions]
+    matrix = sparse.csr_matrix((numpy.ones(len(rows)), (rows, columns)), shape=(len(texts), len(vocabulary)))
+    matrix.sum_duplicates()
+    return matrix
+
+
+def new_vocabulary():
+    """Diccionario que numera cada palabra nueva en el orden en que aparece."""
+    vocabulary = defaultdict()
+    vocabulary.default_factory = vocabulary.__len__
+    return vocabulary
+
+
+def tfidf(counts):
+    """Pesos TF-IDF con log(1 + tf), normalizados para que cada fila tenga largo 1."""
+    matrix = counts.copy()
+    documents = matrix.shape[0]
+    df = numpy.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = numpy.log((1 + documents) / (1 + df)) + 1.0
+    matrix.data = numpy.log1p(matrix.data) * idf[matrix.indices]
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix):
+    """Dividir cada fila de la matriz dispersa por su norma (las filas vacías quedan igual)."""
+    norms = numpy.sqrt(numpy.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+class Categorizer:
+    """Asigna temas de una taxonomía a lotes de artículos (ver el docstring del módulo)."""
+
+    def __init__(self, taxonomy=None, method="keywords", threshold=THRESHOLD, max_labels=MAX_LABELS,
+                 min_similarity=MIN_SIMILARITY):
+        _require()
+        if method not in ("keywords", "centroid"):
+            raise ValueError(f"Método de categorización desconocido: {method}")
+        self.taxonomy = taxonomy or TAXONOMY
+        self.categories = list(self.taxonomy)
+        self.method = method
+        self.threshold = threshold
+        self.max_labels = max_labels
+        self.min_similarity = min_similarity
+        self.counts = Counter()
+
+    def _keyword_matrix(self, vocabulary):
+        """Matriz (palabras x temas): cada frase reparte un peso de 1 entre sus palabras."""
+        rows, columns, weights = [], [], []
+        for column, category in enumerate(self.categories):
+            for phrase in self.taxonomy[category]:
+                words = tokenize(phrase)
+                for word in words:
+                    rows.append(vocabulary[word])
+                    columns.append(column)
+                    weights.append(1.0 / len(words))
+        return sparse.csr_matrix((weights, (rows, columns)), shape=(len(vocabulary), len(self.categories)))
+
+    def scores(self, texts):
+        """Puntaje de cada tema (artículos x temas) para los textos de un lote."""
+        vocabulary = new_vocabulary()
+        counts = count_matrix(texts, vocabulary)
+        keywords = self._keyword_matrix(vocabulary)
+        # Las palabras de la taxonomía que no estaban en el lote agrandan el vocabulario
+        counts.resize((counts.shape[0], len(vocabulary)))
+        weights = tfidf(counts)
+        scores = (weights @ keywords).toarray()
+        if self.method == "keywords":
+            return scores
+
+        # Ejemplos: artículos cuyo mejor tema por palabras clave supera el umbral
+        best = scores.argmax(axis=1)
+        seeds = numpy.flatnonzero(scores.max(axis=1) >= self.threshold)
+        examples = sparse.csr_matrix((numpy.ones(len(seeds)), (best[seeds], seeds)),
+                                     shape=(len(self.categories), weights.shape[0]))
+        centroids = normalize_rows(examples @ weights)  # Promedio de los ejemplos, normalizado a largo 1
+        return (weights @ centroids.T).toarray()
+
+    def label(self, texts):
+        """Temas de cada texto como cadenas "tema; tema" ("" si no se asignó ninguno)."""
+        scores = self.scores(texts)
+        if not len(texts):
+            return []
+        if self.method == "keywords":
+            limit, minimum = self.max_labels, self.threshold
+        else:
+            limit, minimum = 1, self.min_similarity
+        order = numpy.argsort(-scores, axis=1, kind="stable")[:, :limit]
+        chosen = numpy.take_along_axis(scores, order, axis=1) >= minimum
+        # Cada combinación de temas se convierte en texto una sola vez
+        codes = numpy.where(chosen, order + 1, 0)
+        combinations, inverse = numpy.unique(codes, axis=0, return_inverse=True)
+        names = numpy.array([SEPARATOR.join(self.categories[code - 1] for code in row if code)
+                             for row in combinations], dtype=object)
+        labels = names[inverse.ravel()]
+        for row, count in zip(combinations, numpy.bincount(inverse.ravel())):
+            for code in row[row > 0]:
+                self.counts[self.categories[code - 1]] += int(count)
+        self.counts[""] += int(numpy.count_nonzero(~chosen.any(axis=1)))
+        return labels.tolist()
+
+    def label_articles(self, articles, batch_size=BATCH_SIZE):
+        """Entregar `articles` con el campo "categories", procesándolos por lotes.
+
+        El campo se reemplaza siempre (queda vacío si no corresponde ningún tema), así
+        que al volver a categorizar no quedan temas de una taxonomía o un método anterior.
+        """
+        articles = iter(articles)
+        while True:
+            batch = list(islice(articles, batch_size))
+            if not batch:
+                return
+            with METRICS.phase("categorize"):
+                texts = [f"{article.get('title', '')} {article.get('abstract', '')}" for article in batch]
+                for article, labels in zip(batch, self.label(texts)):
+                    article["categories"] = labels
+            yield from batch
+
+    def summary(self):
+        """Cantidad de artículos por tema (los que no recibieron ninguno aparecen como "")."""
+        return dict(self.counts.most_common())
+
+
+def categorize_file(filename=UNIFIED_PATH, categorizer=None):
+    """Agregar el campo `categories` a los artículos de un BibTeX ya unificado.
+
+    Se escribe un archivo aparte que reemplaza al original solo si se leyó y se escribió
+    completo; si algo falla, el original queda intacto y el error se propaga. Cada
+    artículo conserva su clave: Incremental.py quita artículos de unificados.bib por clave.
+    """
+    from Categorizacion import iter_bibtex  # Categorizacion también importa este módulo
+
+    categorizer = categorizer or Categorizer()
+    temporary = filename + ".tmp"
+    articles = categorizer.label_articles(iter_bibtex(filename, strict=True))
+    rows = ((article, [("categories", article["categories"])] if article["categories"] else ())
+            for article in articles)
+    try:
+        write_bibtex(temporary, rows, compression=compression_for(filename), keep_keys=True)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary)
+        raise
+    os.replace(temporary, filename)
+    return categorizer.summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asignar temas a los artículos unificados.")
+    parser.add_argument("filename", nargs="?", default=UNIFIED_PATH, help="Archivo BibTeX a categorizar")
+    parser.add_argument("--method", choices=("keywords", "centroid"), default="keywords",
+                        help="Palabras clave de la taxonomía o centroide más cercano")
+    parser.add_argument("--taxonomy", help="Archivo JSON con la taxonomía {tema: [palabras]}")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Puntaje mínimo de un tema")
+    args = parser.parse_args()
+    taxonomy = load_taxonomy(args.taxonomy) if args.taxonomy else None
+    summary = categorize_file(args.filename, Categorizer(taxonomy, args.method, args.threshold))
+    for category, count in summary.items():
+        print(f"{count:8}  {category or 'Sin tema'}")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+
+# Los módulos del proyecto se importan por nombre, como cuando se ejecutan los scripts
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Unificador_duplicador"))
@@ -0,0 +1,82 @@
+import pytest
+
+from Registro import Article
+from Serializador import render_article
+from Tokenizador import iter_entries
+
+
+# Cada prueba corre con el camino rápido y con el recorrido completo de cada entrada
+PATHS = pytest.mark.parametrize("simple", [True, False], ids=["simple", "full"])
+
+
+def _entries(text, simple, fields=None):
+    return list(iter_entries(text.encode("utf-8"), fields, simple=simple))
+
+
+@PATHS
+def test_multiline_values(simple):
+    text = ("@article{ref0,\n  title = {Alpha study},\n"
+            "  abstract = {First line\n    second line\n  third line},\n  year = {2024}\n}\n\n")
+
+    (entry,) = _entries(text, simple)
+
+    assert entry.fields == {"title": "Alpha study", "abstract": "First line second line third line",
+                            "year": "2024"}
+
+
+@PATHS
+def test_nested_and_escaped_braces(simple):
+    text = ("@article{ref0,\n  title = {The {GPT} model and {{BERT}}},\n"
+            "  note = {Uses \\{ and \\} literally},\n  year = 2024\n}\n\n")
+
+    (entry,) = _entries(text, simple)
+
+    assert entry.fields == {"title": "The {GPT} model and {{BERT}}", "note": "Uses { and } literally",
+                            "year": "2024"}
+
+
+@PATHS
+def test_string_and_comment_entries_are_skipped(simple):
+    text = ('@string{ieee = "IEEE Press"}\n\n@comment{generado por el scraper, {sin} campos}\n\n'
+            "@Article{ref0,\n  title = {Alpha study}\n}\n\n@preamble{\"x\"}\n\n"
+            "@article{ref1,\n  title = {Beta survey}\n}\n\n")
+
+    entries = _entries(text, simple)
+
+    assert [(entry.type, entry.key, entry.fields["title"]) for entry in entries] == [
+        ("article", "ref0", "Alpha study"), ("article", "ref1", "Beta survey")]
+
+
+@PATHS
+def test_truncated_entry_is_skipped(simple, capsys):
+    # El archivo se cortó en medio del abstract de la última entrada
+    text = ("@article{ref0,\n  title = {Alpha study}\n}\n\n"
+            "@article{ref1,\n  title = {Beta survey},\n  abstract = {Text that never")
+
+    entries = _entries(text, simple)
+
+    assert [entry.key for entry in entries] == ["ref0"]
+    assert "mal formada" in capsys.readouterr().out
+
+
+@PATHS
+def test_unclosed_brace_closes_at_end_of_line(simple):
+    # Como un abstract de IEEE que termina en "$S_{...Show More"
+    text = ("@article{ref0,\n  abstract = {Bound on $S_{...Show More},\n  title = {Gamma report}\n}\n\n"
+            "@article{ref1,\n  title = {Delta notes}\n}\n\n")
+
+    entries = _entries(text, simple)
+
+    assert [entry.fields for entry in entries] == [
+        {"abstract": "Bound on $S_{...Show More", "title": "Gamma report"}, {"title": "Delta notes"}]
+
+
+def test_simple_path_matches_full_path():
+    articles = [Article(title=f"Article {i}", author="Ana Pérez", year="2024", url=f"https://example.org/{i}")
+                for i in range(50)]
+    articles[10]["title"] = "With {nested} braces"
+    articles[20]["abstract"] = "Two\nlines"
+    data = "".join(render_article(article, f"ref{i}") for i, article in enumerate(articles)).encode("utf-8")
+
+    for fields in (None, ("title", "URL")):
+        assert list(iter_entries(data, fields)) == list(iter_entries(data, fields, simple=False))
@@ -0,0 +1,101 @@
+from Categorizacion import filter_unique, iter_bibtex, unify_results_from_files
+from Duplicados import DuplicateIndex
+from Incremental import unify_incremental
+from Registro import Article
+from Temas import categorize_file
+
+
+# A y C comparten el DOI, B y C la URL; A y B no se parecen entre sí
+RECORDS = (
+    {"title": "Alpha study of generative models", "author": "Ana Pérez", "year": "2024",
+     "doi": "10.1234/alpha", "url": "Unknown URL"},
+    {"title": "Beta survey on unrelated topics", "author": "Bruno Díaz", "year": "2024",
+     "url": "https://example.org/beta"},
+    {"title": "Gamma report", "author": "Carla Ruiz", "year": "2024",
+     "doi": "10.1234/alpha", "url": "https://example.org/beta"},
+)
+
+
+def _write(path, records, keys=None):
+    with open(path, mode="w", encoding="utf-8") as file:
+        for i, record in enumerate(records):
+            fields = ",\n".join(f"  {name} = {{{value}}}" for name, value in record.items())
+            file.write(f"@article{{{keys[i] if keys else f'ref{i}'},\n{fields}\n}}\n\n")
+
+
+def test_filter_unique_reports_absorbed_group():
+    index = DuplicateIndex()
+    duplicates, absorbed = {}, set()
+    articles = [Article.from_fields("resultados.bib", f"ref{i}", record) for i, record in enumerate(RECORDS)]
+
+    unique = list(filter_unique(articles, index, duplicates, absorbed))
+
+    # B ya se había entregado cuando C unió su grupo con el de A
+    assert [article["title"] for article in unique] == [RECORDS[0]["title"], RECORDS[1]["title"]]
+    assert absorbed == {1}
+    assert list(duplicates) == [0]
+    assert len(duplicates[0]["files"]) == 3
+
+
+def test_unified_output_drops_absorbed_original(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("resultados.bib", RECORDS)
+
+    unify_results_from_files("resultados.bib")
+
+    unified = list(iter_bibtex("Data/unificados.bib"))
+    assert [article["title"] for article in unified] == [RECORDS[0]["title"]]
+    assert [article["entry_key"] for article in unified] == ["ref0"]
+    duplicates = list(iter_bibtex("Data/duplicados.bib"))
+    assert len(duplicates) == 1
+
+
+def test_incremental_skips_missing_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _write("resultados.bib", RECORDS[:2])
+
+    assert unify_incremental("resultados.bib", "faltante.bib") == 2
+
+    assert "faltante.bib" in capsys.readouterr().out
+    assert len(list(iter_bibtex("Data/unificados.bib"))) == 2
+
+
+def test_incremental_ignores_rewritten_keys(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # El tercero no tiene DOI ni URL: se reconoce por el título
+    records = [*RECORDS[:2], {"title": "Delta notes", "author": "Diego Sosa", "year": "2023"}]
+    _write("resultados.bib", records)
+    unify_incremental("resultados.bib")
+    with open("Data/unificados.bib", encoding="utf-8") as file:
+        unified = file.read()
+
+    # El scraper vuelve a escribir los mismos artículos, en otro orden y con otras claves
+    _write("resultados.bib", records[::-1], keys=["delta", "beta", "alpha"])
+
+    assert unify_incremental("resultados.bib") == 0
+    with open("Data/unificados.bib", encoding="utf-8") as file:
+        assert file.read() == unified
+    assert list(iter_bibtex("Data/duplicados.bib")) == []
+
+
+def test_incremental_replaces_edited_and_drops_removed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("resultados.bib", RECORDS[:2])
+    unify_incremental("resultados.bib")
+
+    edited = dict(RECORDS[0], author="Ana Pérez and Luis Gómez")
+    _write("resultados.bib", [edited], keys=["alpha"])
+
+    assert unify_incremental("resultados.bib") == 2
+    articles = list(iter_bibtex("Data/unificados.bib"))
+    assert [(article["entry_key"], article["author"]) for article in articles] == [("ref0", edited["author"])]
+
+
+def test_categorize_file_keeps_entry_keys(tmp_path):
+    path = str(tmp_path / "unificados.bib")
+    # Como después de drop_absorbed: falta ref1
+    _write(path, RECORDS[::2], keys=["ref0", "ref2"])
+
+    categorize_file(path)
+
+    assert [article["entry_key"] for article in iter_bibtex(path)] == ["ref0", "ref2"]